@@ -1,4 +1,10 @@
-from src.main import app
+from src.main import create_app
+from src.services.migrations import run_migrations
+
+app = create_app()
 
 if __name__ == '__main__':
+    # Serveur de développement : mettre le schéma à jour avant de démarrer
+    with app.app_context():
+        run_migrations()
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,108 @@
+"""Banc d'essai du tableau de bord admin sur une grosse table d'achats.
+
+Remplit une base SQLite temporaire (migrée) avec --purchases achats répartis sur
+--days jours, puis mesure :
+  - le remplissage des tables de ventes par jour (rebuild-sales-rollups) ;
+  - le calcul des statistiques de ventes depuis ces tables (sans cache) ;
+  - la page d'achats la plus récente et une page profonde (keyset) ;
+  - la requête GET /admin complète, cache des statistiques froid puis chaud.
+
+    python scripts/benchmark_admin_dashboard.py --purchases 300000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.story import db, Story, Purchase, PurchaseStory
+from src.services.migrations import run_migrations
+from src.services.sales_rollups import rebuild_rollups
+from src.services.sales_stats import compute_sales_stats, list_purchases, sales_stats_cache
+
+PACKS = [('single', 2.99, 1), ('pack10', 24.99, 10), ('pack50', 99.99, 50)]
+
+
+def seed(purchases, stories, days):
+    db.session.execute(Story.__table__.insert(), [
+        {'title': f'Histoire {index}', 'description': 'Banc d\'essai', 'duration': '5:00',
+         'category': 'Bench', 'price': 2.99, 'created_at': datetime.utcnow()}
+        for index in range(stories)
+    ])
+    now = datetime.utcnow()
+    batch = 10000
+    for start in range(0, purchases, batch):
+        rows, unlocks = [], []
+        for purchase_id in range(start + 1, min(start + batch, purchases) + 1):
+            pack_type, amount, count = random.choice(PACKS)
+            email = f'user{random.randrange(purchases // 3 or 1)}@bench.test'
+            rows.append({
+                'id': purchase_id, 'user_email': email, 'pack_type': pack_type, 'amount_paid': amount,
+                'is_active': True, 'paypal_transaction_id': f'BENCH-{purchase_id}',
+                'purchase_date': now - timedelta(seconds=random.randrange(days * 86400))
+            })
+            unlocks.extend(
+                {'purchase_id': purchase_id, 'user_email': email, 'story_id': story_id}
+                for story_id in random.sample(range(1, stories + 1), min(count, 5))
+            )
+        db.session.execute(Purchase.__table__.insert(), rows)
+        db.session.execute(PurchaseStory.__table__.insert(), unlocks)
+    db.session.commit()
+
+
+def timed(function, runs=3):
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    return min(durations) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Banc d\'essai du tableau de bord admin')
+    parser.add_argument('--purchases', type=int, default=300000)
+    parser.add_argument('--stories', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=365, help='ancienneté maximale des achats générés')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Lu par le profil 'testing' à l'import de la configuration
+        os.environ['TEST_DATABASE_URL'] = f'sqlite:///{os.path.join(directory, "bench.db")}'
+        from src.main import create_app
+        app = create_app('testing')
+        with app.app_context():
+            run_migrations()
+            started = time.perf_counter()
+            seed(args.purchases, args.stories, args.days)
+            print(f'{args.purchases} achats générés en {time.perf_counter() - started:.1f} s')
+            started = time.perf_counter()
+            rebuild_rollups()
+            db.session.commit()
+            print(f'rollups recalculés en {time.perf_counter() - started:.1f} s')
+
+            for days in (7, 30, 365):
+                print(f'statistiques {days:>3} jours      {timed(lambda: compute_sales_stats(days)):>9.1f} ms')
+            first_page = list_purchases()
+            print(f'page d\'achats récente        {timed(list_purchases):>9.1f} ms')
+            cursor = first_page.next_cursor
+            for _ in range(200):
+                cursor = list_purchases(cursor).next_cursor
+            print(f'page d\'achats n°200          {timed(lambda: list_purchases(cursor)):>9.1f} ms')
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['admin_logged_in'] = True
+        sales_stats_cache.clear()
+        cold = timed(lambda: client.get('/admin?days=30'), runs=1)
+        warm = timed(lambda: client.get('/admin?days=30'), runs=5)
+        print(f'GET /admin (cache froid)     {cold:>9.1f} ms')
+        print(f'GET /admin (cache chaud)     {warm:>9.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Banc d'essai du rendu des pages d'administration.
+
+Compare, pour chaque gabarit de src/templates/admin :
+  - 'sans cache' : analyse + compilation à chaque requête (ce que faisait
+    render_template_string avec les chaînes HTML de src/routes/admin.py) ;
+  - 'cache mémoire' : rendu avec le gabarit compilé gardé par l'environnement Jinja ;
+  - '1er rendu' / '1er rendu bytecode' : premier rendu dans un worker neuf, sans puis
+    avec le cache de bytecode sur disque (FileSystemBytecodeCache).
+
+    python scripts/benchmark_admin_templates.py --iterations 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template
+from jinja2 import FileSystemBytecodeCache
+from src.main import create_app
+from src.models.story import Story, Purchase
+from src.models.pack import Pack
+from src.services.sales_stats import PurchasePage, SALES_STATS_PERIODS
+
+
+class StaticPage(list):
+    """Page d'histoires figée (mêmes attributs que le résultat de db.paginate)"""
+    page, pages, total, has_prev, has_next = 1, 1, 0, False, False
+
+
+def sample_context(stories_count):
+    now = datetime.utcnow()
+    stories = [
+        Story(id=index, title=f'Histoire {index}', description='Banc d\'essai', duration='5:00',
+              category='Coran', price=2.99, audio_file_path='/static/audio/x.mp3')
+        for index in range(1, stories_count + 1)
+    ]
+    purchases = [
+        Purchase(id=index, user_email=f'user{index}@bench.test', pack_type='pack10', amount_paid=24.99,
+                 paypal_transaction_id=f'BENCH-{index:020d}', purchase_date=now)
+        for index in range(10)
+    ]
+    packs = [
+        Pack(id=index, pack_id=f'pack{index}', name=f'{index} Histoires', price=9.99, original_price=14.99,
+             description='Banc d\'essai', stories_count=str(index), is_active=True)
+        for index in range(1, 6)
+    ]
+    stats = {
+        'days': 30, 'since': '2025-01-01', 'until': '2025-01-30', 'computed_at': now.isoformat(), 'sales': 1000, 'revenue': 24990.0, 'unique_buyers': 800,
+        'revenue_per_day': [{'date': f'2025-01-{day:02d}', 'sales': 33, 'revenue': 824.67} for day in range(1, 31)],
+        'revenue_per_pack': [{'pack_type': 'pack10', 'sales': 1000, 'revenue': 24990.0}],
+        'top_stories': [{'story_id': story.id, 'title': story.title, 'unlocks': 50, 'revenue': 99.5}
+                        for story in stories[:10]],
+    }
+    story_page = StaticPage(stories)
+    story_page.total = len(stories)
+    return {
+        'admin/login.html': {},
+        'admin/dashboard.html': {'stats': stats, 'periods': SALES_STATS_PERIODS, 'stats_ttl': 60,
+                                 'stories': story_page, 'purchases': PurchasePage(purchases, None)},
+        'admin/story_form.html': {'story': stories[0]},
+        'admin/packs.html': {'packs': packs},
+        'admin/pack_form.html': {'pack': packs[0]},
+    }
+
+
+def per_call(function, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - started) / iterations * 1000
+
+
+def fresh_environment(app, bytecode_cache=None, cache_size=400):
+    """Environnement Jinja neuf, configuré comme celui de l'application"""
+    environment = app.create_jinja_environment()
+    environment.cache = {} if cache_size else None
+    environment.bytecode_cache = bytecode_cache
+    return environment
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Banc d\'essai des gabarits admin')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--stories', type=int, default=100, help='histoires affichées sur le tableau de bord')
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    contexts = sample_context(args.stories)
+
+    with tempfile.TemporaryDirectory() as cache_dir, app.test_request_context('/admin'):
+        bytecode_cache = FileSystemBytecodeCache(cache_dir)
+        # Remplir le cache de bytecode comme le ferait un premier worker
+        warm = fresh_environment(app, bytecode_cache)
+        for name, context in contexts.items():
+            warm.get_template(name).render(**context)
+
+        print(f'{"gabarit":<24}{"sans cache":>12}{"cache mémoire":>15}{"1er rendu":>11}{"1er rendu bytecode":>20}  (ms)')
+        for name, context in contexts.items():
+            def uncached():
+                fresh_environment(app, cache_size=0).get_template(name).render(**context)
+
+            render_template(name, **context)
+            cached = per_call(lambda: render_template(name, **context), args.iterations)
+            uncached_ms = per_call(uncached, max(1, args.iterations // 10))
+            cold = per_call(lambda: fresh_environment(app).get_template(name).render(**context), 5)
+            cold_bytecode = per_call(
+                lambda: fresh_environment(app, bytecode_cache).get_template(name).render(**context), 5
+            )
+            print(f'{name:<24}{uncached_ms:>12.2f}{cached:>15.2f}{cold:>11.2f}{cold_bytecode:>20.2f}')
+
+
+if __name__ == '__main__':
+    main()
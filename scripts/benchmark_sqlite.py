@@ -0,0 +1,161 @@
+"""Banc d'essai SQLite : lectures et écritures concurrentes, réglages par défaut vs WAL + PRAGMA.
+
+Simule plusieurs workers gunicorn (un processus chacun) sur une base temporaire :
+des lecteurs font des vérifications de droits d'accès pendant que des écrivains
+enregistrent des achats. Chaque configuration part d'une base neuve.
+
+    python scripts/benchmark_sqlite.py --readers 6 --writers 2 --duration 10
+
+Affiche pour chaque configuration les opérations par seconde, la latence p95 et le
+nombre d'erreurs 'database is locked'.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from src.models.user import db
+from src.models.story import Story, Purchase, PurchaseStory  # noqa: F401 (tables à créer)
+from src.services.database import engine_options, install_sqlite_pragmas, sqlite_pragmas
+
+CONFIGURATIONS = {
+    # Comportement historique : journal rollback, pool et délais par défaut
+    'default': {'pragmas': [('journal_mode', 'DELETE')], 'tuned_pool': False},
+    # Réglages de src/services/database.py
+    'tuned': {'pragmas': None, 'tuned_pool': True},
+}
+
+READ_QUERY = text(
+    'SELECT purchases.pack_type, purchase_stories.story_id FROM purchases '
+    'LEFT OUTER JOIN purchase_stories ON purchase_stories.purchase_id = purchases.id '
+    'WHERE purchases.user_email = :email AND purchases.is_active = 1'
+)
+
+
+def build_engine(url, configuration):
+    options = engine_options(url) if configuration['tuned_pool'] else {}
+    engine = create_engine(url, **options)
+    pragmas = configuration['pragmas'] if configuration['pragmas'] is not None else sqlite_pragmas()
+    install_sqlite_pragmas(engine, pragmas)
+    return engine
+
+
+def seed(url, configuration, users, stories):
+    engine = build_engine(url, configuration)
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(Story.__table__.insert(), [
+            {'title': f'Histoire {index}', 'description': 'Banc d\'essai', 'duration': '5:00',
+             'category': 'Bench', 'price': 2.99}
+            for index in range(stories)
+        ])
+        connection.execute(Purchase.__table__.insert(), [
+            {'user_email': f'user{index}@bench.test', 'pack_type': 'pack10', 'amount_paid': 24.99,
+             'is_active': True, 'paypal_transaction_id': f'SEED-{index}'}
+            for index in range(users)
+        ])
+        connection.execute(PurchaseStory.__table__.insert(), [
+            {'purchase_id': index + 1, 'user_email': f'user{index}@bench.test', 'story_id': story_id}
+            for index in range(users)
+            for story_id in random.sample(range(1, stories + 1), 10)
+        ])
+    engine.dispose()
+
+
+def reader(url, configuration, users, deadline, results):
+    engine = build_engine(url, configuration)
+    latencies, errors = [], 0
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            with engine.connect() as connection:
+                connection.execute(READ_QUERY, {'email': f'user{random.randrange(users)}@bench.test'}).all()
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            errors += 1
+    engine.dispose()
+    results.put(('read', latencies, errors))
+
+
+def writer(url, configuration, stories, deadline, results):
+    engine = build_engine(url, configuration)
+    latencies, errors = [], 0
+    while time.time() < deadline:
+        started = time.perf_counter()
+        email = f'buyer-{os.getpid()}-{random.random()}@bench.test'
+        try:
+            with engine.begin() as connection:
+                purchase_id = connection.execute(Purchase.__table__.insert().values(
+                    user_email=email, pack_type='pack10', amount_paid=24.99, is_active=True,
+                    paypal_transaction_id=f'BENCH-{email}'
+                )).inserted_primary_key[0]
+                connection.execute(PurchaseStory.__table__.insert(), [
+                    {'purchase_id': purchase_id, 'user_email': email, 'story_id': story_id}
+                    for story_id in random.sample(range(1, stories + 1), 10)
+                ])
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            errors += 1
+    engine.dispose()
+    results.put(('write', latencies, errors))
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def run(name, configuration, args):
+    with tempfile.TemporaryDirectory() as directory:
+        url = f'sqlite:///{os.path.join(directory, "bench.db")}'
+        seed(url, configuration, args.users, args.stories)
+
+        results = multiprocessing.Queue()
+        deadline = time.time() + args.duration
+        processes = [
+            multiprocessing.Process(target=reader, args=(url, configuration, args.users, deadline, results))
+            for _ in range(args.readers)
+        ] + [
+            multiprocessing.Process(target=writer, args=(url, configuration, args.stories, deadline, results))
+            for _ in range(args.writers)
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    for kind in ('read', 'write'):
+        latencies = [value for result_kind, values, _ in collected if result_kind == kind for value in values]
+        errors = sum(result_errors for result_kind, _, result_errors in collected if result_kind == kind)
+        print(f'{name:<10}{kind:<8}{len(latencies) / args.duration:>10.0f}'
+              f'{percentile(latencies, 0.95) * 1000:>12.2f}{errors:>10}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Banc d\'essai des réglages SQLite')
+    parser.add_argument('--readers', type=int, default=6, help='processus lecteurs')
+    parser.add_argument('--writers', type=int, default=2, help='processus écrivains')
+    parser.add_argument('--duration', type=float, default=10, help='durée par configuration (secondes)')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--stories', type=int, default=500)
+    parser.add_argument('--config', choices=sorted(CONFIGURATIONS), action='append',
+                        help='configuration à mesurer (toutes par défaut)')
+    args = parser.parse_args()
+
+    print(f'{"config":<10}{"type":<8}{"ops/s":>10}{"p95 ms":>12}{"verrous":>10}')
+    for name in args.config or CONFIGURATIONS:
+        run(name, CONFIGURATIONS[name], args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Banc d'essai du démarrage d'un worker : import + create_app(), puis première requête.
+
+Chaque mesure se fait dans un nouveau processus Python (comme un worker gunicorn
+qui démarre ou redémarre), avec le profil de configuration choisi :
+
+    python scripts/benchmark_startup.py --runs 10 --config production --path /api/packs
+
+Affiche la médiane et le maximum de chaque phase. --without-admin mesure le gain
+quand l'interface d'administration n'est pas servie par ces workers.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Exécuté dans le processus enfant : une ligne JSON avec les durées mesurées
+CHILD_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from src.main import create_app
+imported = time.perf_counter()
+app = create_app(sys.argv[1])
+created = time.perf_counter()
+response = app.test_client().get(sys.argv[2])
+finished = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'first_request': finished - created,
+    'total': finished - started,
+    'status': response.status_code,
+}))
+"""
+
+PHASES = ('import', 'create_app', 'first_request', 'total')
+
+
+def measure(args, environment):
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT, args.config, args.path],
+        cwd=ROOT, env=environment, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Banc d\'essai du démarrage des workers')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--config', default='production', help='profil de configuration')
+    parser.add_argument('--path', default='/api/packs', help='première requête servie')
+    parser.add_argument('--without-admin', action='store_true', help='ADMIN_ENABLED=false')
+    args = parser.parse_args()
+
+    environment = dict(os.environ)
+    if args.without_admin:
+        environment['ADMIN_ENABLED'] = 'false'
+
+    results = [measure(args, environment) for _ in range(args.runs)]
+    statuses = sorted({result['status'] for result in results})
+    print(f'{args.runs} démarrage(s), profil {args.config}, {args.path} -> HTTP {statuses}')
+    print(f'{"phase":<15}{"médiane ms":>12}{"max ms":>10}')
+    for phase in PHASES:
+        values = [result[phase] * 1000 for result in results]
+        print(f'{phase:<15}{statistics.median(values):>12.1f}{max(values):>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""Serveur PayPal factice pour tester et charger le checkout en local.
+
+Implémente les endpoints utilisés par src/routes/paypal.py :
+  POST /v1/oauth2/token
+  POST /v2/checkout/orders
+  POST /v2/checkout/orders/<id>/capture
+  GET  /v2/checkout/orders/<id>
+  POST /v1/notifications/verify-webhook-signature (toujours SUCCESS)
+
+Avec --webhook-url, chaque capture envoie aussi un PAYMENT.CAPTURE.COMPLETED
+(après --webhook-delay-ms), comme le ferait PayPal.
+
+Latence et erreurs injectables au lancement ou à chaud via POST /__config.
+
+Exemple :
+    python scripts/fake_paypal.py --port 8765 --latency-ms 300 --jitter-ms 100 --error-rate 0.02
+    PAYPAL_BASE_URL=http://127.0.0.1:8765 python app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ORDER_PATH = re.compile(r'^/v2/checkout/orders/([A-Za-z0-9_-]+)$')
+CAPTURE_PATH = re.compile(r'^/v2/checkout/orders/([A-Za-z0-9_-]+)/capture$')
+
+
+class FakePayPalState:
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, error_status=503, token_ttl=32400,
+                 webhook_url=None, webhook_delay_ms=0):
+        self.webhook_url = webhook_url
+        self.webhook_delay_ms = webhook_delay_ms
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.token_ttl = token_ttl
+        self.orders = {}
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+
+class FakePayPalHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakePayPal/1.0'
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        try:
+            return json.loads(raw) if raw else {}
+        except ValueError:
+            return {}
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate_network(self, endpoint):
+        """Appliquer la latence configurée ; renvoie True si une erreur est injectée"""
+        self.state.count(endpoint)
+        delay = self.state.latency_ms + random.uniform(-self.state.jitter_ms, self.state.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        if self.state.error_rate and random.random() < self.state.error_rate:
+            self.state.count(f'{endpoint}:error')
+            self._send_json(self.state.error_status, {
+                'name': 'SERVICE_UNAVAILABLE',
+                'message': 'Erreur injectée par le serveur factice'
+            })
+            return True
+        return False
+
+    def _authorized(self):
+        if not self.headers.get('Authorization', '').startswith('Bearer fake-'):
+            self._send_json(401, {'error': 'invalid_token'})
+            return False
+        return True
+
+    def do_POST(self):
+        if self.path == '/__config':
+            return self._configure()
+        if self.path == '/v1/oauth2/token':
+            self._read_json()
+            if self._simulate_network('oauth'):
+                return
+            return self._send_json(200, {
+                'access_token': f'fake-{uuid.uuid4().hex}',
+                'token_type': 'Bearer',
+                'expires_in': self.state.token_ttl
+            })
+
+        if self.path == '/v1/notifications/verify-webhook-signature':
+            self._read_json()
+            if not self._authorized():
+                return
+            return self._send_json(200, {'verification_status': 'SUCCESS'})
+
+        if self.path == '/v2/checkout/orders':
+            payload = self._read_json()
+            if not self._authorized() or self._simulate_network('create_order'):
+                return
+            order_id = uuid.uuid4().hex[:17].upper()
+            order = {
+                'id': order_id,
+                'status': 'CREATED',
+                'intent': payload.get('intent', 'CAPTURE'),
+                'purchase_units': payload.get('purchase_units', []),
+                'links': [
+                    {'rel': 'self', 'href': f'/v2/checkout/orders/{order_id}', 'method': 'GET'},
+                    {'rel': 'approve', 'href': f'https://www.sandbox.paypal.com/checkoutnow?token={order_id}', 'method': 'GET'},
+                    {'rel': 'capture', 'href': f'/v2/checkout/orders/{order_id}/capture', 'method': 'POST'}
+                ]
+            }
+            with self.state.lock:
+                self.state.orders[order_id] = order
+            return self._send_json(201, order)
+
+        match = CAPTURE_PATH.match(self.path)
+        if match:
+            self._read_json()
+            if not self._authorized() or self._simulate_network('capture_order'):
+                return
+            with self.state.lock:
+                order = self.state.orders.get(match.group(1))
+                if order is None:
+                    return self._send_json(404, {'name': 'RESOURCE_NOT_FOUND'})
+                if order['status'] == 'COMPLETED':
+                    return self._send_json(422, {'name': 'UNPROCESSABLE_ENTITY', 'details': [{'issue': 'ORDER_ALREADY_CAPTURED'}]})
+                order['status'] = 'COMPLETED'
+                amount = (order['purchase_units'] or [{}])[0].get('amount', {'currency_code': 'EUR', 'value': '0.00'})
+                order['purchase_units'] = [{
+                    **(order['purchase_units'] or [{}])[0],
+                    'payments': {'captures': [{
+                        'id': uuid.uuid4().hex[:17].upper(),
+                        'status': 'COMPLETED',
+                        'amount': amount
+                    }]}
+                }]
+            if self.state.webhook_url:
+                threading.Thread(target=self._send_webhook, args=(order,), daemon=True).start()
+            return self._send_json(201, order)
+
+        self._send_json(404, {'name': 'NOT_FOUND'})
+
+    def _send_webhook(self, order):
+        time.sleep(self.state.webhook_delay_ms / 1000.0)
+        purchase_unit = order['purchase_units'][0]
+        capture = purchase_unit['payments']['captures'][0]
+        event = {
+            'id': f'WH-{uuid.uuid4().hex[:17].upper()}',
+            'event_type': 'PAYMENT.CAPTURE.COMPLETED',
+            'resource': {
+                'id': capture['id'],
+                'status': 'COMPLETED',
+                'amount': capture['amount'],
+                'custom_id': purchase_unit.get('custom_id'),
+                'supplementary_data': {'related_ids': {'order_id': order['id']}}
+            }
+        }
+        request = urllib.request.Request(
+            self.state.webhook_url,
+            data=json.dumps(event).encode('utf-8'),
+            headers={'Content-Type': 'application/json', 'PAYPAL-TRANSMISSION-ID': event['id']},
+            method='POST'
+        )
+        try:
+            urllib.request.urlopen(request, timeout=10).close()
+            self.state.count('webhook')
+        except OSError:
+            self.state.count('webhook:error')
+
+    def do_GET(self):
+        if self.path == '/__stats':
+            with self.state.lock:
+                return self._send_json(200, {'counters': dict(self.state.counters), 'orders': len(self.state.orders)})
+        match = ORDER_PATH.match(self.path)
+        if match:
+            if not self._authorized() or self._simulate_network('get_order'):
+                return
+            with self.state.lock:
+                order = self.state.orders.get(match.group(1))
+            if order is None:
+                return self._send_json(404, {'name': 'RESOURCE_NOT_FOUND'})
+            return self._send_json(200, order)
+        self._send_json(404, {'name': 'NOT_FOUND'})
+
+    def _configure(self):
+        payload = self._read_json()
+        for key in ('latency_ms', 'jitter_ms', 'error_rate', 'error_status', 'token_ttl'):
+            if key in payload:
+                setattr(self.state, key, type(getattr(self.state, key))(payload[key]))
+        self._send_json(200, {
+            'latency_ms': self.state.latency_ms,
+            'jitter_ms': self.state.jitter_ms,
+            'error_rate': self.state.error_rate,
+            'error_status': self.state.error_status,
+            'token_ttl': self.state.token_ttl
+        })
+
+
+def make_server(host='127.0.0.1', port=8765, **options):
+    server = ThreadingHTTPServer((host, port), FakePayPalHandler)
+    server.daemon_threads = True
+    server.state = FakePayPalState(**options)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serveur PayPal factice (OAuth + /v2/checkout/orders)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0, help='latence ajoutée à chaque appel')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='variation aléatoire de la latence (±)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='proportion de réponses en erreur (0-1)')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--token-ttl', type=int, default=32400, help='expires_in des tokens OAuth')
+    parser.add_argument('--webhook-url', help='ex: http://127.0.0.1:5000/api/paypal/webhook')
+    parser.add_argument('--webhook-delay-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    server = make_server(
+        args.host, args.port,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, error_status=args.error_status, token_ttl=args.token_ttl,
+        webhook_url=args.webhook_url, webhook_delay_ms=args.webhook_delay_ms
+    )
+    print(f'PayPal factice sur http://{args.host}:{args.port} (PAYPAL_BASE_URL)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Test de charge du parcours d'achat : create-payment -> capture-payment -> check-access.
+
+Lancer l'API contre le serveur PayPal factice, puis ce script :
+    python scripts/fake_paypal.py --latency-ms 400 &
+    PAYPAL_BASE_URL=http://127.0.0.1:8765 gunicorn -w 4 app:app &
+    python scripts/load_test_checkout.py --base-url http://127.0.0.1:8000 --users 20 --iterations 10
+
+Affiche p50/p95/p99, erreurs et débit par endpoint. Avec --async-capture, la capture
+est mise en file d'attente (202) puis /api/capture-status est interrogé jusqu'à la fin.
+"""
+import argparse
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+ENDPOINTS = ('create-payment', 'capture-payment', 'capture-status', 'check-access')
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {name: [] for name in ENDPOINTS}
+        self.errors = {name: 0 for name in ENDPOINTS}
+
+    def record(self, name, elapsed, ok):
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            if not ok:
+                self.errors[name] += 1
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float('nan')
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def timed(recorder, name, call):
+    started = time.perf_counter()
+    try:
+        response = call()
+        ok = response.status_code < 400 and response.json().get('success', False)
+    except (requests.RequestException, ValueError):
+        response, ok = None, False
+    recorder.record(name, time.perf_counter() - started, ok)
+    return response if ok else None
+
+
+def checkout_flow(session, args, recorder):
+    user_email = f'load-{uuid.uuid4().hex[:12]}@example.test'
+    purchase = {'pack_type': args.pack_type, 'user_email': user_email, 'story_id': args.story_id}
+
+    response = timed(recorder, 'create-payment', lambda: session.post(
+        f'{args.base_url}/api/create-payment',
+        json={'pack_id': args.pack_type, 'user_email': user_email, 'amount': args.amount, 'story_id': args.story_id},
+        timeout=args.timeout
+    ))
+    if response is None:
+        return
+
+    order_id = response.json()['order_id']
+    response = timed(recorder, 'capture-payment', lambda: session.post(
+        f'{args.base_url}/api/capture-payment',
+        json={'order_id': order_id, 'purchase_data': purchase, 'async': args.async_capture},
+        timeout=args.timeout
+    ))
+    if response is None:
+        return
+
+    deadline = time.monotonic() + args.timeout
+    while args.async_capture and response.json().get('status') != 'completed':
+        if time.monotonic() > deadline or response.json().get('status') == 'failed':
+            recorder.record('capture-status', 0, False)
+            return
+        time.sleep(args.poll_interval)
+        response = timed(recorder, 'capture-status', lambda: session.get(
+            f'{args.base_url}/api/capture-status/{order_id}', timeout=args.timeout
+        ))
+        if response is None:
+            return
+
+    timed(recorder, 'check-access', lambda: session.get(
+        f'{args.base_url}/api/check-access',
+        params={'email': user_email, 'story_id': args.story_id},
+        timeout=args.timeout
+    ))
+
+
+def run_user(args, recorder):
+    with requests.Session() as session:
+        for _ in range(args.iterations):
+            checkout_flow(session, args, recorder)
+
+
+def report(recorder, wall_time):
+    print(f'{"endpoint":<18}{"requêtes":>9}{"erreurs":>9}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"req/s":>10}')
+    for name in ENDPOINTS:
+        values = sorted(recorder.latencies[name])
+        print(f'{name:<18}{len(values):>9}{recorder.errors[name]:>9}'
+              f'{percentile(values, 0.50) * 1000:>10.1f}'
+              f'{percentile(values, 0.95) * 1000:>10.1f}'
+              f'{percentile(values, 0.99) * 1000:>10.1f}'
+              f'{len(values) / wall_time:>10.1f}')
+    flows = len(recorder.latencies['check-access'])
+    all_values = [value for values in recorder.latencies.values() for value in values]
+    mean = statistics.mean(all_values) * 1000 if all_values else float('nan')
+    print(f'\n{flows} parcours complets en {wall_time:.2f}s ({flows / wall_time:.1f}/s), latence moyenne {mean:.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Test de charge du checkout PayPal')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--users', type=int, default=10, help='utilisateurs simultanés')
+    parser.add_argument('--iterations', type=int, default=10, help='parcours par utilisateur')
+    parser.add_argument('--pack-type', default='single')
+    parser.add_argument('--amount', default='2.99')
+    parser.add_argument('--story-id', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--async-capture', action='store_true', help='capture différée + interrogation du statut')
+    parser.add_argument('--poll-interval', type=float, default=0.2)
+    args = parser.parse_args()
+    args.base_url = args.base_url.rstrip('/')
+
+    recorder = Recorder()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as executor:
+        for _ in range(args.users):
+            executor.submit(run_user, args, recorder)
+    report(recorder, time.perf_counter() - started)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import os
+import tempfile
+
+# Empreinte précalculée de l'ancien mot de passe par défaut ('admin123') : le hachage
+# scrypt n'est plus recalculé à chaque démarrage de worker. En production, fournir
+# ADMIN_PASSWORD_HASH (généré par 'flask --app app hash-password').
+DEFAULT_ADMIN_PASSWORD_HASH = (
+    'scrypt:32768:8:1$YW2OG6NebtKbylsD$725f72c4b9f38ec9f6880d766917bb50ae9d727529dca9456ce9ed3c1e37f75c'
+    '6b232ea6bfd5cc30a02c9fda53c46b8ef8c53fc3dbd75be5d1d3dc4fa30b122d'
+)
+
+
+class Config:
+    """Configuration commune à tous les profils"""
+    SECRET_KEY = os.getenv('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
+    ADMIN_PASSWORD_HASH = os.getenv('ADMIN_PASSWORD_HASH', DEFAULT_ADMIN_PASSWORD_HASH)
+    # Interface d'administration : son module n'est importé que si elle est activée
+    ADMIN_ENABLED = os.getenv('ADMIN_ENABLED', 'true').lower() != 'false'
+    # Lecture de schema_migrations au démarrage pour signaler les migrations en attente
+    CHECK_PENDING_MIGRATIONS = os.getenv('CHECK_PENDING_MIGRATIONS', 'true').lower() != 'false'
+    # Bytecode Jinja compilé sur disque, partagé par les workers (vide : désactivé). Par défaut
+    # hors du code de l'application, qui peut être déployé en lecture seule
+    TEMPLATE_BYTECODE_CACHE_DIR = os.getenv(
+        'TEMPLATE_BYTECODE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'histoires-templates-cache')
+    )
+    CORS_ORIGINS = [
+        'https://leshisoiresdetontonyahya.vercel.app',
+        'https://leshisoiresdetontonyahya-*.vercel.app',
+        'http://localhost:3000',
+        'http://localhost:5173',
+        'http://localhost:5000'
+    ]
+    DEBUG = False
+    TESTING = False
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+
+class ProductionConfig(Config):
+    # Les workers démarrent sans toucher à la base ; 'flask migrate' fait partie du déploiement
+    CHECK_PENDING_MIGRATIONS = os.getenv('CHECK_PENDING_MIGRATIONS', 'false').lower() == 'true'
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL', 'sqlite://')
+    TEMPLATE_BYTECODE_CACHE_DIR = None
+    CHECK_PENDING_MIGRATIONS = False
+
+
+CONFIG_PROFILES = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
+
+# Profil utilisé par create_app() quand aucun n'est précisé
+APP_CONFIG = os.getenv('APP_CONFIG', 'production')
@@ -1,60 +1,194 @@
 import os
 import sys
+import click
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask, send_from_directory, request, abort
+from werkzeug.security import generate_password_hash, safe_join
+from jinja2 import FileSystemBytecodeCache
 from flask_cors import CORS
 from src.models.user import db
-from src.models.story import Story, Purchase
+from src.models.story import Story, Purchase, PurchaseStory
 from src.models.pack import Pack
+from src.models.audio import AudioJob, AudioRendition, AudioBlob
+from src.models.payment import CaptureJob, IdempotencyRecord, Order
+from src.models.credits import CreditAccount, CreditLedgerEntry
+from src.models.migration import SchemaMigration
+from src.models.sales import SalesDaily, StorySalesDaily, BuyerDay
 from src.routes.user import user_bp
 from src.routes.stories import stories_bp
 from src.routes.paypal import paypal_bp
-from src.routes.admin import admin_bp
 from src.routes.packs import packs_bp
+from src.services.audio_delivery import AUDIO_REQUIRE_SIGNED_URLS, in_audio_folder
+from src.services.audio_processing import process_pending_audio_jobs
+from src.services.audio_store import collect_audio_garbage
+from src.services.checkout import process_pending_capture_jobs
+from src.services.idempotency import collect_expired_idempotency_records
+from src.services.uploads import collect_expired_uploads
+from src.services.database import configure_database
+from src.services.migrations import run_migrations, pending_migrations, current_version, check_query_plans
+from src.services.sales_rollups import rebuild_rollups
+from src.config import CONFIG_PROFILES, APP_CONFIG
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-
-# Activer CORS pour permettre les requêtes depuis le frontend
-CORS(app, origins=[
-    'https://leshisoiresdetontonyahya.vercel.app',
-    'https://leshisoiresdetontonyahya-*.vercel.app',
-    'http://localhost:3000',
-    'http://localhost:5173',
-    'http://localhost:5000'
-])
-
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(stories_bp, url_prefix='/api')
-app.register_blueprint(paypal_bp, url_prefix='/api')
-app.register_blueprint(packs_bp, url_prefix='/api')
-app.register_blueprint(admin_bp)
-
-# Configuration de la base de données
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-with app.app_context():
-    db.create_all()
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
+def create_app(config_name=None):
+    """Créer l'application (profils : development, production, testing)"""
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config.from_object(CONFIG_PROFILES[config_name or APP_CONFIG])
+    configure_templates(app)
+    
+    # Activer CORS pour permettre les requêtes depuis le frontend
+    CORS(app, origins=app.config['CORS_ORIGINS'])
+    
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(stories_bp, url_prefix='/api')
+    app.register_blueprint(paypal_bp, url_prefix='/api')
+    app.register_blueprint(packs_bp, url_prefix='/api')
+    if app.config['ADMIN_ENABLED']:
+        # Import différé : les gros gabarits de l'admin ne sont chargés que si elle est servie
+        from src.routes.admin import admin_bp
+        app.register_blueprint(admin_bp)
+    
+    # Configuration de la base de données (DATABASE_URL, pool, PRAGMA SQLite)
+    configure_database(app, db)
+    # Le schéma est géré par 'flask migrate' (une fois par déploiement), pas à l'import de chaque worker
+    if app.config['CHECK_PENDING_MIGRATIONS']:
+        with app.app_context():
+            if pending_migrations():
+                app.logger.warning("Migrations de schéma en attente : lancer 'flask --app app migrate'")
+    
+    register_commands(app)
+    register_static_routes(app)
+    return app
+
+def configure_templates(app):
+    """Gabarits compilés une fois par worker, bytecode partagé sur disque entre workers"""
+    cache_dir = app.config.get('TEMPLATE_BYTECODE_CACHE_DIR')
+    if not cache_dir:
+        return
+    try:
+        # Dossier privé : le bytecode qui s'y trouve est exécuté tel quel
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        if not os.access(cache_dir, os.W_OK):
+            raise PermissionError('dossier non accessible en écriture')
+        if hasattr(os, 'getuid') and os.stat(cache_dir).st_uid != os.getuid():
+            raise PermissionError('dossier appartenant à un autre utilisateur')
+    except OSError as e:
+        # Déploiement en lecture seule : les gabarits restent compilés une fois par worker
+        app.logger.warning("Cache de bytecode des gabarits désactivé (%s) : %s", cache_dir, e)
+        return
+    # jinja_options est lu à la création (paresseuse) de l'environnement Jinja
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(cache_dir)}
+
+def register_commands(app):
+    """Commandes d'exploitation (flask --app app <commande>)"""
+    @app.cli.command('backfill-entitlements')
+    def backfill_entitlements():
+        """Migrer les blobs JSON Purchase.story_ids vers purchase_stories (migration 8, relançable)"""
+        migrated_purchases, created_rows = PurchaseStory.backfill_from_purchases()
+        print(f"{migrated_purchases} achat(s) migré(s), {created_rows} droit(s) d'accès créé(s)")
+
+    @app.cli.command('process-audio-jobs')
+    def process_audio_jobs():
+        """Traiter les fichiers audio en attente (durée, version mobile)"""
+        processed = process_pending_audio_jobs()
+        print(f"{processed} fichier(s) audio traité(s)")
+
+    @app.cli.command('process-capture-jobs')
+    def process_capture_jobs():
+        """Relancer les captures PayPal en attente ou bloquées (après un redémarrage)"""
+        processed = process_pending_capture_jobs()
+        print(f"{processed} capture(s) PayPal terminée(s)")
+
+    @app.cli.command('gc-audio')
+    def gc_audio():
+        """Supprimer les fichiers audio inutilisés et les uploads abandonnés"""
+        removed = collect_audio_garbage()
+        print(f"{removed} fichier(s) audio supprimé(s)")
+        expired = collect_expired_uploads()
+        print(f"{expired} upload(s) abandonné(s) supprimé(s)")
+
+    @app.cli.command('gc-idempotency')
+    def gc_idempotency():
+        """Supprimer les clés d'idempotence expirées"""
+        removed = collect_expired_idempotency_records()
+        print(f"{removed} clé(s) d'idempotence supprimée(s)")
+
+    @app.cli.command('migrate')
+    @click.option('--target', type=int, default=None, help='Version maximale à appliquer')
+    def migrate(target):
+        """Appliquer les migrations de schéma en attente puis vérifier les plans de requêtes"""
+        for item in run_migrations(target):
+            print(f"Migration {item.version} appliquée : {item.name}")
+        print(f"Version du schéma : {current_version()}")
+        if any(problems for _, _, _, problems in check_query_plans()):
+            raise click.ClickException("Parcours complet de table détecté : lancer 'flask check-query-plans'")
+
+    @app.cli.command('schema-version')
+    def schema_version():
+        """Afficher la version du schéma et les migrations en attente"""
+        print(f"Version du schéma : {current_version()}")
+        for item in pending_migrations():
+            print(f"En attente : {item.version} {item.name}")
+
+    @app.cli.command('check-query-plans')
+    def check_query_plans_command():
+        """Vérifier (EXPLAIN QUERY PLAN) que les requêtes fréquentes utilisent un index"""
+        failures = 0
+        for item, check, plan, problems in check_query_plans():
+            print(f"[{'ÉCHEC' if problems else 'OK'}] {item.version} {check.description}")
+            for detail in plan:
+                print(f"    {detail}")
+            failures += bool(problems)
+        if failures:
+            raise click.ClickException(f"{failures} requête(s) sans index")
+
+    @app.cli.command('rebuild-sales-rollups')
+    @click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Premier jour à recalculer (AAAA-MM-JJ) ; tout l\'historique par défaut')
+    def rebuild_sales_rollups(since):
+        """Recalculer les tables de ventes par jour depuis les achats (remplissage, réparation)"""
+        rows = rebuild_rollups(since.date() if since else None)
+        db.session.commit()
+        print(f"{rows} ligne(s) de ventes par jour et par pack recalculée(s)")
+
+    @app.cli.command('hash-password')
+    @click.password_option()
+    def hash_password(password):
+        """Générer une valeur pour ADMIN_PASSWORD_HASH (hachée une fois, hors démarrage)"""
+        print(generate_password_hash(password))
+
+def register_static_routes(app):
+    """Fichiers statiques et application front (index.html)"""
+    @app.before_request
+    def block_unsigned_audio():
+        """Interdire l'accès direct aux fichiers audio quand les URLs signées sont obligatoires"""
+        # Chemin résolu comme le fait la route statique (/static/./audio/x.mp3, /static//audio/...)
+        if AUDIO_REQUIRE_SIGNED_URLS and request.endpoint == 'static':
+            file_path = safe_join(app.static_folder, request.view_args.get('filename', ''))
+            if file_path is None or in_audio_folder(file_path):
+                abort(403)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        static_folder_path = app.static_folder
+        if static_folder_path is None:
+                return "Static folder not configured", 404
+
+        file_path = safe_join(static_folder_path, path) if path != "" else None
+        if file_path is not None and in_audio_folder(file_path):
+            # Les fichiers audio ne sont servis que par /static/audio (ancien accès) ou les URLs signées
+            abort(403)
+        if file_path is not None and os.path.exists(file_path):
+            return send_from_directory(static_folder_path, path)
         else:
-            return "index.html not found", 404
+            index_path = os.path.join(static_folder_path, 'index.html')
+            if os.path.exists(index_path):
+                return send_from_directory(static_folder_path, 'index.html')
+            else:
+                return "index.html not found", 404
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    create_app('development').run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,80 @@
+from src.models.user import db
+from datetime import datetime
+
+class AudioJob(db.Model):
+    """File d'attente locale des traitements audio (durée, version mobile)"""
+    __tablename__ = 'audio_jobs'
+    __table_args__ = (
+        db.Index('ix_audio_jobs_status_id', 'status', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    story_id = db.Column(db.Integer, nullable=False)
+    source_path = db.Column(db.String(500), nullable=False)  # Format: "/static/audio/x.wav"
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'running', 'done', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'story_id': self.story_id,
+            'source_path': self.source_path,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class AudioRendition(db.Model):
+    """Version dérivée d'un fichier audio (ex: basse qualité pour mobile)"""
+    __tablename__ = 'audio_renditions'
+    __table_args__ = (
+        db.UniqueConstraint('story_id', 'variant', name='uq_audio_renditions_story_variant'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    story_id = db.Column(db.Integer, nullable=False)
+    variant = db.Column(db.String(20), nullable=False)  # 'mobile'
+    audio_file_path = db.Column(db.String(500), nullable=False)
+    bitrate = db.Column(db.String(20), nullable=True)  # Format: "64k"
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'story_id': self.story_id,
+            'variant': self.variant,
+            'audio_file_path': self.audio_file_path,
+            'bitrate': self.bitrate,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class AudioBlob(db.Model):
+    """Fichier audio adressé par son contenu (SHA-256), partagé entre histoires"""
+    __tablename__ = 'audio_blobs'
+    __table_args__ = (
+        db.Index('ix_audio_blobs_ref_count_released_at', 'ref_count', 'released_at'),
+    )
+    
+    sha256 = db.Column(db.String(64), primary_key=True)
+    audio_file_path = db.Column(db.String(500), unique=True, nullable=False)  # Format: "/static/audio/<sha256>.mp3"
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)  # Nombre d'histoires qui l'utilisent
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    released_at = db.Column(db.DateTime, nullable=True)  # Dernier passage à 0 référence
+    
+    def to_dict(self):
+        return {
+            'sha256': self.sha256,
+            'audio_file_path': self.audio_file_path,
+            'size': self.size,
+            'ref_count': self.ref_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'released_at': self.released_at.isoformat() if self.released_at else None
+        }
@@ -0,0 +1,43 @@
+from src.models.user import db
+from datetime import datetime
+
+class CreditAccount(db.Model):
+    """Solde de crédits d'histoires d'un utilisateur (lecture O(1) par email)"""
+    __tablename__ = 'credit_accounts'
+    
+    user_email = db.Column(db.String(200), primary_key=True)
+    balance = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'user_email': self.user_email,
+            'balance': self.balance,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class CreditLedgerEntry(db.Model):
+    """Mouvement de crédits : +N à l'achat d'un pack, -1 au déblocage d'une histoire"""
+    __tablename__ = 'credit_ledger'
+    __table_args__ = (
+        db.Index('ix_credit_ledger_email_id', 'user_email', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_email = db.Column(db.String(200), nullable=False)
+    delta = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(20), nullable=False)  # 'grant', 'spend'
+    purchase_id = db.Column(db.Integer, db.ForeignKey('purchases.id', ondelete='CASCADE'), nullable=False)
+    story_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_email': self.user_email,
+            'delta': self.delta,
+            'reason': self.reason,
+            'purchase_id': self.purchase_id,
+            'story_id': self.story_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
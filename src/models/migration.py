@@ -0,0 +1,17 @@
+from src.models.user import db
+from datetime import datetime
+
+class SchemaMigration(db.Model):
+    """Migration de schéma appliquée (une ligne par version)"""
+    __tablename__ = 'schema_migrations'
+    
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'name': self.name,
+            'applied_at': self.applied_at.isoformat() if self.applied_at else None
+        }
@@ -3,6 +3,9 @@ from datetime import datetime
 
 class Pack(db.Model):
     __tablename__ = 'packs'
+    __table_args__ = (
+        db.Index('ix_packs_is_active', 'is_active'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     pack_id = db.Column(db.String(50), unique=True, nullable=False)  # 'single', 'pack10', etc.
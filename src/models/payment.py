@@ -0,0 +1,95 @@
+from src.models.user import db
+from datetime import datetime
+import json
+
+class CaptureJob(db.Model):
+    """Capture PayPal différée, traitée en arrière-plan (le client interroge son statut)"""
+    __tablename__ = 'capture_jobs'
+    __table_args__ = (
+        db.Index('ix_capture_jobs_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.String(200), unique=True, nullable=False)
+    purchase_data = db.Column(db.Text, nullable=True)  # JSON : user_email, pack_type, story_id
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'running', 'completed', 'failed'
+    purchase_id = db.Column(db.Integer, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    # En attente : pas de tentative avant cette date ; en cours : fin du bail du worker
+    next_attempt_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def get_purchase_data(self):
+        return json.loads(self.purchase_data) if self.purchase_data else {}
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'order_id': self.order_id,
+            'status': self.status,
+            'purchase_id': self.purchase_id,
+            'attempts': self.attempts,
+            'error': self.error,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class IdempotencyRecord(db.Model):
+    """Réponse mémorisée pour un en-tête Idempotency-Key (rejouée en cas de retry)"""
+    __tablename__ = 'idempotency_records'
+    __table_args__ = (
+        db.Index('ix_idempotency_records_created_at', 'created_at'),
+    )
+    
+    key = db.Column(db.String(200), primary_key=True)
+    endpoint = db.Column(db.String(100), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='in_progress')  # 'in_progress', 'completed'
+    status_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)  # Début du bail pour 'in_progress'
+
+class Order(db.Model):
+    """Commande PayPal créée par create-payment (source de vérité pour la capture et le statut)"""
+    __tablename__ = 'orders'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.String(200), unique=True, nullable=False)
+    user_email = db.Column(db.String(200), nullable=False)
+    pack_type = db.Column(db.String(50), nullable=False)
+    story_id = db.Column(db.Integer, nullable=True)
+    allocation = db.Column(db.Text, nullable=True)  # JSON : stratégie d'attribution des histoires du pack
+    amount = db.Column(db.Float, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default='EUR')
+    status = db.Column(db.String(30), nullable=False, default='CREATED')  # statut PayPal : CREATED, APPROVED, COMPLETED, VOIDED...
+    purchase_id = db.Column(db.Integer, nullable=True)
+    paypal_checked_at = db.Column(db.DateTime, default=datetime.utcnow)  # dernière synchronisation avec PayPal
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def get_purchase_data(self):
+        return {
+            'user_email': self.user_email,
+            'pack_type': self.pack_type,
+            'story_id': self.story_id,
+            'allocation': json.loads(self.allocation) if self.allocation else None
+        }
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'order_id': self.order_id,
+            'user_email': self.user_email,
+            'pack_type': self.pack_type,
+            'story_id': self.story_id,
+            'amount': self.amount,
+            'currency': self.currency,
+            'status': self.status,
+            'purchase_id': self.purchase_id,
+            'paypal_checked_at': self.paypal_checked_at.isoformat() if self.paypal_checked_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,42 @@
+from src.models.user import db
+
+class SalesDaily(db.Model):
+    """Ventes cumulées par jour et par pack (tenues à jour à chaque achat)"""
+    __tablename__ = 'sales_daily'
+    
+    day = db.Column(db.Date, primary_key=True)
+    pack_type = db.Column(db.String(50), primary_key=True)
+    sales = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat(),
+            'pack_type': self.pack_type,
+            'sales': self.sales,
+            'revenue': self.revenue
+        }
+
+class StorySalesDaily(db.Model):
+    """Déblocages et revenu attribué par jour et par histoire"""
+    __tablename__ = 'story_sales_daily'
+    
+    day = db.Column(db.Date, primary_key=True)
+    story_id = db.Column(db.Integer, primary_key=True)
+    unlocks = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat(),
+            'story_id': self.story_id,
+            'unlocks': self.unlocks,
+            'revenue': self.revenue
+        }
+
+class BuyerDay(db.Model):
+    """Jours où un acheteur a acheté : les acheteurs uniques d'une période ne s'additionnent pas"""
+    __tablename__ = 'buyer_days'
+    
+    day = db.Column(db.Date, primary_key=True)
+    user_email = db.Column(db.String(200), primary_key=True)
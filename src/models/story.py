@@ -1,8 +1,14 @@
 from src.models.user import db
 from datetime import datetime
+import json
 
 class Story(db.Model):
     __tablename__ = 'stories'
+    __table_args__ = (
+        # Catalogue trié par nouveauté (pagination par curseur), filtré ou non par catégorie
+        db.Index('ix_stories_created_id', 'created_at', 'id'),
+        db.Index('ix_stories_category_created_id', 'category', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -22,13 +28,25 @@ class Story(db.Model):
             'duration': self.duration,
             'category': self.category,
             'price': self.price,
-            'audio_file_path': self.audio_file_path,
+            'has_audio': bool(self.audio_file_path),
             'is_premium': self.is_premium,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
 class Purchase(db.Model):
     __tablename__ = 'purchases'
+    __table_args__ = (
+        # Un achat par transaction PayPal : les retries ne créent pas de doublons (NULL autorisé)
+        db.Index('ux_purchases_paypal_transaction_id', 'paypal_transaction_id', unique=True),
+        # Droits d'accès et achats d'un utilisateur
+        db.Index('ix_purchases_email_active', 'user_email', 'is_active'),
+        # Statistiques par pack et par période
+        db.Index('ix_purchases_pack_type_date', 'pack_type', 'purchase_date'),
+        # pack_type et amount_paid inclus : les agrégats de ventes de l'admin sont lus dans l'index seul
+        db.Index('ix_purchases_active_date', 'is_active', 'purchase_date', 'pack_type', 'amount_paid'),
+        # Liste paginée des achats de l'admin (keyset date puis id)
+        db.Index('ix_purchases_date_id', 'purchase_date', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_email = db.Column(db.String(200), nullable=False)
@@ -37,6 +55,7 @@ class Purchase(db.Model):
     amount_paid = db.Column(db.Float, nullable=False)
     paypal_transaction_id = db.Column(db.String(200), nullable=True)
     purchase_date = db.Column(db.DateTime, default=datetime.utcnow)
+    # Désactivation : relancer 'flask rebuild-sales-rollups --since <jour>' (rollups de ventes)
     is_active = db.Column(db.Boolean, default=True)
     
     def to_dict(self):
@@ -50,4 +69,122 @@ class Purchase(db.Model):
             'purchase_date': self.purchase_date.isoformat() if self.purchase_date else None,
             'is_active': self.is_active
         }
+    
+    @staticmethod
+    def ensure_unique_transaction_index():
+        """Créer l'index unique sur paypal_transaction_id dans une base existante
+
+        Les doublons déjà présents sont conservés mais renommés (suffixe -DUP-<id>).
+        """
+        duplicated_ids = db.session.scalars(
+            db.select(Purchase.paypal_transaction_id)
+            .where(Purchase.paypal_transaction_id.isnot(None))
+            .group_by(Purchase.paypal_transaction_id)
+            .having(db.func.count(Purchase.id) > 1)
+        ).all()
+        
+        renamed = 0
+        try:
+            for transaction_id in duplicated_ids:
+                duplicates = Purchase.query.filter_by(paypal_transaction_id=transaction_id).order_by(Purchase.id).all()
+                for purchase in duplicates[1:]:
+                    purchase.paypal_transaction_id = f'{transaction_id}-DUP-{purchase.id}'
+                    renamed += 1
+            db.session.flush()
+            
+            unique_index = next(
+                index for index in Purchase.__table__.indexes
+                if index.name == 'ux_purchases_paypal_transaction_id'
+            )
+            unique_index.create(db.session.connection(), checkfirst=True)
+            db.session.commit()
+            return renamed
+        except Exception:
+            db.session.rollback()
+            raise
 
+class PurchaseStory(db.Model):
+    """Droit d'accès normalisé : une ligne par (achat, histoire)"""
+    __tablename__ = 'purchase_stories'
+    __table_args__ = (
+        db.Index('ix_purchase_stories_email_story', 'user_email', 'story_id'),
+        db.UniqueConstraint('purchase_id', 'story_id', name='uq_purchase_stories_purchase_story'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    purchase_id = db.Column(db.Integer, db.ForeignKey('purchases.id', ondelete='CASCADE'), nullable=False)
+    user_email = db.Column(db.String(200), nullable=False)
+    story_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'purchase_id': self.purchase_id,
+            'user_email': self.user_email,
+            'story_id': self.story_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    @staticmethod
+    def decode_story_ids(raw_story_ids):
+        """Convertir le champ story_ids (chaîne JSON ou liste) en liste d'entiers uniques"""
+        if not raw_story_ids:
+            return []
+        if isinstance(raw_story_ids, str):
+            try:
+                raw_story_ids = json.loads(raw_story_ids)
+            except ValueError:
+                return []
+        if not isinstance(raw_story_ids, (list, tuple)):
+            raw_story_ids = [raw_story_ids]
+        
+        story_ids = []
+        for story_id in raw_story_ids:
+            try:
+                story_id = int(story_id)
+            except (TypeError, ValueError):
+                continue
+            if story_id not in story_ids:
+                story_ids.append(story_id)
+        return story_ids
+    
+    @staticmethod
+    def add_for_purchase(purchase, story_ids=None):
+        """Créer les droits d'accès d'un achat (l'achat doit avoir été flush)"""
+        if story_ids is None:
+            story_ids = PurchaseStory.decode_story_ids(purchase.story_ids)
+        rows = [
+            {'purchase_id': purchase.id, 'user_email': purchase.user_email, 'story_id': story_id}
+            for story_id in story_ids
+        ]
+        if rows:
+            db.session.execute(db.insert(PurchaseStory), rows)
+        return len(rows)
+    
+    @staticmethod
+    def backfill_from_purchases(batch_size=500):
+        """Migrer les blobs JSON de Purchase.story_ids vers la table purchase_stories"""
+        already_migrated = db.select(PurchaseStory.purchase_id).distinct()
+        query = Purchase.query.filter(
+            Purchase.story_ids.isnot(None),
+            Purchase.id.notin_(already_migrated)
+        ).order_by(Purchase.id)
+        
+        migrated_purchases = 0
+        created_rows = 0
+        last_id = 0
+        try:
+            while True:
+                batch = query.filter(Purchase.id > last_id).limit(batch_size).all()
+                if not batch:
+                    break
+                for purchase in batch:
+                    created_rows += PurchaseStory.add_for_purchase(purchase)
+                    migrated_purchases += 1
+                last_id = batch[-1].id
+                db.session.commit()
+            return migrated_purchases, created_rows
+        except Exception:
+            db.session.rollback()
+            raise
@@ -1,17 +1,22 @@
 from flask import Blueprint, jsonify, request
 from src.models.story import db
 from src.models.pack import Pack
+from src.services.catalog_version import conditional_catalog_get, bump_catalog_version
+from src.services.catalog_snapshot import snapshot_catalog_get
+from src.services.pack_registry import pack_registry
 
 packs_bp = Blueprint('packs', __name__)
 
 @packs_bp.route('/packs', methods=['GET'])
+@conditional_catalog_get
+@snapshot_catalog_get
 def get_all_packs():
     """Récupérer tous les packs disponibles"""
     try:
-        packs = Pack.query.filter_by(is_active=True).all()
+        # Packs gardés en mémoire par le registre (rechargés quand le catalogue change)
         return jsonify({
             'success': True,
-            'packs': [pack.to_dict() for pack in packs]
+            'packs': [pack.data for pack in pack_registry.all()]
         })
     except Exception as e:
         return jsonify({
@@ -20,10 +25,11 @@ def get_all_packs():
         }), 500
 
 @packs_bp.route('/packs/<pack_id>', methods=['GET'])
+@conditional_catalog_get
 def get_pack(pack_id):
     """Récupérer un pack spécifique"""
     try:
-        pack = Pack.query.filter_by(pack_id=pack_id, is_active=True).first()
+        pack = pack_registry.get(pack_id)
         if not pack:
             return jsonify({
                 'success': False,
@@ -32,7 +38,7 @@ def get_pack(pack_id):
         
         return jsonify({
             'success': True,
-            'pack': pack.to_dict()
+            'pack': pack.data
         })
     except Exception as e:
         return jsonify({
@@ -62,6 +68,7 @@ def update_pack(pack_db_id):
             pack.is_active = bool(data['is_active'])
         
         db.session.commit()
+        bump_catalog_version()
         
         return jsonify({
             'success': True,
@@ -108,6 +115,7 @@ def create_pack():
         
         db.session.add(pack)
         db.session.commit()
+        bump_catalog_version()
         
         return jsonify({
             'success': True,
@@ -128,6 +136,7 @@ def delete_pack(pack_db_id):
         pack = Pack.query.get_or_404(pack_db_id)
         pack.is_active = False
         db.session.commit()
+        bump_catalog_version()
         
         return jsonify({
             'success': True,
@@ -146,6 +155,7 @@ def init_packs():
     try:
         success = Pack.init_default_packs()
         if success:
+            bump_catalog_version()
             return jsonify({
                 'success': True,
                 'message': 'Packs initialisés avec succès'
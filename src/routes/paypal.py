@@ -1,44 +1,42 @@
-from flask import Blueprint, jsonify, request
-import requests
+from flask import Blueprint, jsonify, request, url_for
 import json
-import os
-from src.models.story import db, Purchase, Story
+from src.models.story import db, Purchase
+from src.models.payment import CaptureJob
+from src.services.idempotency import idempotent
+from src.services.paypal_client import get_paypal_client, PayPalAuthError, PAYPAL_WEBHOOK_ID
+from src.services.pack_registry import pack_registry, InvalidPurchaseAmount
+from src.services.story_allocation import parse_allocation, AllocationError
+from src.services.orders import (
+    InvalidOrderData, normalize_order_data, save_order, purchase_data_for_order, get_order_status
+)
+from src.services.checkout import (
+    PAYPAL_CAPTURE_MODE, CaptureNotCompleted, capture_order_and_record, enqueue_capture,
+    complete_capture_from_webhook
+)
 
 paypal_bp = Blueprint('paypal', __name__)
 
-# Configuration PayPal (à remplacer par vos vraies clés)
-PAYPAL_CLIENT_ID = os.getenv('PAYPAL_CLIENT_ID', 'YOUR_PAYPAL_CLIENT_ID')
-PAYPAL_CLIENT_SECRET = os.getenv('PAYPAL_CLIENT_SECRET', 'YOUR_PAYPAL_CLIENT_SECRET')
-PAYPAL_BASE_URL = os.getenv('PAYPAL_BASE_URL', 'https://api-m.sandbox.paypal.com')  # sandbox pour les tests
+def encode_custom_id(data):
+    """Résumé de l'achat transmis à PayPal (custom_id, 127 caractères max)"""
+    custom_id = json.dumps({
+        'e': data.get('user_email'),
+        'p': data.get('pack_id'),
+        's': data.get('story_id')
+    }, separators=(',', ':'))
+    return custom_id if len(custom_id) <= 127 else None
 
-def get_paypal_access_token():
-    """Obtenir un token d'accès PayPal"""
-    url = f"{PAYPAL_BASE_URL}/v1/oauth2/token"
-    
-    headers = {
-        'Accept': 'application/json',
-        'Accept-Language': 'en_US',
-    }
-    
-    data = 'grant_type=client_credentials'
-    
+def decode_custom_id(custom_id):
+    """Retrouver les informations d'achat depuis le custom_id d'une capture"""
     try:
-        response = requests.post(
-            url, 
-            headers=headers, 
-            data=data, 
-            auth=(PAYPAL_CLIENT_ID, PAYPAL_CLIENT_SECRET)
-        )
-        
-        if response.status_code == 200:
-            return response.json().get('access_token')
-        else:
-            return None
-    except Exception as e:
-        print(f"Erreur lors de l'obtention du token PayPal: {e}")
+        data = json.loads(custom_id) if custom_id else None
+    except ValueError:
         return None
+    if not isinstance(data, dict):
+        return None
+    return {'user_email': data.get('e'), 'pack_type': data.get('p'), 'story_id': data.get('s')}
 
 @paypal_bp.route('/create-payment', methods=['POST'])
+@idempotent
 def create_payment():
     """Créer un paiement PayPal"""
     try:
@@ -52,40 +50,26 @@ def create_payment():
                     'error': f'Champ requis manquant: {field}'
                 }), 400
         
-        access_token = get_paypal_access_token()
-        if not access_token:
+        # Le prix fait foi côté serveur : le montant envoyé par le client doit correspondre
+        try:
+            pack = pack_registry.validate_amount(data['pack_id'], data['amount'])
+            allocation = parse_allocation(data.get('allocation'))
+            # Tout est validé avant de créer la commande chez PayPal
+            data = normalize_order_data(data, pack)
+        except (InvalidPurchaseAmount, AllocationError, InvalidOrderData) as e:
             return jsonify({
                 'success': False,
-                'error': 'Impossible d\'obtenir le token PayPal'
-            }), 500
-        
-        # Créer la commande PayPal
-        url = f"{PAYPAL_BASE_URL}/v2/checkout/orders"
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {access_token}',
-        }
-        
-        # Déterminer la description du pack
-        pack_descriptions = {
-            'single': '1 Histoire',
-            'pack10': '10 Histoires',
-            'pack50': '50 Histoires', 
-            'pack100': '100 Histoires',
-            'unlimited': 'Collection Complète'
-        }
-        
-        pack_description = pack_descriptions.get(data['pack_id'], 'Pack d\'histoires')
+                'error': str(e)
+            }), 400
         
         payment_data = {
             "intent": "CAPTURE",
             "purchase_units": [{
                 "amount": {
                     "currency_code": "EUR",
-                    "value": str(data['amount'])
+                    "value": f"{pack.price:.2f}"
                 },
-                "description": f"Les histoires de tonton Yahya - {pack_description}"
+                "description": f"Les histoires de tonton Yahya - {pack.name}"
             }],
             "application_context": {
                 "return_url": f"{request.host_url}payment-success",
@@ -93,13 +77,19 @@ def create_payment():
             }
         }
         
-        response = requests.post(url, headers=headers, json=payment_data)
+        # Permettre la réconciliation par webhook même sans capture côté serveur
+        custom_id = encode_custom_id(data)
+        if custom_id:
+            payment_data['purchase_units'][0]['custom_id'] = custom_id
+        
+        # Créer la commande PayPal
+        response = get_paypal_client().create_order(payment_data)
         
         if response.status_code == 201:
             order = response.json()
             
-            # Sauvegarder les informations de commande temporairement
-            # (dans une vraie application, vous utiliseriez une base de données)
+            # Sauvegarder la commande : la capture et le suivi de statut s'appuient dessus
+            save_order(order, data, allocation)
             
             return jsonify({
                 'success': True,
@@ -113,6 +103,11 @@ def create_payment():
                 'details': response.text
             }), 500
             
+    except PayPalAuthError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
     except Exception as e:
         return jsonify({
             'success': False,
@@ -120,6 +115,7 @@ def create_payment():
         }), 500
 
 @paypal_bp.route('/capture-payment', methods=['POST'])
+@idempotent
 def capture_payment():
     """Capturer un paiement PayPal après approbation"""
     try:
@@ -131,67 +127,29 @@ def capture_payment():
                 'error': 'ID de commande manquant'
             }), 400
         
-        access_token = get_paypal_access_token()
-        if not access_token:
-            return jsonify({
-                'success': False,
-                'error': 'Impossible d\'obtenir le token PayPal'
-            }), 500
-        
-        # Capturer la commande
-        url = f"{PAYPAL_BASE_URL}/v2/checkout/orders/{data['order_id']}/capture"
+        # Les informations enregistrées à la création de la commande priment sur celles du client
+        purchase_data = purchase_data_for_order(data['order_id'], data.get('purchase_data', {}))
         
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {access_token}',
-        }
+        # Mode asynchrone : la capture est traitée en arrière-plan, le client interroge le statut
+        if data.get('async', PAYPAL_CAPTURE_MODE == 'async'):
+            job = enqueue_capture(data['order_id'], purchase_data)
+            return jsonify({
+                'success': True,
+                'status': job.status,
+                'order_id': job.order_id,
+                'purchase_id': job.purchase_id,
+                'status_url': url_for('paypal.get_capture_status', order_id=job.order_id)
+            }), 202
         
-        response = requests.post(url, headers=headers)
+        # Capturer la commande et créer l'enregistrement d'achat
+        purchase, response = capture_order_and_record(data['order_id'], purchase_data)
         
-        if response.status_code == 201:
-            capture_result = response.json()
-            
-            # Vérifier que le paiement a été capturé avec succès
-            if capture_result['status'] == 'COMPLETED':
-                # Créer l'enregistrement d'achat dans la base de données
-                purchase_data = data.get('purchase_data', {})
-                
-                # Déterminer quelles histoires débloquer selon le pack
-                story_ids = None
-                pack_type = purchase_data.get('pack_type', 'single')
-                
-                if pack_type == 'single':
-                    # Pour un achat unique, spécifier l'ID de l'histoire
-                    story_ids = json.dumps([purchase_data.get('story_id')])
-                elif pack_type in ['pack10', 'pack50', 'pack100']:
-                    # Pour les packs, débloquer un nombre spécifique d'histoires
-                    pack_sizes = {'pack10': 10, 'pack50': 50, 'pack100': 100}
-                    limit = pack_sizes[pack_type]
-                    stories = Story.query.limit(limit).all()
-                    story_ids = json.dumps([story.id for story in stories])
-                # Pour 'unlimited', on ne spécifie pas de story_ids (accès à tout)
-                
-                purchase = Purchase(
-                    user_email=purchase_data.get('user_email'),
-                    pack_type=pack_type,
-                    story_ids=story_ids,
-                    amount_paid=float(capture_result['purchase_units'][0]['payments']['captures'][0]['amount']['value']),
-                    paypal_transaction_id=capture_result['id']
-                )
-                
-                db.session.add(purchase)
-                db.session.commit()
-                
-                return jsonify({
-                    'success': True,
-                    'transaction_id': capture_result['id'],
-                    'purchase_id': purchase.id
-                })
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': 'Le paiement n\'a pas été complété'
-                }), 400
+        if purchase is not None:
+            return jsonify({
+                'success': True,
+                'transaction_id': purchase.paypal_transaction_id,
+                'purchase_id': purchase.id
+            })
         else:
             return jsonify({
                 'success': False,
@@ -199,6 +157,17 @@ def capture_payment():
                 'details': response.text
             }), 500
             
+    except (CaptureNotCompleted, InvalidPurchaseAmount) as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except PayPalAuthError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -206,25 +175,112 @@ def capture_payment():
             'error': str(e)
         }), 500
 
-@paypal_bp.route('/payment-status/<order_id>', methods=['GET'])
-def get_payment_status(order_id):
-    """Vérifier le statut d'un paiement PayPal"""
+@paypal_bp.route('/capture-status/<order_id>', methods=['GET'])
+def get_capture_status(order_id):
+    """Statut d'une capture différée (à interroger après un 202)"""
     try:
-        access_token = get_paypal_access_token()
-        if not access_token:
+        job = CaptureJob.query.filter_by(order_id=order_id).first()
+        if job is None:
+            # Capture synchrone ou réconciliée par webhook uniquement
+            purchase = Purchase.query.filter_by(paypal_transaction_id=order_id).first()
+            if purchase is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Capture non trouvée'
+                }), 404
+            return jsonify({
+                'success': True,
+                'status': 'completed',
+                'order_id': order_id,
+                'purchase_id': purchase.id
+            })
+        
+        return jsonify({
+            'success': True,
+            'status': job.status,
+            'order_id': job.order_id,
+            'purchase_id': job.purchase_id,
+            'error': job.error if job.status == 'failed' else None
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@paypal_bp.route('/paypal/webhook', methods=['POST'])
+def paypal_webhook():
+    """Recevoir les notifications PayPal (PAYMENT.CAPTURE.COMPLETED)"""
+    try:
+        event = request.get_json(silent=True) or {}
+        
+        if not PAYPAL_WEBHOOK_ID:
             return jsonify({
                 'success': False,
-                'error': 'Impossible d\'obtenir le token PayPal'
-            }), 500
+                'error': 'Webhook PayPal non configuré (PAYPAL_WEBHOOK_ID)'
+            }), 503
         
-        url = f"{PAYPAL_BASE_URL}/v2/checkout/orders/{order_id}"
+        if not get_paypal_client().verify_webhook_signature(PAYPAL_WEBHOOK_ID, request.headers, event):
+            return jsonify({
+                'success': False,
+                'error': 'Signature webhook invalide'
+            }), 400
         
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-        }
+        if event.get('event_type') != 'PAYMENT.CAPTURE.COMPLETED':
+            return jsonify({
+                'success': True,
+                'ignored': True
+            })
+        
+        resource = event.get('resource', {})
+        order_id = resource.get('supplementary_data', {}).get('related_ids', {}).get('order_id')
+        if not order_id:
+            return jsonify({
+                'success': True,
+                'ignored': True
+            })
+        
+        try:
+            purchase = complete_capture_from_webhook(
+                order_id,
+                float(resource.get('amount', {}).get('value', 0)),
+                decode_custom_id(resource.get('custom_id'))
+            )
+        except InvalidPurchaseAmount as e:
+            # Réponse 200 : PayPal ne doit pas renvoyer indéfiniment un paiement refusé
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'ignored': True,
+                'error': str(e)
+            })
         
-        response = requests.get(url, headers=headers)
+        return jsonify({
+            'success': True,
+            'purchase_id': purchase.id if purchase else None
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@paypal_bp.route('/payment-status/<order_id>', methods=['GET'])
+def get_payment_status(order_id):
+    """Vérifier le statut d'un paiement PayPal"""
+    try:
+        # Statut local ; PayPal n'est interrogé que pour une commande en attente au statut périmé
+        order = get_order_status(order_id)
+        if order is not None:
+            return jsonify({
+                'success': True,
+                'status': order.status,
+                'order': order.to_dict()
+            })
         
+        # Commande antérieure à la table orders : statut demandé à PayPal
+        response = get_paypal_client().get_order(order_id)
         if response.status_code == 200:
             order = response.json()
             return jsonify({
@@ -238,6 +294,11 @@ def get_payment_status(order_id):
                 'error': 'Commande non trouvée'
             }), 404
             
+    except PayPalAuthError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
     except Exception as e:
         return jsonify({
             'success': False,
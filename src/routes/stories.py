@@ -1,18 +1,46 @@
 from flask import Blueprint, jsonify, request
-from src.models.story import db, Story, Purchase
+from src.models.story import db, Story, Purchase, PurchaseStory
+from src.services.entitlements import entitlement_cache
+from src.services.catalog import list_stories, CatalogQueryError
+from src.services.catalog_version import conditional_catalog_get, bump_catalog_version
+from src.services.catalog_snapshot import snapshot_catalog_get
+from src.services.idempotency import idempotent
+from src.services.pack_registry import pack_registry, InvalidPurchaseAmount, UNLIMITED_PACK_ID
+from src.services.credits import packs_grant_credits, grant_credits, get_balance, spend_credit, CreditError
+from src.services.story_allocation import allocate_story_ids, parse_allocation, AllocationError
+from src.services.sales_rollups import record_sale
+from src.services.audio_delivery import (
+    send_audio_path, send_audio_file, sign_audio_url, verify_audio_token, AUDIO_REQUIRE_SIGNED_URLS
+)
+from src.services.audio_paths import story_audio_paths
 import json
+import uuid
+from sqlalchemy.exc import IntegrityError
 
 stories_bp = Blueprint('stories', __name__)
 
+# Nombre maximum d'histoires vérifiées par /check-access/batch
+MAX_BATCH_STORY_IDS = 500
+
 @stories_bp.route('/stories', methods=['GET'])
+@conditional_catalog_get
+@snapshot_catalog_get
 def get_all_stories():
-    """Récupérer toutes les histoires disponibles"""
+    """Récupérer les histoires disponibles (paginées par curseur)
+
+    Paramètres : limit, cursor, sort (id|newest), category, is_premium, fields
+    """
     try:
-        stories = Story.query.all()
+        page = list_stories(request.args)
         return jsonify({
             'success': True,
-            'stories': [story.to_dict() for story in stories]
+            **page
         })
+    except CatalogQueryError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -20,6 +48,7 @@ def get_all_stories():
         }), 500
 
 @stories_bp.route('/stories/<int:story_id>', methods=['GET'])
+@conditional_catalog_get
 def get_story(story_id):
     """Récupérer une histoire spécifique"""
     try:
@@ -34,6 +63,34 @@ def get_story(story_id):
             'error': str(e)
         }), 500
 
+@stories_bp.route('/stories/<int:story_id>/audio', methods=['GET'])
+def get_story_audio(story_id):
+    """Diffuser le fichier audio d'une histoire (requêtes Range / 206 supportées)"""
+    token = request.args.get('token')
+    if token:
+        # URL signée par /check-access : vérification purement cryptographique
+        file_path = verify_audio_token(token, story_id)
+        if file_path is None:
+            return jsonify({
+                'success': False,
+                'error': 'Lien audio invalide ou expiré'
+            }), 403
+        return send_audio_file(file_path)
+    
+    if AUDIO_REQUIRE_SIGNED_URLS:
+        return jsonify({
+            'success': False,
+            'error': 'Lien audio signé requis'
+        }), 403
+    
+    audio_file_path = story_audio_paths.get(story_id, request.args.get('variant'))
+    if not audio_file_path:
+        return jsonify({
+            'success': False,
+            'error': 'Fichier audio non trouvé'
+        }), 404
+    return send_audio_path(audio_file_path)
+
 @stories_bp.route('/user-purchases/<email>', methods=['GET'])
 def get_user_purchases(email):
     """Récupérer les achats d'un utilisateur"""
@@ -41,35 +98,86 @@ def get_user_purchases(email):
         purchases = Purchase.query.filter_by(user_email=email, is_active=True).all()
         
         # Déterminer quelles histoires sont débloquées
-        unlocked_stories = set()
-        has_unlimited = False
-        
-        for purchase in purchases:
-            if purchase.pack_type == 'unlimited':
-                has_unlimited = True
-                break
-            elif purchase.story_ids:
-                story_ids = json.loads(purchase.story_ids)
-                unlocked_stories.update(story_ids)
+        entitlements = entitlement_cache.get(email)
+        has_unlimited = entitlements.has_unlimited
         
         if has_unlimited:
             # Si l'utilisateur a l'accès illimité, débloquer toutes les histoires
-            all_stories = Story.query.all()
-            unlocked_stories = {story.id for story in all_stories}
+            unlocked_stories = set(db.session.scalars(db.select(Story.id)))
+        else:
+            unlocked_stories = entitlements.story_ids
         
         return jsonify({
             'success': True,
             'purchases': [purchase.to_dict() for purchase in purchases],
             'unlocked_stories': list(unlocked_stories),
-            'has_unlimited': has_unlimited
+            'has_unlimited': has_unlimited,
+            'credits': get_balance(email)
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@stories_bp.route('/credits/<email>', methods=['GET'])
+def get_credit_balance(email):
+    """Solde de crédits d'histoires d'un utilisateur"""
+    try:
+        return jsonify({
+            'success': True,
+            'user_email': email,
+            'balance': get_balance(email)
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@stories_bp.route('/credits/spend', methods=['POST'])
+def spend_story_credit():
+    """Débloquer une histoire en dépensant un crédit"""
+    try:
+        data = request.get_json()
+        
+        required_fields = ['user_email', 'story_id']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({
+                    'success': False,
+                    'error': f'Champ requis manquant: {field}'
+                }), 400
+        
+        try:
+            story_id = int(data['story_id'])
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': 'ID d\'histoire invalide'
+            }), 400
+        
+        balance, debited = spend_credit(data['user_email'], story_id)
+        return jsonify({
+            'success': True,
+            'story_id': story_id,
+            'debited': debited,
+            'balance': balance
         })
+    except CreditError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
 @stories_bp.route('/purchase', methods=['POST'])
+@idempotent
 def create_purchase():
     """Créer un nouvel achat"""
     try:
@@ -83,6 +191,24 @@ def create_purchase():
                     'error': f'Champ requis manquant: {field}'
                 }), 400
         
+        try:
+            pack_registry.validate_amount(data['pack_type'], data['amount_paid'])
+        except InvalidPurchaseAmount as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        # Une transaction PayPal déjà enregistrée renvoie l'achat existant
+        transaction_id = data.get('paypal_transaction_id')
+        if transaction_id:
+            existing = Purchase.query.filter_by(paypal_transaction_id=transaction_id).first()
+            if existing:
+                return jsonify({
+                    'success': True,
+                    'purchase': existing.to_dict()
+                })
+        
         # Créer l'achat
         purchase = Purchase(
             user_email=data['user_email'],
@@ -93,12 +219,26 @@ def create_purchase():
         )
         
         db.session.add(purchase)
+        db.session.flush()
+        PurchaseStory.add_for_purchase(purchase)
+        record_sale(purchase)
         db.session.commit()
+        entitlement_cache.invalidate(purchase.user_email)
         
         return jsonify({
             'success': True,
             'purchase': purchase.to_dict()
         })
+    except IntegrityError:
+        # Requête concurrente pour la même transaction : l'autre insertion a gagné
+        db.session.rollback()
+        existing = Purchase.query.filter_by(paypal_transaction_id=data.get('paypal_transaction_id')).first()
+        if existing is None:
+            raise
+        return jsonify({
+            'success': True,
+            'purchase': existing.to_dict()
+        })
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -106,22 +246,6 @@ def create_purchase():
             'error': str(e)
         }), 500
 
-@stories_bp.route('/packs', methods=['GET'])
-def get_packs():
-    """Récupérer les informations sur les packs disponibles"""
-    packs = [
-        {'id': 'single', 'name': '1 Histoire', 'price': 2.99, 'stories': 1},
-        {'id': 'pack10', 'name': '10 Histoires', 'price': 24.99, 'stories': 10, 'savings': '17%'},
-        {'id': 'pack50', 'name': '50 Histoires', 'price': 99.99, 'stories': 50, 'savings': '33%'},
-        {'id': 'pack100', 'name': '100 Histoires', 'price': 179.99, 'stories': 100, 'savings': '40%'},
-        {'id': 'unlimited', 'name': 'Collection Complète', 'price': 299.99, 'stories': 'Illimitées', 'savings': '50%'}
-    ]
-    
-    return jsonify({
-        'success': True,
-        'packs': packs
-    })
-
 @stories_bp.route('/init-sample-data', methods=['POST'])
 def init_sample_data():
     """Initialiser les données d'exemple"""
@@ -174,6 +298,7 @@ def init_sample_data():
             db.session.add(story)
         
         db.session.commit()
+        bump_catalog_version()
         
         return jsonify({
             'success': True,
@@ -234,33 +359,69 @@ def check_story_access():
                 'error': 'Email et ID d\'histoire requis'
             }), 400
         
-        # Vérifier si l'utilisateur a un accès illimité
-        unlimited_purchase = Purchase.query.filter_by(
-            user_email=user_email,
-            pack_type='unlimited'
-        ).first()
+        entitlements = entitlement_cache.get(user_email)
+        
+        # Accès illimité, ou histoire spécifique présente dans les achats
+        has_access = entitlements.has_unlimited or story_id in entitlements.story_ids
+        
+        response = {
+            'success': True,
+            'has_access': has_access
+        }
         
-        if unlimited_purchase:
+        # URL audio signée, vérifiable sans requête SQL par /stories/<id>/audio
+        if has_access and request.args.get('audio_url', 'true').lower() != 'false':
+            audio_file_path = story_audio_paths.get(story_id, request.args.get('audio_variant'))
+            response['audio_url'] = sign_audio_url(story_id, audio_file_path)
+        
+        return jsonify(response)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@stories_bp.route('/check-access/batch', methods=['POST'])
+def check_story_access_batch():
+    """Vérifier l'accès d'un utilisateur à plusieurs histoires en une seule requête"""
+    try:
+        data = request.get_json(silent=True) or {}
+        user_email = data.get('email')
+        raw_story_ids = data.get('story_ids')
+        
+        if not user_email or not isinstance(raw_story_ids, list):
             return jsonify({
-                'success': True,
-                'has_access': True
-            })
+                'success': False,
+                'error': 'Email et liste d\'IDs d\'histoires requis'
+            }), 400
         
-        # Vérifier si l'histoire spécifique est dans les achats
-        purchases = Purchase.query.filter_by(user_email=user_email).all()
+        if len(raw_story_ids) > MAX_BATCH_STORY_IDS:
+            return jsonify({
+                'success': False,
+                'error': f'Maximum {MAX_BATCH_STORY_IDS} histoires par requête'
+            }), 400
         
-        for purchase in purchases:
-            if purchase.story_ids:
-                story_ids = json.loads(purchase.story_ids)
-                if story_id in story_ids:
-                    return jsonify({
-                        'success': True,
-                        'has_access': True
-                    })
+        try:
+            story_ids = [int(story_id) for story_id in raw_story_ids]
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': 'IDs d\'histoires invalides'
+            }), 400
+        
+        entitlements = entitlement_cache.get(user_email)
+        
+        # Même raccourci que /check-access : l'accès illimité débloque tout
+        if entitlements.has_unlimited:
+            access = {story_id: True for story_id in story_ids}
+        else:
+            access = {story_id: story_id in entitlements.story_ids for story_id in story_ids}
         
         return jsonify({
             'success': True,
-            'has_access': False
+            'has_unlimited': entitlements.has_unlimited,
+            'access': access
         })
         
     except Exception as e:
@@ -270,6 +431,7 @@ def check_story_access():
         }), 500
 
 @stories_bp.route('/simulate-purchase', methods=['POST'])
+@idempotent
 def simulate_purchase():
     """Simuler un achat pour les tests (à supprimer en production)"""
     try:
@@ -287,28 +449,35 @@ def simulate_purchase():
         pack_type = data['pack_type']
         story_id = data.get('story_id')
         
+        pack = pack_registry.get(pack_type)
+        if pack is None:
+            return jsonify({
+                'success': False,
+                'error': f'Pack inconnu: {pack_type}'
+            }), 400
+        
+        try:
+            allocation = parse_allocation(data.get('allocation'))
+        except AllocationError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
         # Déterminer quelles histoires débloquer selon le pack
         story_ids = None
-        amount_paid = 0
+        credits = 0
+        amount_paid = pack.price
         
         if pack_type == 'single' and story_id:
             story_ids = json.dumps([story_id])
-            amount_paid = 2.99
-        elif pack_type == 'pack10':
-            stories = Story.query.limit(10).all()
-            story_ids = json.dumps([story.id for story in stories])
-            amount_paid = 24.99
-        elif pack_type == 'pack50':
-            stories = Story.query.limit(50).all()
-            story_ids = json.dumps([story.id for story in stories])
-            amount_paid = 99.99
-        elif pack_type == 'pack100':
-            stories = Story.query.limit(100).all()
-            story_ids = json.dumps([story.id for story in stories])
-            amount_paid = 179.99
-        elif pack_type == 'unlimited':
-            # Pour unlimited, on ne spécifie pas de story_ids
-            amount_paid = 249.99
+        elif pack_type != UNLIMITED_PACK_ID and pack.size and packs_grant_credits():
+            # Les histoires du pack seront débloquées une à une contre des crédits
+            credits = pack.size
+        elif pack_type != UNLIMITED_PACK_ID and pack.size:
+            # Histoires pas encore possédées, sélectionnées par identifiant uniquement
+            story_ids = json.dumps(allocate_story_ids(user_email, pack.size, allocation))
+        # Pour unlimited, on ne spécifie pas de story_ids
         
         # Créer l'enregistrement d'achat
         purchase = Purchase(
@@ -316,15 +485,22 @@ def simulate_purchase():
             pack_type=pack_type,
             story_ids=story_ids,
             amount_paid=amount_paid,
-            paypal_transaction_id=f'SIMULATED_TEST_{user_email}'
+            paypal_transaction_id=f'SIMULATED_TEST_{user_email}_{uuid.uuid4().hex[:12]}'
         )
         
         db.session.add(purchase)
+        db.session.flush()
+        PurchaseStory.add_for_purchase(purchase)
+        record_sale(purchase)
+        if credits:
+            grant_credits(purchase, credits)
         db.session.commit()
+        entitlement_cache.invalidate(user_email)
         
         return jsonify({
             'success': True,
             'purchase_id': purchase.id,
+            'credits': get_balance(user_email),
             'message': f'Achat simulé: {pack_type}'
         })
         
@@ -335,3 +511,10 @@ def simulate_purchase():
             'error': str(e)
         }), 500
 
+@stories_bp.route('/entitlements/cache-stats', methods=['GET'])
+def get_entitlement_cache_stats():
+    """Statistiques du cache des droits d'accès (pour le dimensionner)"""
+    return jsonify({
+        'success': True,
+        'stats': entitlement_cache.stats()
+    })
@@ -0,0 +1,111 @@
+import mimetypes
+import os
+import re
+from flask import request, current_app, make_response, abort, url_for
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+
+# Dossier des fichiers audio (même emplacement que l'upload admin)
+AUDIO_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static', 'audio'))
+AUDIO_URL_PREFIX = '/static/audio/'
+
+# Mode de livraison : 'direct' (sendfile via wsgi.file_wrapper),
+# 'x-sendfile' (Apache/lighttpd) ou 'x-accel' (nginx, location interne)
+AUDIO_DELIVERY_MODE = os.getenv('AUDIO_DELIVERY_MODE', 'direct')
+AUDIO_ACCEL_REDIRECT_PREFIX = os.getenv('AUDIO_ACCEL_REDIRECT_PREFIX', '/_protected_audio/')
+AUDIO_CACHE_MAX_AGE = int(os.getenv('AUDIO_CACHE_MAX_AGE', '86400'))
+# Fichiers nommés d'après leur SHA-256 : contenu immuable, cache d'un an
+AUDIO_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+HASHED_AUDIO_FILENAME = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+$')
+
+# URLs audio signées : durée de validité et obligation (bloque /static/audio en accès direct).
+# Les clients doivent lire l'audio via l'audio_url renvoyée par /check-access ; pendant la
+# transition des anciens clients (lien direct vers audio_file_path), AUDIO_REQUIRE_SIGNED_URLS=false
+AUDIO_URL_TTL = int(os.getenv('AUDIO_URL_TTL', '900'))
+AUDIO_REQUIRE_SIGNED_URLS = os.getenv('AUDIO_REQUIRE_SIGNED_URLS', 'true').lower() in ('1', 'true', 'yes')
+AUDIO_TOKEN_SALT = 'story-audio'
+
+
+def resolve_audio_path(audio_file_path):
+    """Traduire Story.audio_file_path (/static/audio/x.mp3) en chemin disque sûr"""
+    if not audio_file_path or not audio_file_path.startswith(AUDIO_URL_PREFIX):
+        return None
+    relative_path = audio_file_path[len(AUDIO_URL_PREFIX):]
+    file_path = safe_join(AUDIO_FOLDER, relative_path)
+    if file_path is None or not os.path.isfile(file_path):
+        return None
+    return file_path
+
+
+def in_audio_folder(file_path):
+    """Vrai si le chemin disque désigne le dossier audio ou un fichier qu'il contient"""
+    real_path, audio_folder = os.path.realpath(file_path), os.path.realpath(AUDIO_FOLDER)
+    return real_path == audio_folder or real_path.startswith(audio_folder + os.sep)
+
+
+def mobile_rendition_path(audio_file_path):
+    """URL de la version mobile produite à partir d'un fichier (même nom, suffixe .mobile.mp3)"""
+    return f'{os.path.splitext(audio_file_path)[0]}.mobile.mp3'
+
+
+def send_audio_file(file_path):
+    """Envoyer un fichier audio avec gestion Range/206, ETag et cache longue durée"""
+    immutable = bool(HASHED_AUDIO_FILENAME.match(os.path.basename(file_path)))
+    max_age = AUDIO_IMMUTABLE_MAX_AGE if immutable else AUDIO_CACHE_MAX_AGE
+    
+    if AUDIO_DELIVERY_MODE == 'x-accel':
+        # nginx lit le fichier lui-même (Range compris) : le worker est libéré immédiatement
+        relative_path = os.path.relpath(file_path, AUDIO_FOLDER)
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = AUDIO_ACCEL_REDIRECT_PREFIX + relative_path.replace(os.sep, '/')
+        response.mimetype = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+    else:
+        # send_file gère If-None-Match / If-Range / Range (206) et utilise sendfile()
+        # via wsgi.file_wrapper sous gunicorn ; X-Sendfile délègue au serveur frontal
+        response = send_file(
+            file_path,
+            request.environ,
+            response_class=current_app.response_class,
+            conditional=True,
+            etag=True,
+            max_age=max_age,
+            use_x_sendfile=AUDIO_DELIVERY_MODE == 'x-sendfile'
+        )
+    response.accept_ranges = 'bytes'
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    return response
+
+
+def send_audio_path(audio_file_path):
+    """Envoyer un fichier audio désigné par son URL /static/audio/..., ou 404"""
+    file_path = resolve_audio_path(audio_file_path)
+    if file_path is None:
+        abort(404)
+    return send_audio_file(file_path)
+
+
+def _audio_serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=AUDIO_TOKEN_SALT)
+
+
+def sign_audio_url(story_id, audio_file_path):
+    """Créer une URL audio signée (HMAC) de courte durée pour une histoire achetée"""
+    if not audio_file_path:
+        return None
+    token = _audio_serializer().dumps({'s': story_id, 'p': audio_file_path})
+    return url_for('stories.get_story_audio', story_id=story_id, token=token)
+
+
+def verify_audio_token(token, story_id):
+    """Vérifier un jeton audio sans requête SQL ; renvoie le chemin disque ou None"""
+    try:
+        payload = _audio_serializer().loads(token, max_age=AUDIO_URL_TTL)
+    except (SignatureExpired, BadSignature):
+        return None
+    if not isinstance(payload, dict) or payload.get('s') != story_id:
+        return None
+    return resolve_audio_path(payload.get('p'))
@@ -0,0 +1,75 @@
+import threading
+from src.models.story import db, Story
+from src.models.audio import AudioRendition
+from src.services.audio_delivery import mobile_rendition_path
+from src.services.catalog_version import get_catalog_version
+
+
+class StoryAudioPaths:
+    """Chemins audio des histoires, gardés en mémoire pour une version du catalogue
+    
+    Un changement de fichier audio (admin, upload, version mobile terminée) appelle
+    bump_catalog_version() : le cache du worker est alors vidé au prochain accès.
+    """
+    
+    def __init__(self):
+        self._version = None
+        self._paths = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, story_id, variant=None):
+        """Chemin audio d'une histoire, version mobile si demandée et à jour ; None si inconnue"""
+        version, _ = get_catalog_version()
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._paths.clear()
+            paths = self._paths.get(story_id)
+            if paths is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        
+        if paths is None:
+            paths = self._load(story_id)
+            with self._lock:
+                if version == self._version:
+                    self._paths[story_id] = paths
+        
+        audio_file_path, mobile_path = paths
+        if variant == 'mobile' and mobile_path:
+            return mobile_path
+        return audio_file_path
+    
+    def _load(self, story_id):
+        """(chemin original, version mobile à jour ou None), en une requête"""
+        row = db.session.execute(
+            db.select(Story.audio_file_path, AudioRendition.audio_file_path)
+            .outerjoin(AudioRendition, db.and_(AudioRendition.story_id == Story.id, AudioRendition.variant == 'mobile'))
+            .where(Story.id == story_id)
+        ).first()
+        if row is None:
+            return None, None
+        audio_file_path, rendition_path = row
+        # Une version mobile issue d'un ancien fichier (traitement en cours ou échoué) n'est pas servie
+        if audio_file_path and rendition_path == mobile_rendition_path(audio_file_path):
+            return audio_file_path, rendition_path
+        return audio_file_path, None
+    
+    def clear(self):
+        with self._lock:
+            self._paths.clear()
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self._version,
+                'entries': len(self._paths),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+story_audio_paths = StoryAudioPaths()
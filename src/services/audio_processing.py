@@ -0,0 +1,158 @@
+import os
+import shutil
+import subprocess
+import wave
+from datetime import datetime, timedelta
+from src.models.story import db, Story
+from src.models.audio import AudioJob, AudioRendition
+from src.services.audio_delivery import mobile_rendition_path, resolve_audio_path
+from src.services.catalog_version import bump_catalog_version
+from src.services.background import submit_in_app_context, submit_later
+
+# Outils externes (optionnels) : sans ffmpeg, seule la durée des WAV est détectée
+FFMPEG_BIN = os.getenv('FFMPEG_BIN', 'ffmpeg')
+FFPROBE_BIN = os.getenv('FFPROBE_BIN', 'ffprobe')
+AUDIO_MOBILE_BITRATE = os.getenv('AUDIO_MOBILE_BITRATE', '64k')
+AUDIO_JOB_TIMEOUT = int(os.getenv('AUDIO_JOB_TIMEOUT', '1800'))
+AUDIO_JOB_MAX_ATTEMPTS = 3
+# Délai avant une nouvelle tentative (doublé à chaque échec)
+AUDIO_JOB_RETRY_DELAY = float(os.getenv('AUDIO_JOB_RETRY_DELAY', '30'))
+
+
+def format_duration(seconds):
+    """Convertir une durée en secondes au format de Story.duration ("8:30" ou "1:02:05")"""
+    total = int(round(seconds))
+    hours, remainder = divmod(total, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f'{hours}:{minutes:02d}:{secs:02d}'
+    return f'{minutes}:{secs:02d}'
+
+
+def probe_duration(file_path):
+    """Durée réelle du fichier en secondes (ffprobe, sinon module wave), ou None"""
+    if shutil.which(FFPROBE_BIN):
+        try:
+            result = subprocess.run(
+                [FFPROBE_BIN, '-v', 'error', '-show_entries', 'format=duration',
+                 '-of', 'default=noprint_wrappers=1:nokey=1', file_path],
+                capture_output=True, text=True, timeout=60, check=True
+            )
+            return float(result.stdout.strip())
+        except (subprocess.SubprocessError, ValueError):
+            pass
+    
+    if file_path.lower().endswith('.wav'):
+        try:
+            with wave.open(file_path, 'rb') as wav_file:
+                return wav_file.getnframes() / float(wav_file.getframerate())
+        except (wave.Error, EOFError, ZeroDivisionError):
+            return None
+    return None
+
+
+def transcode_mobile(file_path):
+    """Produire une version mono basse qualité à côté de l'original (nécessite ffmpeg)"""
+    if not shutil.which(FFMPEG_BIN):
+        return None
+    
+    stem = os.path.splitext(file_path)[0]
+    output_path = f'{stem}.mobile.mp3'
+    tmp_path = f'{stem}.mobile.tmp.mp3'
+    subprocess.run(
+        [FFMPEG_BIN, '-y', '-v', 'error', '-i', file_path, '-vn', '-ac', '1',
+         '-codec:a', 'libmp3lame', '-b:a', AUDIO_MOBILE_BITRATE, tmp_path],
+        capture_output=True, timeout=AUDIO_JOB_TIMEOUT, check=True
+    )
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def enqueue_audio_job(story):
+    """Enregistrer un traitement audio pour une histoire et le lancer en arrière-plan"""
+    job = AudioJob(story_id=story.id, source_path=story.audio_file_path)
+    db.session.add(job)
+    db.session.commit()
+    
+    submit_in_app_context(process_audio_job, job.id)
+    return job
+
+
+def claim_audio_job(job_id):
+    """Réserver atomiquement un job en attente (un seul worker le traite)"""
+    result = db.session.execute(
+        db.update(AudioJob)
+        .where(AudioJob.id == job_id, AudioJob.status == 'pending')
+        .values(status='running', started_at=datetime.utcnow(), attempts=AudioJob.attempts + 1)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def process_audio_job(job_id):
+    """Traiter un job : sonder la durée, créer la version mobile, mettre à jour l'histoire"""
+    if not claim_audio_job(job_id):
+        return False
+    
+    job = db.session.get(AudioJob, job_id)
+    try:
+        file_path = resolve_audio_path(job.source_path)
+        if file_path is None:
+            raise FileNotFoundError(f'Fichier audio introuvable: {job.source_path}')
+        
+        duration = probe_duration(file_path)
+        mobile_path = transcode_mobile(file_path)
+        
+        story = db.session.get(Story, job.story_id)
+        # L'histoire a pu être supprimée ou son fichier remplacé entre-temps
+        if story is not None and story.audio_file_path == job.source_path:
+            if duration:
+                story.duration = format_duration(duration)
+            if mobile_path:
+                audio_file_path = mobile_rendition_path(story.audio_file_path)
+                rendition = AudioRendition.query.filter_by(story_id=story.id, variant='mobile').first()
+                if rendition is None:
+                    rendition = AudioRendition(story_id=story.id, variant='mobile')
+                    db.session.add(rendition)
+                rendition.audio_file_path = audio_file_path
+                rendition.bitrate = AUDIO_MOBILE_BITRATE
+        
+        job.status = 'done'
+        job.error = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        # La durée affichée dans le catalogue vient de changer
+        bump_catalog_version()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(AudioJob, job_id)
+        job.status = 'pending' if job.attempts < AUDIO_JOB_MAX_ATTEMPTS else 'failed'
+        job.error = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        if job.status == 'pending':
+            # Nouvelle tentative automatique, avec un délai croissant
+            submit_later(AUDIO_JOB_RETRY_DELAY * 2 ** (job.attempts - 1), process_audio_job, job_id)
+        return False
+
+
+def process_pending_audio_jobs(limit=None):
+    """Vider la file d'attente (commande CLI ou reprise après redémarrage)"""
+    # Les jobs restés 'running' après un arrêt brutal du worker sont remis en attente
+    stale_before = datetime.utcnow() - timedelta(seconds=AUDIO_JOB_TIMEOUT)
+    db.session.execute(
+        db.update(AudioJob)
+        .where(AudioJob.status == 'running', AudioJob.started_at < stale_before)
+        .values(status='pending')
+    )
+    db.session.commit()
+    
+    query = db.select(AudioJob.id).where(AudioJob.status == 'pending').order_by(AudioJob.id)
+    if limit:
+        query = query.limit(limit)
+    processed = 0
+    for job_id in db.session.scalars(query).all():
+        if process_audio_job(job_id):
+            processed += 1
+    return processed
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from src.models.story import db, Story
+from src.models.audio import AudioBlob, AudioRendition
+from src.services.audio_delivery import AUDIO_FOLDER, AUDIO_URL_PREFIX, resolve_audio_path
+
+# Fichiers en cours de réception : hors de static/ pour ne jamais être servis publiquement
+AUDIO_TMP_FOLDER = os.getenv(
+    'UPLOAD_TMP_FOLDER',
+    os.path.join(os.path.dirname(__file__), '..', 'uploads_tmp')
+)
+# Délai avant suppression d'un fichier sans référence (URLs signées encore valides, caches)
+AUDIO_GC_GRACE_SECONDS = int(os.getenv('AUDIO_GC_GRACE_SECONDS', '86400'))
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class AudioStoreError(Exception):
+    """Fichier adressé introuvable dans le stockage (supprimé par le ramasse-miettes)"""
+
+
+def _extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if filename and '.' in filename else 'bin'
+
+
+def store_audio_stream(stream, filename):
+    """Écrire un flux sur disque en calculant son SHA-256 au passage, puis le ranger"""
+    os.makedirs(AUDIO_TMP_FOLDER, exist_ok=True)
+    tmp_path = os.path.join(AUDIO_TMP_FOLDER, f'{uuid.uuid4().hex}.incoming')
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            for buffer in iter(lambda: stream.read(COPY_BUFFER_SIZE), b''):
+                digest.update(buffer)
+                f.write(buffer)
+                size += len(buffer)
+        return _commit_blob(tmp_path, digest.hexdigest(), size, _extension(filename))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def file_sha256(file_path):
+    """SHA-256 d'un fichier, lu par blocs (mémoire bornée)"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for buffer in iter(lambda: f.read(COPY_BUFFER_SIZE), b''):
+            digest.update(buffer)
+    return digest.hexdigest()
+
+
+def store_audio_file(file_path, filename, sha256=None):
+    """Ranger un fichier déjà sur disque (upload découpé terminé) dans le stockage"""
+    if sha256 is None:
+        sha256 = file_sha256(file_path)
+    try:
+        return _commit_blob(file_path, sha256, os.path.getsize(file_path), _extension(filename))
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def _commit_blob(tmp_path, sha256, size, extension):
+    blob = db.session.get(AudioBlob, sha256)
+    if blob is not None and resolve_audio_path(blob.audio_file_path):
+        # Contenu déjà stocké : déduplication, le fichier temporaire est abandonné
+        return blob
+    
+    filename = f'{sha256}.{extension}' if blob is None else os.path.basename(blob.audio_file_path)
+    os.makedirs(AUDIO_FOLDER, exist_ok=True)
+    shutil.move(tmp_path, os.path.join(AUDIO_FOLDER, filename))
+    
+    if blob is None:
+        blob = AudioBlob(
+            sha256=sha256,
+            audio_file_path=AUDIO_URL_PREFIX + filename,
+            size=size,
+            ref_count=0,
+            released_at=datetime.utcnow()
+        )
+        db.session.add(blob)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Même contenu reçu en parallèle par un autre worker
+            db.session.rollback()
+            blob = db.session.get(AudioBlob, sha256)
+    return blob
+
+
+def _change_ref_count(audio_file_path, delta):
+    values = {'ref_count': db.case((AudioBlob.ref_count + delta < 0, 0), else_=AudioBlob.ref_count + delta)}
+    if delta < 0:
+        values['released_at'] = datetime.utcnow()
+    result = db.session.execute(
+        db.update(AudioBlob).where(AudioBlob.audio_file_path == audio_file_path).values(**values)
+    )
+    return result.rowcount == 1
+
+
+def attach_audio(story, audio_file_path):
+    """Associer un fichier stocké à une histoire (à committer par l'appelant)
+
+    Les versions dérivées de l'ancien fichier (mobile, ...) sont supprimées dans la
+    même transaction.
+
+    Renvoie l'ancien chemin s'il s'agissait d'un fichier hors stockage adressé,
+    à supprimer avec delete_legacy_audio une fois le commit effectué.
+    """
+    previous_path = story.audio_file_path
+    if previous_path == audio_file_path:
+        return None
+    if not _change_ref_count(audio_file_path, +1):
+        # Blob supprimé par le ramasse-miettes entre le stockage et l'association
+        raise AudioStoreError('Fichier audio supprimé entre-temps, merci de le renvoyer')
+    story.audio_file_path = audio_file_path
+    if story.id is not None:
+        # Les versions dérivées de l'ancien fichier ne doivent plus être servies ;
+        # le job audio du nouveau fichier les recrée
+        AudioRendition.query.filter_by(story_id=story.id).delete(synchronize_session=False)
+    if previous_path and not release_audio(previous_path):
+        return previous_path
+    return None
+
+
+def release_audio(audio_file_path):
+    """Retirer une référence ; renvoie False pour un ancien fichier hors stockage adressé"""
+    return _change_ref_count(audio_file_path, -1)
+
+
+def delete_legacy_audio(audio_file_path):
+    """Supprimer un ancien fichier (nommé d'après l'upload) s'il n'est plus référencé"""
+    file_path = resolve_audio_path(audio_file_path)
+    still_used = db.session.scalar(
+        db.select(db.func.count(Story.id)).where(Story.audio_file_path == audio_file_path)
+    )
+    if file_path and not still_used:
+        os.remove(file_path)
+
+
+def collect_audio_garbage(grace_seconds=AUDIO_GC_GRACE_SECONDS):
+    """Supprimer les fichiers sans référence depuis plus que le délai de grâce"""
+    released_before = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    candidates = AudioBlob.query.filter(
+        AudioBlob.ref_count == 0,
+        AudioBlob.released_at < released_before
+    ).all()
+    
+    removed = 0
+    for blob in candidates:
+        # Filet de sécurité : recompter les références réelles avant de supprimer
+        references = db.session.scalar(
+            db.select(db.func.count(Story.id)).where(Story.audio_file_path == blob.audio_file_path)
+        )
+        if references:
+            blob.ref_count = references
+            db.session.commit()
+            continue
+        
+        # La ligne est supprimée d'abord, seulement si personne ne l'a reprise entre-temps :
+        # une association concurrente voit alors 0 ligne et échoue au lieu de pointer vers
+        # un fichier effacé
+        sha256, audio_file_path = blob.sha256, blob.audio_file_path
+        deleted = db.session.execute(
+            db.delete(AudioBlob).where(AudioBlob.sha256 == sha256, AudioBlob.ref_count == 0)
+        )
+        if deleted.rowcount != 1:
+            db.session.rollback()
+            continue
+        AudioRendition.query.filter(
+            AudioRendition.audio_file_path == AUDIO_URL_PREFIX + f'{sha256}.mobile.mp3'
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        
+        file_path = resolve_audio_path(audio_file_path)
+        if file_path:
+            mobile_path = f'{os.path.splitext(file_path)[0]}.mobile.mp3'
+            for path in (file_path, mobile_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        removed += 1
+    
+    db.session.commit()
+    return removed
@@ -0,0 +1,52 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from src.models.user import db
+
+# Pools de threads par type de tâche (par worker gunicorn)
+POOL_SIZES = {
+    'audio': int(os.getenv('AUDIO_WORKERS', '2')),
+    'payments': int(os.getenv('PAYMENT_WORKERS', '4')),
+    'reports': int(os.getenv('REPORT_WORKERS', '1')),
+}
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executor(pool):
+    with _executors_lock:
+        executor = _executors.get(pool)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=POOL_SIZES.get(pool, 2), thread_name_prefix=f'{pool}-job')
+            _executors[pool] = executor
+        return executor
+
+
+def submit_in_app_context(function, *args, pool='audio'):
+    """Exécuter une tâche dans un pool d'arrière-plan, avec le contexte applicatif"""
+    app = current_app._get_current_object()
+    return _get_executor(pool).submit(_run_in_app, app, function, *args)
+
+
+def submit_later(delay, function, *args, pool='audio'):
+    """Soumettre une tâche au pool après `delay` secondes (sans occuper un thread du pool)"""
+    app = current_app._get_current_object()
+    
+    def submit():
+        with app.app_context():
+            submit_in_app_context(function, *args, pool=pool)
+    
+    timer = threading.Timer(delay, submit)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+def _run_in_app(app, function, *args):
+    with app.app_context():
+        try:
+            return function(*args)
+        finally:
+            db.session.remove()
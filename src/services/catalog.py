@@ -0,0 +1,145 @@
+import base64
+import json
+from datetime import datetime
+from src.models.story import db, Story
+
+# Pagination du catalogue (keyset)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Colonnes exposées par /api/stories (mêmes clés que Story.to_dict). Le chemin du fichier
+# audio n'est pas public : seule sa présence l'est, l'écoute passe par /check-access
+STORY_FIELDS = ('id', 'title', 'description', 'duration', 'category', 'price',
+                'has_audio', 'is_premium', 'created_at')
+
+# Ordres de tri supportés : 'id' (croissant) ou 'newest' (created_at puis id décroissants)
+STORY_SORTS = ('id', 'newest')
+
+
+class CatalogQueryError(ValueError):
+    """Paramètre de requête du catalogue invalide"""
+
+
+def encode_cursor(sort, last_row):
+    """Encoder la position de la dernière ligne en jeton opaque"""
+    payload = {'s': sort, 'id': last_row['id']}
+    if sort == 'newest':
+        created_at = last_row['created_at']
+        payload['c'] = created_at.isoformat() if created_at else None
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, sort):
+    """Décoder un jeton de pagination produit par encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        if payload.get('s') != sort:
+            raise CatalogQueryError('Curseur incompatible avec l\'ordre de tri demandé')
+        last_id = int(payload['id'])
+        created_at = None
+        if sort == 'newest' and payload.get('c'):
+            created_at = datetime.fromisoformat(payload['c'])
+        return last_id, created_at
+    except CatalogQueryError:
+        raise
+    except (ValueError, KeyError, TypeError):
+        raise CatalogQueryError('Curseur de pagination invalide')
+
+
+def parse_fields(raw_fields):
+    """Valider la projection ?fields=a,b,c (l'id est toujours inclus)"""
+    if not raw_fields:
+        return list(STORY_FIELDS)
+    fields = [field.strip() for field in raw_fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in STORY_FIELDS]
+    if unknown:
+        raise CatalogQueryError(f'Champs inconnus: {", ".join(unknown)}')
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return fields
+
+
+def parse_bool(raw_value):
+    value = raw_value.strip().lower()
+    if value in ('1', 'true', 'yes', 'oui'):
+        return True
+    if value in ('0', 'false', 'no', 'non'):
+        return False
+    raise CatalogQueryError(f'Valeur booléenne invalide: {raw_value}')
+
+
+def story_column(field):
+    """Expression SQL d'un champ du catalogue"""
+    if field == 'has_audio':
+        return Story.audio_file_path.isnot(None).label('has_audio')
+    return getattr(Story, field)
+
+
+def serialize_story_row(row, fields):
+    story = {}
+    for field in fields:
+        value = row[field]
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif field == 'has_audio':
+            value = bool(value)
+        story[field] = value
+    return story
+
+
+def list_stories(args):
+    """Page d'histoires filtrée, projetée en SQL et paginée par keyset"""
+    sort = args.get('sort', 'id')
+    if sort not in STORY_SORTS:
+        raise CatalogQueryError(f'Tri inconnu: {sort}')
+    
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise CatalogQueryError('Paramètre limit invalide')
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    
+    fields = parse_fields(args.get('fields'))
+    # Les colonnes de la clé de pagination doivent être lues même si non demandées
+    selected = list(fields)
+    if sort == 'newest' and 'created_at' not in selected:
+        selected.append('created_at')
+    
+    query = db.select(*[story_column(field) for field in selected])
+    
+    if args.get('category'):
+        query = query.where(Story.category == args['category'])
+    if args.get('is_premium'):
+        query = query.where(Story.is_premium.is_(parse_bool(args['is_premium'])))
+    
+    cursor = args.get('cursor')
+    if sort == 'id':
+        if cursor:
+            last_id, _ = decode_cursor(cursor, sort)
+            query = query.where(Story.id > last_id)
+        query = query.order_by(Story.id.asc())
+    else:
+        if cursor:
+            last_id, last_created_at = decode_cursor(cursor, sort)
+            if last_created_at is None:
+                query = query.where(Story.created_at.is_(None), Story.id < last_id)
+            else:
+                query = query.where(db.or_(
+                    Story.created_at < last_created_at,
+                    db.and_(Story.created_at == last_created_at, Story.id < last_id),
+                    Story.created_at.is_(None)
+                ))
+        query = query.order_by(Story.created_at.desc(), Story.id.desc())
+    
+    # Une ligne de plus pour savoir s'il reste une page
+    rows = db.session.execute(query.limit(limit + 1)).mappings().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    return {
+        'stories': [serialize_story_row(row, fields) for row in rows],
+        'next_cursor': encode_cursor(sort, rows[-1]) if has_more else None,
+        'has_more': has_more
+    }
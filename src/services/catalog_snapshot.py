@@ -0,0 +1,97 @@
+import gzip
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import request, make_response, current_app
+from src.services.catalog_version import get_catalog_version
+
+# Nombre de réponses sérialisées gardées par worker (une par chemin + paramètres)
+CATALOG_SNAPSHOT_MAX_ENTRIES = int(os.getenv('CATALOG_SNAPSHOT_MAX_ENTRIES', '256'))
+# En dessous de cette taille, la compression ne vaut pas le coût
+GZIP_MIN_SIZE = 512
+
+
+class CatalogSnapshotCache:
+    """Réponses JSON pré-sérialisées (brutes + gzip), valides pour une version du catalogue"""
+    
+    def __init__(self, max_entries=CATALOG_SNAPSHOT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, version, key):
+        with self._lock:
+            if version != self._version:
+                # Le catalogue a changé (dans ce worker ou un autre) : tout reconstruire
+                self._version = version
+                self._entries.clear()
+            snapshot = self._entries.get(key)
+            if snapshot is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return snapshot
+    
+    def put(self, version, key, body):
+        gzipped = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_SIZE else None
+        snapshot = (body, gzipped)
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = snapshot
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return snapshot
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': sum(len(body) + len(gzipped or b'') for body, gzipped in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+catalog_snapshots = CatalogSnapshotCache()
+
+
+def snapshot_response(snapshot):
+    """Construire la réponse à partir des octets en cache, compressés si le client l'accepte"""
+    body, gzipped = snapshot
+    if gzipped is not None and 'gzip' in request.accept_encodings:
+        response = make_response(gzipped)
+        response.content_encoding = 'gzip'
+    else:
+        response = make_response(body)
+    response.mimetype = current_app.json.mimetype
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def snapshot_catalog_get(view):
+    """Décorateur : servir les GET du catalogue depuis un instantané sérialisé en mémoire"""
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        version, _ = get_catalog_version()
+        key = request.full_path
+        
+        snapshot = catalog_snapshots.get(version, key)
+        if snapshot is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.direct_passthrough:
+                return response
+            snapshot = catalog_snapshots.put(version, key, response.get_data())
+        
+        return snapshot_response(snapshot)
+    return decorated_function
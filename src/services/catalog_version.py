@@ -0,0 +1,72 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from functools import wraps
+from flask import request, make_response
+from src.services.version_marker import VersionMarker
+
+# Marqueur de version du catalogue partagé entre les workers gunicorn
+CATALOG_VERSION_FILE = os.getenv(
+    'CATALOG_VERSION_FILE',
+    os.path.join(os.path.dirname(__file__), '..', 'database', 'catalog.version')
+)
+
+_marker = VersionMarker(CATALOG_VERSION_FILE)
+
+
+def bump_catalog_version():
+    """Signaler une modification du catalogue (histoires ou packs) à tous les workers"""
+    return _marker.bump()
+
+
+def get_catalog_version():
+    """Version courante du catalogue et sa date de modification, sans requête SQL"""
+    token, mtime_ns = _marker.current()
+    # Arrondi à la seconde suivante : Last-Modified est postérieur à toute écriture de cette seconde
+    return token, datetime.fromtimestamp(mtime_ns // 10 ** 9 + 1, tz=timezone.utc)
+
+
+def catalog_etag(version):
+    """ETag fort : version du catalogue + ressource demandée (chemin et paramètres)"""
+    resource = request.full_path.encode('utf-8')
+    digest = hashlib.sha1(version.encode('ascii') + b'|' + resource).hexdigest()
+    return digest[:32]
+
+
+def conditional_catalog_get(view):
+    """Décorateur : répondre 304 sans toucher la base si le client a la version courante"""
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        version, last_modified = get_catalog_version()
+        etag = catalog_etag(version)
+        # Tant que la seconde de la dernière modification n'est pas écoulée, une autre écriture
+        # peut encore produire la même date : seul l'ETag permet alors de répondre 304
+        date_is_final = last_modified <= datetime.now(timezone.utc)
+        
+        if request.if_none_match:
+            # La variante gzip a son propre ETag fort mais représente la même version
+            if request.if_none_match.contains(etag + '-gz'):
+                etag += '-gz'
+                not_modified = True
+            else:
+                not_modified = request.if_none_match.contains(etag)
+        else:
+            not_modified = bool(date_is_final and request.if_modified_since
+                                and request.if_modified_since >= last_modified)
+        
+        if not_modified:
+            response = make_response('', 304)
+            response.vary.add('Accept-Encoding')
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            if response.content_encoding == 'gzip':
+                etag += '-gz'
+        
+        response.set_etag(etag)
+        if date_is_final:
+            response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        return response
+    return decorated_function
@@ -0,0 +1,239 @@
+import json
+import os
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from src.models.story import db, Purchase, PurchaseStory
+from src.models.payment import CaptureJob, Order
+from src.services.entitlements import entitlement_cache
+from src.services.background import submit_in_app_context, submit_later
+from src.services.paypal_client import get_paypal_client
+from src.services.orders import mark_order_completed
+from src.services.credits import packs_grant_credits, grant_credits
+from src.services.sales_rollups import record_sale
+from src.services.story_allocation import allocate_story_ids, parse_allocation, AllocationError
+from src.services.pack_registry import pack_registry, InvalidPurchaseAmount, UNLIMITED_PACK_ID
+
+# 'sync' : capture dans la requête ; 'async' : capture en arrière-plan + webhook
+PAYPAL_CAPTURE_MODE = os.getenv('PAYPAL_CAPTURE_MODE', 'sync')
+CAPTURE_MAX_ATTEMPTS = 3
+# Délai avant une nouvelle tentative de capture (doublé à chaque échec)
+CAPTURE_RETRY_DELAY = float(os.getenv('CAPTURE_RETRY_DELAY', '10'))
+# Au-delà, une capture restée 'running' (worker arrêté brutalement) est remise en attente
+CAPTURE_JOB_TIMEOUT = int(os.getenv('CAPTURE_JOB_TIMEOUT', '300'))
+
+
+class CaptureNotCompleted(Exception):
+    """PayPal a répondu mais le paiement n'est pas au statut COMPLETED"""
+
+
+def captured_amount(capture_result):
+    return float(capture_result['purchase_units'][0]['payments']['captures'][0]['amount']['value'])
+
+
+def record_captured_purchase(order_id, purchase_data, amount_paid):
+    """Créer l'achat d'une commande capturée ; idempotent sur paypal_transaction_id
+
+    Renvoie (achat, créé) : un second appel (retry, webhook) renvoie l'achat existant.
+    """
+    existing = Purchase.query.filter_by(paypal_transaction_id=order_id).first()
+    if existing:
+        mark_order_completed(order_id, existing)
+        return existing, False
+    
+    pack_type = purchase_data.get('pack_type', 'single')
+    # Un pack désactivé après la création de la commande reste honoré
+    pack = pack_registry.get(pack_type, active_only=False)
+    if pack is None:
+        raise InvalidPurchaseAmount(f'Pack inconnu: {pack_type}')
+    
+    # Le montant capturé doit couvrir celui de la commande (ou, à défaut, le prix du pack)
+    order = Order.query.filter_by(order_id=order_id).first()
+    expected_amount = order.amount if order is not None else pack.price
+    if round(amount_paid, 2) < round(expected_amount, 2):
+        raise InvalidPurchaseAmount(f'Montant capturé insuffisant: {expected_amount:.2f} attendu')
+    
+    # Déterminer quelles histoires débloquer selon le pack
+    story_ids = None
+    credits = 0
+    
+    if pack_type == 'single':
+        # Pour un achat unique, spécifier l'ID de l'histoire
+        story_ids = json.dumps([purchase_data.get('story_id')])
+    elif pack_type != UNLIMITED_PACK_ID and pack.size and packs_grant_credits():
+        # Les histoires du pack seront débloquées une à une contre des crédits
+        credits = pack.size
+    elif pack_type != UNLIMITED_PACK_ID and pack.size:
+        # Pour les packs, débloquer des histoires que l'acheteur ne possède pas encore
+        try:
+            allocation = parse_allocation(purchase_data.get('allocation'))
+        except AllocationError:
+            # Paiement déjà encaissé : on retombe sur la stratégie par défaut
+            allocation = {}
+        story_ids = json.dumps(allocate_story_ids(purchase_data.get('user_email'), pack.size, allocation))
+    # Pour 'unlimited', on ne spécifie pas de story_ids (accès à tout)
+    
+    purchase = Purchase(
+        user_email=purchase_data.get('user_email'),
+        pack_type=pack_type,
+        story_ids=story_ids,
+        amount_paid=amount_paid,
+        paypal_transaction_id=order_id
+    )
+    
+    try:
+        db.session.add(purchase)
+        db.session.flush()
+        PurchaseStory.add_for_purchase(purchase)
+        record_sale(purchase)
+        if credits:
+            grant_credits(purchase, credits)
+        db.session.commit()
+    except IntegrityError:
+        # Capture et webhook concurrents : l'index unique garde un seul achat
+        db.session.rollback()
+        existing = Purchase.query.filter_by(paypal_transaction_id=order_id).first()
+        if existing is None:
+            raise
+        mark_order_completed(order_id, existing)
+        return existing, False
+    entitlement_cache.invalidate(purchase.user_email)
+    mark_order_completed(order_id, purchase)
+    return purchase, True
+
+
+def capture_order_and_record(order_id, purchase_data):
+    """Capturer la commande chez PayPal puis enregistrer l'achat
+
+    Renvoie (achat, réponse PayPal). Lève CaptureNotCompleted si le paiement
+    n'est pas complété ; renvoie (None, réponse) sur erreur HTTP PayPal.
+    """
+    response = get_paypal_client().capture_order(order_id)
+    
+    if response.status_code == 201:
+        capture_result = response.json()
+        if capture_result['status'] != 'COMPLETED':
+            raise CaptureNotCompleted('Le paiement n\'a pas été complété')
+        purchase, _ = record_captured_purchase(order_id, purchase_data, captured_amount(capture_result))
+        return purchase, response
+    
+    if response.status_code == 422 and 'ORDER_ALREADY_CAPTURED' in response.text:
+        # Déjà capturée (retry ou webhook arrivé avant) : l'achat existe ou se reconstruit
+        existing = Purchase.query.filter_by(paypal_transaction_id=order_id).first()
+        if existing:
+            return existing, response
+        order_response = get_paypal_client().get_order(order_id)
+        if order_response.status_code == 200 and order_response.json().get('status') == 'COMPLETED':
+            order = order_response.json()
+            purchase, _ = record_captured_purchase(order_id, purchase_data, captured_amount(order))
+            return purchase, order_response
+    
+    return None, response
+
+
+def enqueue_capture(order_id, purchase_data):
+    """Mettre une capture en file d'attente (idempotent sur order_id)"""
+    job = CaptureJob.query.filter_by(order_id=order_id).first()
+    if job is not None:
+        return job
+    
+    job = CaptureJob(order_id=order_id, purchase_data=json.dumps(purchase_data or {}))
+    db.session.add(job)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Même commande soumise en parallèle
+        db.session.rollback()
+        return CaptureJob.query.filter_by(order_id=order_id).first()
+    
+    submit_in_app_context(process_capture_job, job.id, pool='payments')
+    return job
+
+
+def process_capture_job(job_id):
+    """Traiter une capture différée (pool d'arrière-plan 'payments')"""
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        db.update(CaptureJob)
+        .where(CaptureJob.id == job_id, CaptureJob.status == 'pending',
+               db.or_(CaptureJob.next_attempt_at.is_(None), CaptureJob.next_attempt_at <= now))
+        .values(status='running', attempts=CaptureJob.attempts + 1, updated_at=now,
+                next_attempt_at=now + timedelta(seconds=CAPTURE_JOB_TIMEOUT))
+    )
+    db.session.commit()
+    if claimed.rowcount != 1:
+        return False
+    
+    job = db.session.get(CaptureJob, job_id)
+    retry = False
+    try:
+        purchase, response = capture_order_and_record(job.order_id, job.get_purchase_data())
+        if purchase is not None:
+            job.status = 'completed'
+            job.purchase_id = purchase.id
+            job.error = None
+        else:
+            # Erreurs serveur PayPal : nouvelle tentative ; erreurs client : échec définitif
+            retry = response.status_code >= 500 and job.attempts < CAPTURE_MAX_ATTEMPTS
+            job.status = 'pending' if retry else 'failed'
+            job.error = f'PayPal {response.status_code}: {response.text[:500]}'
+    except (CaptureNotCompleted, InvalidPurchaseAmount) as e:
+        db.session.rollback()
+        job = db.session.get(CaptureJob, job_id)
+        job.status = 'failed'
+        job.error = str(e)
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(CaptureJob, job_id)
+        retry = job.attempts < CAPTURE_MAX_ATTEMPTS
+        job.status = 'pending' if retry else 'failed'
+        job.error = str(e)
+    
+    if retry:
+        # Nouvelle tentative automatique, avec un délai croissant
+        delay = CAPTURE_RETRY_DELAY * 2 ** (job.attempts - 1)
+        job.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+    db.session.commit()
+    if retry:
+        submit_later(delay, process_capture_job, job_id, pool='payments')
+    return job.status == 'completed'
+
+
+def process_pending_capture_jobs(limit=None):
+    """Relancer les captures dues (commande CLI ou reprise après redémarrage)"""
+    # Les captures restées 'running' au-delà de leur bail (arrêt brutal du worker) sont remises en attente
+    now = datetime.utcnow()
+    db.session.execute(
+        db.update(CaptureJob)
+        .where(CaptureJob.status == 'running', CaptureJob.next_attempt_at < now)
+        .values(status='pending', next_attempt_at=now)
+    )
+    db.session.commit()
+    
+    query = (
+        db.select(CaptureJob.id)
+        .where(CaptureJob.status == 'pending', CaptureJob.next_attempt_at <= now)
+        .order_by(CaptureJob.next_attempt_at)
+    )
+    if limit:
+        query = query.limit(limit)
+    processed = 0
+    for job_id in db.session.scalars(query).all():
+        if process_capture_job(job_id):
+            processed += 1
+    return processed
+
+
+def complete_capture_from_webhook(order_id, amount_paid, fallback_purchase_data=None):
+    """Réconcilier un PAYMENT.CAPTURE.COMPLETED : créer l'achat s'il manque"""
+    job = CaptureJob.query.filter_by(order_id=order_id).first()
+    purchase_data = job.get_purchase_data() if job is not None else fallback_purchase_data
+    if not purchase_data or not purchase_data.get('user_email'):
+        return None
+    
+    purchase, _ = record_captured_purchase(order_id, purchase_data, amount_paid)
+    if job is not None and job.status != 'completed':
+        job.status = 'completed'
+        job.purchase_id = purchase.id
+        job.error = None
+        db.session.commit()
+    return purchase
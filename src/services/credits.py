@@ -0,0 +1,103 @@
+import os
+from sqlalchemy.exc import IntegrityError
+from src.models.story import db, Story, Purchase, PurchaseStory
+from src.models.credits import CreditAccount, CreditLedgerEntry
+from src.services.entitlements import load_entitlements, entitlement_cache
+from src.services.sales_rollups import record_credit_unlock
+
+# 'credits' : les packs créditent un solde dépensé histoire par histoire ;
+# 'allocate' : les histoires du pack sont attribuées dès l'achat
+PACK_FULFILLMENT = os.getenv('PACK_FULFILLMENT', 'credits')
+
+
+class CreditError(Exception):
+    """Dépense de crédit impossible, avec le code HTTP à renvoyer"""
+    
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def packs_grant_credits():
+    return PACK_FULFILLMENT == 'credits'
+
+
+def get_balance(user_email):
+    """Solde de crédits (lecture par clé primaire)"""
+    balance = db.session.scalar(
+        db.select(CreditAccount.balance).where(CreditAccount.user_email == user_email)
+    )
+    return balance or 0
+
+
+def grant_credits(purchase, amount):
+    """Créditer le compte pour un achat (l'achat doit avoir été flush ; pas de commit)"""
+    db.session.add(CreditLedgerEntry(
+        user_email=purchase.user_email, delta=amount, reason='grant', purchase_id=purchase.id
+    ))
+    credited = db.session.execute(
+        db.update(CreditAccount)
+        .where(CreditAccount.user_email == purchase.user_email)
+        .values(balance=CreditAccount.balance + amount)
+    )
+    if credited.rowcount == 1:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(CreditAccount(user_email=purchase.user_email, balance=amount))
+    except IntegrityError:
+        # Compte créé en parallèle par un autre achat
+        db.session.execute(
+            db.update(CreditAccount)
+            .where(CreditAccount.user_email == purchase.user_email)
+            .values(balance=CreditAccount.balance + amount)
+        )
+
+
+def spend_credit(user_email, story_id):
+    """Débloquer une histoire contre un crédit
+    
+    Renvoie (solde, débité) : une histoire déjà accessible n'est pas débitée.
+    Lève CreditError si l'histoire n'existe pas ou si le solde est épuisé.
+    """
+    entitlements = load_entitlements(user_email)
+    if entitlements.has_unlimited or story_id in entitlements.story_ids:
+        return get_balance(user_email), False
+    
+    if db.session.get(Story, story_id) is None:
+        raise CreditError('Histoire non trouvée', 404)
+    
+    # Crédits rattachés au dernier achat actif qui en a accordé
+    source_purchase_id = db.session.scalar(
+        db.select(CreditLedgerEntry.purchase_id)
+        .join(Purchase, Purchase.id == CreditLedgerEntry.purchase_id)
+        .where(CreditLedgerEntry.user_email == user_email, CreditLedgerEntry.reason == 'grant',
+               Purchase.is_active.is_(True))
+        .order_by(CreditLedgerEntry.id.desc())
+        .limit(1)
+    )
+    
+    # Décrément atomique : jamais de solde négatif, même avec des requêtes concurrentes
+    debited = db.session.execute(
+        db.update(CreditAccount)
+        .where(CreditAccount.user_email == user_email, CreditAccount.balance >= 1)
+        .values(balance=CreditAccount.balance - 1)
+    )
+    if debited.rowcount != 1 or source_purchase_id is None:
+        db.session.rollback()
+        raise CreditError('Crédits insuffisants', 402)
+    
+    db.session.add(CreditLedgerEntry(
+        user_email=user_email, delta=-1, reason='spend', purchase_id=source_purchase_id, story_id=story_id
+    ))
+    db.session.add(PurchaseStory(purchase_id=source_purchase_id, user_email=user_email, story_id=story_id))
+    try:
+        record_credit_unlock(source_purchase_id, story_id)
+        db.session.commit()
+    except IntegrityError:
+        # La même histoire vient d'être débloquée par une requête concurrente : pas de débit
+        db.session.rollback()
+        return get_balance(user_email), False
+    
+    entitlement_cache.invalidate(user_email)
+    return get_balance(user_email), True
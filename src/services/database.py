@@ -0,0 +1,89 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+DEFAULT_DATABASE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'app.db')
+# URL de la base, surchargeable par l'environnement (autre fichier, autre moteur)
+DATABASE_URL = os.getenv('DATABASE_URL', f'sqlite:///{DEFAULT_DATABASE_PATH}')
+
+# Réglages SQLite appliqués à chaque nouvelle connexion
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')  # lecteurs non bloqués par l'écrivain
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # sûr en WAL, un fsync par checkpoint
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))  # attendre le verrou au lieu de 'database is locked'
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', str(64 * 1024)))
+
+# Pool de connexions par worker (gunicorn : une copie par processus)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '3600'))
+
+
+def is_sqlite(url):
+    return make_url(url).get_backend_name() == 'sqlite'
+
+
+def is_sqlite_memory(url):
+    return is_sqlite(url) and make_url(url).database in (None, '', ':memory:')
+
+
+def sqlite_pragmas():
+    """PRAGMA exécutés à l'ouverture de chaque connexion SQLite"""
+    return [
+        ('journal_mode', SQLITE_JOURNAL_MODE),
+        ('synchronous', SQLITE_SYNCHRONOUS),
+        ('busy_timeout', SQLITE_BUSY_TIMEOUT_MS),
+        ('mmap_size', SQLITE_MMAP_SIZE),
+        ('cache_size', -SQLITE_CACHE_SIZE_KB),  # valeur négative : taille en KiB
+        ('temp_store', 'MEMORY'),
+    ]
+
+
+def engine_options(url=DATABASE_URL):
+    """Options create_engine adaptées au moteur (SQLALCHEMY_ENGINE_OPTIONS)"""
+    if is_sqlite_memory(url):
+        # Base en mémoire : le pool par défaut de SQLAlchemy (une connexion partagée)
+        return {}
+    options = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+    }
+    if is_sqlite(url):
+        # Délai d'attente du module sqlite3, cohérent avec busy_timeout
+        options['connect_args'] = {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}
+    else:
+        options['pool_pre_ping'] = True
+    return options
+
+
+def install_sqlite_pragmas(engine, pragmas=None):
+    """Appliquer les PRAGMA à chaque connexion ouverte par le moteur"""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas() if pragmas is None else pragmas
+    
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+
+def configure_database(app, db):
+    """Configurer l'URL, le pool et les PRAGMA, puis initialiser Flask-SQLAlchemy
+    
+    Un profil de configuration peut imposer sa propre URL (SQLALCHEMY_DATABASE_URI).
+    """
+    url = app.config.setdefault('SQLALCHEMY_DATABASE_URI', DATABASE_URL)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        # Le moteur est créé par init_app mais n'a encore ouvert aucune connexion
+        install_sqlite_pragmas(db.engine)
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from src.models.story import db, Purchase, PurchaseStory
+from src.services.version_marker import VersionMarker
+
+# Taille et durée de vie du cache des droits d'accès (par worker)
+ENTITLEMENT_CACHE_SIZE = int(os.getenv('ENTITLEMENT_CACHE_SIZE', '2048'))
+ENTITLEMENT_CACHE_TTL = float(os.getenv('ENTITLEMENT_CACHE_TTL', '300'))
+# Marqueur partagé entre les workers : un achat dans un worker invalide le cache de tous
+ENTITLEMENTS_VERSION_FILE = os.getenv(
+    'ENTITLEMENTS_VERSION_FILE',
+    os.path.join(os.path.dirname(__file__), '..', 'database', 'entitlements.version')
+)
+
+# Ensemble des histoires débloquées pour un utilisateur
+Entitlements = namedtuple('Entitlements', ['story_ids', 'has_unlimited'])
+
+
+def load_entitlements(user_email):
+    """Calculer les droits d'accès d'un utilisateur en une seule requête"""
+    rows = db.session.execute(
+        db.select(Purchase.pack_type, PurchaseStory.story_id)
+        .outerjoin(PurchaseStory, PurchaseStory.purchase_id == Purchase.id)
+        .where(Purchase.user_email == user_email, Purchase.is_active.is_(True))
+    )
+    
+    story_ids = set()
+    has_unlimited = False
+    for pack_type, story_id in rows:
+        if pack_type == 'unlimited':
+            has_unlimited = True
+        if story_id is not None:
+            story_ids.add(story_id)
+    
+    return Entitlements(frozenset(story_ids), has_unlimited)
+
+
+class EntitlementCache:
+    """Cache LRU borné (avec TTL) des droits d'accès calculés par email
+    
+    Les entrées valent pour une version du marqueur partagé : invalidate() le change, et
+    chaque worker vide son cache au prochain accès (un stat() du fichier, sans SQL).
+    """
+    
+    def __init__(self, max_size=ENTITLEMENT_CACHE_SIZE, ttl=ENTITLEMENT_CACHE_TTL, loader=load_entitlements,
+                 marker=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.loader = loader
+        self.marker = marker or VersionMarker(ENTITLEMENTS_VERSION_FILE)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, user_email):
+        """Récupérer les droits d'accès, en les recalculant si absents ou expirés"""
+        now = time.monotonic()
+        version, _ = self.marker.current()
+        with self._lock:
+            if version != self._version:
+                # Achat enregistré par un worker (celui-ci ou un autre) : tout recalculer
+                self._version = version
+                self._generation += 1
+                self._entries.clear()
+            entry = self._entries.get(user_email)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_email)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+        
+        entitlements = self.loader(user_email)
+        
+        with self._lock:
+            # Une invalidation pendant le calcul rend le résultat potentiellement obsolète
+            if generation != self._generation or self.marker.current()[0] != version:
+                return entitlements
+            self._entries[user_email] = (now + self.ttl, entitlements)
+            self._entries.move_to_end(user_email)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entitlements
+    
+    def invalidate(self, user_email):
+        """Oublier les droits d'accès d'un utilisateur après un achat validé, dans tous les workers"""
+        self.marker.bump()
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(user_email, None) is not None:
+                self.invalidations += 1
+    
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+entitlement_cache = EntitlementCache()
@@ -0,0 +1,148 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify, make_response, current_app
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db
+from src.models.payment import IdempotencyRecord
+
+# Durée pendant laquelle une réponse peut être rejouée
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+# Une clé 'en cours' plus ancienne (worker arrêté pendant la requête) peut être reprise
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv('IDEMPOTENCY_LEASE_SECONDS', '300'))
+MAX_KEY_LENGTH = 200
+
+
+def _request_hash():
+    return hashlib.sha256(request.get_data(cache=True)).hexdigest()
+
+
+def _error(message, status_code):
+    return jsonify({
+        'success': False,
+        'error': message
+    }), status_code
+
+
+def _reserve(key, endpoint, request_hash):
+    """Réserver la clé 'en cours'
+
+    Renvoie (bail, None) si la clé est réservée (le bail identifie ce détenteur),
+    sinon (None, enregistrement existant).
+    """
+    now = datetime.utcnow()
+    try:
+        db.session.execute(
+            db.insert(IdempotencyRecord)
+            .values(key=key, endpoint=endpoint, request_hash=request_hash, status='in_progress', created_at=now)
+        )
+        db.session.commit()
+        return now, None
+    except IntegrityError:
+        db.session.rollback()
+    
+    record = db.session.get(IdempotencyRecord, (key, endpoint))
+    if record is None:
+        # Libérée entre-temps
+        return _reserve(key, endpoint, request_hash)
+    
+    expired_before = now - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    lease_expired_before = now - timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)
+    if record.created_at < expired_before:
+        # Clé expirée : elle peut être réutilisée
+        taken_over = _take_over(record, request_hash, now)
+    elif (record.status == 'in_progress' and record.created_at < lease_expired_before
+          and record.request_hash == request_hash):
+        # Bail expiré : le détenteur ne terminera pas, un retry de la même requête reprend la clé
+        taken_over = _take_over(record, request_hash, now)
+    else:
+        return None, record
+    if taken_over:
+        return now, None
+    db.session.expire(record)
+    return _reserve(key, endpoint, request_hash)
+
+
+def _take_over(record, request_hash, now):
+    """Reprendre un enregistrement, seulement si un autre worker ne l'a pas déjà fait"""
+    taken_over = db.session.execute(
+        db.update(IdempotencyRecord)
+        .where(IdempotencyRecord.key == record.key, IdempotencyRecord.endpoint == record.endpoint,
+               IdempotencyRecord.created_at == record.created_at)
+        .values(request_hash=request_hash, status='in_progress', status_code=None, response_body=None,
+                created_at=now)
+    )
+    db.session.commit()
+    return taken_over.rowcount == 1
+
+
+def idempotent(view):
+    """Décorateur : honorer l'en-tête Idempotency-Key sur les endpoints d'achat
+
+    Le premier appel exécute la vue et mémorise sa réponse ; un retry avec la même
+    clé et le même corps la rejoue sans refaire le travail PayPal ni SQL.
+    """
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return _error('Idempotency-Key trop longue', 400)
+        
+        endpoint = request.endpoint
+        request_hash = _request_hash()
+        lease, record = _reserve(key, endpoint, request_hash)
+        
+        if record is not None:
+            if record.request_hash != request_hash:
+                return _error('Idempotency-Key déjà utilisée pour une autre requête', 422)
+            if record.status != 'completed':
+                return _error('Requête en cours de traitement, réessayez plus tard', 409)
+            response = make_response(record.response_body, record.status_code)
+            response.mimetype = current_app.json.mimetype
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            _release(key, endpoint, lease)
+            raise
+        
+        if response.status_code >= 500:
+            # Erreur serveur : la clé est libérée pour permettre un nouvel essai
+            _release(key, endpoint, lease)
+        else:
+            # Sans effet si le bail a expiré et que la clé a été reprise
+            db.session.execute(
+                db.update(IdempotencyRecord)
+                .where(IdempotencyRecord.key == key, IdempotencyRecord.endpoint == endpoint,
+                       IdempotencyRecord.created_at == lease)
+                .values(status='completed', status_code=response.status_code,
+                        response_body=response.get_data(as_text=True))
+            )
+            db.session.commit()
+        return response
+    return decorated_function
+
+
+def _release(key, endpoint, lease):
+    db.session.execute(
+        db.delete(IdempotencyRecord)
+        .where(IdempotencyRecord.key == key, IdempotencyRecord.endpoint == endpoint,
+               IdempotencyRecord.created_at == lease)
+    )
+    db.session.commit()
+
+
+def collect_expired_idempotency_records(max_age=IDEMPOTENCY_TTL_SECONDS):
+    """Supprimer les clés qui ne peuvent plus être rejouées"""
+    deleted = db.session.execute(
+        db.delete(IdempotencyRecord)
+        .where(IdempotencyRecord.created_at < datetime.utcnow() - timedelta(seconds=max_age))
+    )
+    db.session.commit()
+    return deleted.rowcount
@@ -0,0 +1,241 @@
+import re
+from collections import namedtuple
+from src.models.user import db
+from src.models.story import Story, Purchase, PurchaseStory
+from src.models.pack import Pack
+from src.models.migration import SchemaMigration
+from src.models.payment import CaptureJob, IdempotencyRecord
+from src.services.catalog_version import bump_catalog_version
+from src.services.sales_rollups import ROLLUP_MODELS, rebuild_rollups
+
+Migration = namedtuple('Migration', ['version', 'name', 'upgrade', 'query_plan_checks'])
+
+# Requête représentative d'un chemin chaud : son plan ne doit pas parcourir toute la table
+# et, si `expected_index` est renseigné, doit passer par cet index ('COVERING INDEX <nom>'
+# pour exiger une lecture de l'index seul)
+QueryPlanCheck = namedtuple('QueryPlanCheck', ['description', 'sql', 'params', 'expected_index'],
+                            defaults=(None,))
+
+MIGRATIONS = []
+
+# 'SCAN stories' (ou 'SCAN TABLE stories' avant SQLite 3.36) sans index = parcours complet
+FULL_SCAN_PATTERN = re.compile(r'^SCAN (TABLE )?\w+( AS \w+)?$')
+
+
+class MigrationError(Exception):
+    """Déclaration de migrations incohérente (version dupliquée)"""
+
+
+def migration(version, name, query_plan_checks=()):
+    """Déclarer une migration ; les versions s'appliquent dans l'ordre croissant, une seule fois"""
+    def register(function):
+        if any(existing.version == version for existing in MIGRATIONS):
+            raise MigrationError(f'Version de migration dupliquée: {version}')
+        MIGRATIONS.append(Migration(version, name, function, tuple(query_plan_checks)))
+        MIGRATIONS.sort(key=lambda item: item.version)
+        return function
+    return register
+
+
+def create_indexes(model, *names):
+    """Créer les index déclarés sur le modèle s'ils n'existent pas encore"""
+    connection = db.session.connection()
+    for index in model.__table__.indexes:
+        if index.name in names:
+            index.create(connection, checkfirst=True)
+
+
+@migration(1, 'baseline', query_plan_checks=[
+    QueryPlanCheck('histoires débloquées d\'un utilisateur',
+                   'SELECT story_id FROM purchase_stories WHERE user_email = :email AND story_id = :story_id',
+                   {'email': 'user@example.com', 'story_id': 1}, 'ix_purchase_stories_email_story'),
+])
+def baseline():
+    """Tables issues des modèles (ce que faisait db.create_all() au démarrage)"""
+    db.metadata.create_all(db.session.connection())
+
+
+@migration(2, 'query_indexes', query_plan_checks=[
+    QueryPlanCheck('droits d\'accès (entitlements)',
+                   'SELECT purchases.pack_type, purchase_stories.story_id FROM purchases '
+                   'LEFT OUTER JOIN purchase_stories ON purchase_stories.purchase_id = purchases.id '
+                   'WHERE purchases.user_email = :email AND purchases.is_active = 1',
+                   {'email': 'user@example.com'}, 'ix_purchases_email_active'),
+    QueryPlanCheck('catalogue trié par nouveauté',
+                   'SELECT id FROM stories ORDER BY created_at DESC, id DESC LIMIT 100', {},
+                   'ix_stories_created_id'),
+    QueryPlanCheck('catalogue d\'une catégorie',
+                   'SELECT id FROM stories WHERE category = :category '
+                   'ORDER BY created_at DESC, id DESC LIMIT 100',
+                   {'category': 'Coran'}, 'ix_stories_category_created_id'),
+    QueryPlanCheck('packs actifs', 'SELECT * FROM packs WHERE is_active = 1', {}, 'ix_packs_is_active'),
+    QueryPlanCheck('ventes d\'un pack sur une période',
+                   'SELECT count(*), sum(amount_paid) FROM purchases '
+                   'WHERE pack_type = :pack_type AND purchase_date >= :since',
+                   {'pack_type': 'pack10', 'since': '2025-01-01'}, 'ix_purchases_pack_type_date'),
+    QueryPlanCheck('achats actifs récents',
+                   'SELECT id FROM purchases WHERE is_active = 1 AND purchase_date >= :since '
+                   'ORDER BY purchase_date DESC',
+                   {'since': '2025-01-01'}, 'ix_purchases_active_date'),
+])
+def query_indexes():
+    """Index des colonnes filtrées par les requêtes fréquentes"""
+    create_indexes(Purchase, 'ix_purchases_email_active', 'ix_purchases_pack_type_date', 'ix_purchases_active_date')
+    create_indexes(Story, 'ix_stories_created_id', 'ix_stories_category_created_id')
+    create_indexes(Pack, 'ix_packs_is_active')
+
+
+@migration(3, 'unique_paypal_transaction_id')
+def unique_paypal_transaction_id():
+    """Index unique sur purchases.paypal_transaction_id (les doublons existants sont renommés)"""
+    Purchase.ensure_unique_transaction_index()
+
+
+@migration(4, 'default_packs')
+def default_packs():
+    """Packs par défaut sur une base neuve (le registre des packs lit cette table)"""
+    if Pack.query.first() is None:
+        Pack.init_default_packs()
+        # Les workers déjà démarrés rechargent le registre des packs
+        bump_catalog_version()
+
+
+@migration(5, 'admin_dashboard_indexes', query_plan_checks=[
+    QueryPlanCheck('liste des achats de l\'admin',
+                   'SELECT id FROM purchases WHERE purchase_date IS NOT NULL '
+                   'ORDER BY purchase_date DESC, id DESC LIMIT 50', {}, 'ix_purchases_date_id'),
+    QueryPlanCheck('ventes par pack sur une période',
+                   'SELECT pack_type, amount_paid FROM purchases WHERE is_active IS 1 AND purchase_date >= :since',
+                   {'since': '2025-01-01'}, 'COVERING INDEX ix_purchases_active_date'),
+])
+def admin_dashboard_indexes():
+    """Index de la liste paginée des achats ; ix_purchases_active_date couvre les agrégats de ventes"""
+    db.session.execute(db.text('DROP INDEX IF EXISTS ix_purchases_active_date'))
+    create_indexes(Purchase, 'ix_purchases_active_date', 'ix_purchases_date_id')
+
+
+@migration(6, 'sales_rollups', query_plan_checks=[
+    QueryPlanCheck('ventes par jour et par pack (rollup)',
+                   'SELECT day, pack_type, sales, revenue FROM sales_daily WHERE day >= :since AND day <= :until',
+                   {'since': '2025-01-01', 'until': '2025-12-31'}, 'sqlite_autoindex_sales_daily_1'),
+    QueryPlanCheck('meilleures histoires (rollup)',
+                   'SELECT story_id, sum(unlocks), sum(revenue) FROM story_sales_daily '
+                   'WHERE day >= :since AND day <= :until',
+                   {'since': '2025-01-01', 'until': '2025-12-31'}, 'sqlite_autoindex_story_sales_daily_1'),
+    QueryPlanCheck('acheteurs uniques (rollup)',
+                   'SELECT user_email FROM buyer_days WHERE day >= :since AND day <= :until',
+                   {'since': '2025-01-01', 'until': '2025-12-31'}, 'COVERING INDEX sqlite_autoindex_buyer_days_1'),
+])
+def sales_rollups():
+    """Tables de ventes par jour (tenues à jour à chaque achat), remplies depuis l'historique"""
+    connection = db.session.connection()
+    for model in ROLLUP_MODELS:
+        model.__table__.create(connection, checkfirst=True)
+    rebuild_rollups()
+
+
+@migration(7, 'capture_job_backoff', query_plan_checks=[
+    QueryPlanCheck('captures à reprendre',
+                   'SELECT id FROM capture_jobs WHERE status = :status AND next_attempt_at <= :now '
+                   'ORDER BY next_attempt_at',
+                   {'status': 'pending', 'now': '2025-01-01 00:00:00'}, 'ix_capture_jobs_status_next_attempt'),
+])
+def capture_job_backoff():
+    """Date de prochaine tentative des captures différées (délai croissant, reprise des bloquées)"""
+    connection = db.session.connection()
+    columns = {column['name'] for column in db.inspect(connection).get_columns(CaptureJob.__tablename__)}
+    if 'next_attempt_at' not in columns:
+        column_type = CaptureJob.__table__.c.next_attempt_at.type.compile(dialect=connection.dialect)
+        db.session.execute(db.text(f'ALTER TABLE capture_jobs ADD COLUMN next_attempt_at {column_type}'))
+    db.session.execute(
+        db.update(CaptureJob).where(CaptureJob.next_attempt_at.is_(None)).values(next_attempt_at=CaptureJob.updated_at)
+    )
+    create_indexes(CaptureJob, 'ix_capture_jobs_status_next_attempt')
+
+
+@migration(8, 'backfill_entitlements')
+def backfill_entitlements():
+    """Droits d'accès des anciens achats (blob JSON Purchase.story_ids) copiés dans purchase_stories"""
+    migrated_purchases, _ = PurchaseStory.backfill_from_purchases()
+    if migrated_purchases:
+        # Les ventes par histoire de ces achats manquaient aux rollups remplis par la migration 6
+        rebuild_rollups()
+
+
+@migration(9, 'idempotency_purge_index', query_plan_checks=[
+    QueryPlanCheck('clés d\'idempotence expirées',
+                   'SELECT key, endpoint FROM idempotency_records WHERE created_at < :expired_before',
+                   {'expired_before': '2025-01-01 00:00:00'}, 'ix_idempotency_records_created_at'),
+])
+def idempotency_purge_index():
+    """Index de la purge des clés d'idempotence expirées (flask gc-idempotency)"""
+    create_indexes(IdempotencyRecord, 'ix_idempotency_records_created_at')
+
+
+def _schema_migrations_exists():
+    return db.inspect(db.session.connection()).has_table(SchemaMigration.__tablename__)
+
+
+def applied_versions():
+    if not _schema_migrations_exists():
+        return set()
+    return set(db.session.scalars(db.select(SchemaMigration.version)))
+
+
+def current_version():
+    return max(applied_versions(), default=0)
+
+
+def pending_migrations():
+    applied = applied_versions()
+    return [item for item in MIGRATIONS if item.version not in applied]
+
+
+def run_migrations(target=None):
+    """Appliquer les migrations en attente (jusqu'à `target`) ; renvoie celles appliquées"""
+    SchemaMigration.__table__.create(db.session.connection(), checkfirst=True)
+    db.session.commit()
+    
+    applied = []
+    for item in pending_migrations():
+        if target is not None and item.version > target:
+            break
+        try:
+            item.upgrade()
+            db.session.add(SchemaMigration(version=item.version, name=item.name))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        applied.append(item)
+    return applied
+
+
+def explain_query_plan(sql, params=None):
+    rows = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}'), params or {}).all()
+    return [row[-1] for row in rows]
+
+
+def check_query_plans():
+    """Vérifier que les requêtes des migrations appliquées utilisent un index
+    
+    Renvoie une liste de (migration, vérification, plan, problèmes) ; une liste de
+    problèmes vide signifie que le plan est correct.
+    """
+    if db.session.get_bind().dialect.name != 'sqlite':
+        return []
+    applied = applied_versions()
+    results = []
+    for item in MIGRATIONS:
+        if item.version not in applied:
+            continue
+        for check in item.query_plan_checks:
+            plan = explain_query_plan(check.sql, check.params)
+            problems = [
+                detail for detail in plan
+                if FULL_SCAN_PATTERN.match(detail) or detail.startswith('USE TEMP B-TREE')
+            ]
+            if check.expected_index and not any(check.expected_index in detail for detail in plan):
+                problems.append(f'index {check.expected_index} non utilisé')
+            results.append((item, check, plan, problems))
+    return results
@@ -0,0 +1,114 @@
+import json
+import os
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db
+from src.models.payment import Order
+from src.services.paypal_client import get_paypal_client
+
+# Au-delà de ce délai, le statut d'une commande non finalisée est redemandé à PayPal
+ORDER_STATUS_REFRESH_SECONDS = int(os.getenv('ORDER_STATUS_REFRESH_SECONDS', '15'))
+
+# Statuts PayPal définitifs : inutile de réinterroger PayPal
+FINAL_ORDER_STATUSES = ('COMPLETED', 'VOIDED')
+
+
+class InvalidOrderData(ValueError):
+    """Informations d'achat d'une commande invalides (refusées avant l'appel à PayPal)"""
+
+
+def normalize_order_data(data, pack):
+    """Valider et convertir les informations d'achat avant de créer la commande PayPal
+    
+    Renvoie une copie de `data` avec story_id entier (ou None) et le prix du pack comme montant.
+    """
+    user_email = data.get('user_email')
+    if not isinstance(user_email, str) or not user_email.strip():
+        raise InvalidOrderData('Email utilisateur invalide')
+    
+    story_id = data.get('story_id')
+    if story_id in (None, ''):
+        story_id = None
+    else:
+        try:
+            story_id = int(story_id)
+        except (TypeError, ValueError):
+            raise InvalidOrderData(f'Identifiant d\'histoire invalide: {story_id}')
+    if pack.pack_id == 'single' and story_id is None:
+        raise InvalidOrderData('Champ requis manquant: story_id')
+    
+    return {**data, 'user_email': user_email.strip(), 'story_id': story_id, 'amount': pack.price}
+
+
+def save_order(paypal_order, data, allocation=None):
+    """Enregistrer la commande renvoyée par PayPal avec les informations d'achat (normalisées)"""
+    order = Order(
+        order_id=paypal_order['id'],
+        user_email=data['user_email'],
+        pack_type=data['pack_id'],
+        story_id=data.get('story_id'),
+        allocation=json.dumps(allocation) if allocation else None,
+        amount=data['amount'],
+        status=paypal_order.get('status', 'CREATED')
+    )
+    db.session.add(order)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return Order.query.filter_by(order_id=paypal_order['id']).first()
+    return order
+
+
+def purchase_data_for_order(order_id, client_data=None):
+    """Informations d'achat d'une commande : celles enregistrées à la création priment sur le client
+    
+    Les commandes antérieures à la table orders retombent sur les données envoyées par le client.
+    """
+    order = Order.query.filter_by(order_id=order_id).first()
+    if order is not None:
+        return order.get_purchase_data()
+    return client_data or {}
+
+
+def mark_order_completed(order_id, purchase):
+    """Marquer la commande comme capturée (sans effet pour une commande inconnue)"""
+    db.session.execute(
+        db.update(Order)
+        .where(Order.order_id == order_id)
+        .values(status='COMPLETED', purchase_id=purchase.id,
+                paypal_checked_at=datetime.utcnow(), updated_at=datetime.utcnow())
+    )
+    db.session.commit()
+
+
+def _claim_refresh(order):
+    """Réserver le rafraîchissement : une seule requête interroge PayPal quand le statut est périmé"""
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=ORDER_STATUS_REFRESH_SECONDS)
+    claimed = db.session.execute(
+        db.update(Order)
+        .where(Order.id == order.id, Order.paypal_checked_at < stale_before)
+        .values(paypal_checked_at=now)
+    )
+    db.session.commit()
+    return claimed.rowcount == 1
+
+
+def get_order_status(order_id):
+    """Commande à jour : servie localement tant que son statut est définitif ou récent
+
+    Renvoie None pour une commande absente de la table orders.
+    """
+    order = Order.query.filter_by(order_id=order_id).first()
+    if order is None or order.status in FINAL_ORDER_STATUSES or not _claim_refresh(order):
+        return order
+    
+    response = get_paypal_client().get_order(order_id)
+    db.session.refresh(order)
+    if response.status_code == 200:
+        paypal_status = response.json().get('status')
+        if paypal_status and order.status not in FINAL_ORDER_STATUSES:
+            order.status = paypal_status
+            db.session.commit()
+    return order
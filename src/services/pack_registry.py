@@ -0,0 +1,95 @@
+import threading
+from collections import namedtuple
+from src.models.pack import Pack
+from src.services.catalog_version import get_catalog_version
+
+# Vue figée d'un pack : lisible sans session SQLAlchemy, partagée entre les requêtes
+# (`data` : représentation JSON de l'API, calculée une fois par rechargement)
+PackInfo = namedtuple('PackInfo', [
+    'pack_id', 'name', 'price', 'original_price', 'description', 'stories_count', 'size', 'is_active', 'data'
+])
+
+UNLIMITED_PACK_ID = 'unlimited'
+
+
+class InvalidPurchaseAmount(ValueError):
+    """Le montant ne correspond pas au prix du pack"""
+
+
+def _pack_size(stories_count):
+    """Nombre d'histoires débloquées ('10' -> 10, '∞' -> None : illimité)"""
+    try:
+        return int(stories_count)
+    except (TypeError, ValueError):
+        return None
+
+
+class PackRegistry:
+    """Packs de la table packs, rechargés quand la version du catalogue change
+    
+    Toute modification de pack appelle bump_catalog_version() : chaque worker
+    recharge la table au prochain accès, les lectures suivantes restent en mémoire.
+    """
+    
+    def __init__(self):
+        self._version = None
+        self._packs = {}
+        self._lock = threading.Lock()
+        self.reloads = 0
+    
+    def _current(self):
+        version, _ = get_catalog_version()
+        if version == self._version:
+            return self._packs
+        with self._lock:
+            if version != self._version:
+                self._packs = {
+                    pack.pack_id: PackInfo(
+                        pack_id=pack.pack_id,
+                        name=pack.name,
+                        price=pack.price,
+                        original_price=pack.original_price,
+                        description=pack.description,
+                        stories_count=pack.stories_count,
+                        size=_pack_size(pack.stories_count),
+                        is_active=bool(pack.is_active),
+                        data=pack.to_dict()
+                    )
+                    for pack in Pack.query.all()
+                }
+                self._version = version
+                self.reloads += 1
+            return self._packs
+    
+    def get(self, pack_id, active_only=True):
+        """Pack par identifiant ('single', 'pack10'...), None s'il est inconnu ou désactivé"""
+        pack = self._current().get(pack_id)
+        if pack is None or (active_only and not pack.is_active):
+            return None
+        return pack
+    
+    def all(self, active_only=True):
+        return [pack for pack in self._current().values() if pack.is_active or not active_only]
+    
+    def validate_amount(self, pack_id, amount):
+        """Vérifier qu'un montant correspond au prix du pack ; renvoie le pack"""
+        pack = self.get(pack_id)
+        if pack is None:
+            raise InvalidPurchaseAmount(f'Pack inconnu: {pack_id}')
+        try:
+            amount = round(float(amount), 2)
+        except (TypeError, ValueError):
+            raise InvalidPurchaseAmount(f'Montant invalide: {amount}')
+        if amount != round(pack.price, 2):
+            raise InvalidPurchaseAmount(f'Montant incorrect pour le pack {pack_id}: {pack.price:.2f} attendu')
+        return pack
+    
+    def stats(self):
+        return {
+            'version': self._version,
+            'packs': len(self._packs),
+            'reloads': self.reloads
+        }
+
+
+pack_registry = PackRegistry()
@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+# Configuration PayPal (à remplacer par vos vraies clés)
+PAYPAL_CLIENT_ID = os.getenv('PAYPAL_CLIENT_ID', 'YOUR_PAYPAL_CLIENT_ID')
+PAYPAL_CLIENT_SECRET = os.getenv('PAYPAL_CLIENT_SECRET', 'YOUR_PAYPAL_CLIENT_SECRET')
+PAYPAL_BASE_URL = os.getenv('PAYPAL_BASE_URL', 'https://api-m.sandbox.paypal.com')  # sandbox pour les tests
+PAYPAL_WEBHOOK_ID = os.getenv('PAYPAL_WEBHOOK_ID')  # ID du webhook déclaré dans le tableau de bord PayPal
+
+# Délais réseau explicites (connexion, lecture) en secondes
+PAYPAL_CONNECT_TIMEOUT = float(os.getenv('PAYPAL_CONNECT_TIMEOUT', '3.05'))
+PAYPAL_READ_TIMEOUT = float(os.getenv('PAYPAL_READ_TIMEOUT', '20'))
+PAYPAL_POOL_SIZE = int(os.getenv('PAYPAL_POOL_SIZE', '10'))
+# Renouveler le token un peu avant son expiration réelle
+PAYPAL_TOKEN_REFRESH_MARGIN = 60
+
+
+class PayPalAuthError(Exception):
+    """Le token OAuth PayPal n'a pas pu être obtenu"""
+
+
+class PayPalClient:
+    """Client PayPal : session HTTP keep-alive partagée et token OAuth mis en cache"""
+    
+    def __init__(self, client_id=PAYPAL_CLIENT_ID, client_secret=PAYPAL_CLIENT_SECRET,
+                 base_url=PAYPAL_BASE_URL, timeout=(PAYPAL_CONNECT_TIMEOUT, PAYPAL_READ_TIMEOUT),
+                 pool_size=PAYPAL_POOL_SIZE):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        self._token = None
+        self._token_expires_at = 0
+        self._token_lock = threading.Lock()
+    
+    def get_access_token(self, force_refresh=False):
+        """Token OAuth en cache ; une seule requête de renouvellement à la fois"""
+        if not force_refresh and self._token and time.monotonic() < self._token_expires_at:
+            return self._token
+        
+        with self._token_lock:
+            # Un autre thread a pu renouveler le token pendant l'attente du verrou
+            if not force_refresh and self._token and time.monotonic() < self._token_expires_at:
+                return self._token
+            
+            response = self.session.post(
+                f'{self.base_url}/v1/oauth2/token',
+                headers={
+                    'Accept': 'application/json',
+                    'Accept-Language': 'en_US',
+                },
+                data='grant_type=client_credentials',
+                auth=(self.client_id, self.client_secret),
+                timeout=self.timeout
+            )
+            if response.status_code != 200:
+                self._token = None
+                return None
+            
+            payload = response.json()
+            expires_in = int(payload.get('expires_in', 0))
+            self._token = payload.get('access_token')
+            self._token_expires_at = time.monotonic() + max(expires_in - PAYPAL_TOKEN_REFRESH_MARGIN, 0)
+            return self._token
+    
+    def invalidate_token(self):
+        with self._token_lock:
+            self._token = None
+            self._token_expires_at = 0
+    
+    def request(self, method, path, **kwargs):
+        """Appel authentifié à l'API PayPal ; renouvelle le token une fois si refusé (401)"""
+        access_token = self.get_access_token()
+        if not access_token:
+            raise PayPalAuthError('Impossible d\'obtenir le token PayPal')
+        
+        headers = dict(kwargs.pop('headers', None) or {})
+        kwargs.setdefault('timeout', self.timeout)
+        url = f'{self.base_url}{path}'
+        
+        headers['Authorization'] = f'Bearer {access_token}'
+        response = self.session.request(method, url, headers=headers, **kwargs)
+        if response.status_code == 401:
+            access_token = self.get_access_token(force_refresh=True)
+            if not access_token:
+                raise PayPalAuthError('Impossible d\'obtenir le token PayPal')
+            headers['Authorization'] = f'Bearer {access_token}'
+            response = self.session.request(method, url, headers=headers, **kwargs)
+        return response
+    
+    def create_order(self, payment_data):
+        return self.request('POST', '/v2/checkout/orders', json=payment_data,
+                            headers={'Content-Type': 'application/json'})
+    
+    def capture_order(self, order_id):
+        return self.request('POST', f'/v2/checkout/orders/{order_id}/capture',
+                            headers={'Content-Type': 'application/json'})
+    
+    def get_order(self, order_id):
+        return self.request('GET', f'/v2/checkout/orders/{order_id}')
+    
+    def verify_webhook_signature(self, webhook_id, headers, event):
+        """Faire vérifier par PayPal la signature d'une notification webhook"""
+        payload = {
+            'auth_algo': headers.get('PAYPAL-AUTH-ALGO'),
+            'cert_url': headers.get('PAYPAL-CERT-URL'),
+            'transmission_id': headers.get('PAYPAL-TRANSMISSION-ID'),
+            'transmission_sig': headers.get('PAYPAL-TRANSMISSION-SIG'),
+            'transmission_time': headers.get('PAYPAL-TRANSMISSION-TIME'),
+            'webhook_id': webhook_id,
+            'webhook_event': event
+        }
+        response = self.request('POST', '/v1/notifications/verify-webhook-signature', json=payload,
+                                headers={'Content-Type': 'application/json'})
+        return response.status_code == 200 and response.json().get('verification_status') == 'SUCCESS'
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_paypal_client():
+    """Client PayPal du worker courant (recréé après un fork gunicorn)"""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = PayPalClient()
+                _client_pid = pid
+    return _client
@@ -0,0 +1,210 @@
+from datetime import datetime, time
+from sqlalchemy.dialects import postgresql, sqlite
+from src.models.story import db, Story, Purchase, PurchaseStory
+from src.models.credits import CreditLedgerEntry
+from src.models.sales import SalesDaily, StorySalesDaily, BuyerDay
+
+ROLLUP_MODELS = (SalesDaily, StorySalesDaily, BuyerDay)
+TOP_STORIES_LIMIT = 10
+# Clé de session.info : la transaction en cours modifie les rollups (caches à vider au commit)
+SALES_CHANGED = 'sales_changed'
+
+
+def _insert(model):
+    """INSERT ... ON CONFLICT du dialecte courant (SQLite ou PostgreSQL)"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+def _increment(model, keys, counters, rows):
+    """Ajouter des compteurs aux lignes de rollup (créées au besoin), en une requête"""
+    statement = _insert(model)
+    columns = model.__table__.c
+    statement = statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={counter: columns[counter] + statement.excluded[counter] for counter in counters}
+    )
+    db.session.execute(statement, rows)
+
+
+def mark_sales_changed():
+    """Signaler que la transaction en cours modifie les rollups"""
+    db.session.info[SALES_CHANGED] = True
+
+
+def record_sale(purchase, story_ids=None):
+    """Ajouter un achat (déjà flush) aux rollups de son jour, dans la même transaction
+    
+    Comme rebuild_rollups, un achat inactif n'est pas compté. Désactiver un achat déjà
+    compté ne le retire pas : lancer ensuite 'flask rebuild-sales-rollups --since <jour de l'achat>'.
+    """
+    if purchase.is_active is False:
+        return
+    mark_sales_changed()
+    day = purchase.purchase_date.date()
+    _increment(SalesDaily, ('day', 'pack_type'), ('sales', 'revenue'), [
+        {'day': day, 'pack_type': purchase.pack_type, 'sales': 1, 'revenue': purchase.amount_paid}
+    ])
+    db.session.execute(
+        _insert(BuyerDay).on_conflict_do_nothing(),
+        [{'day': day, 'user_email': purchase.user_email}]
+    )
+    
+    if story_ids is None:
+        story_ids = PurchaseStory.decode_story_ids(purchase.story_ids)
+    if story_ids:
+        # Le montant de l'achat est réparti entre les histoires qu'il débloque
+        share = purchase.amount_paid / len(story_ids)
+        _increment(StorySalesDaily, ('day', 'story_id'), ('unlocks', 'revenue'), [
+            {'day': day, 'story_id': story_id, 'unlocks': 1, 'revenue': share}
+            for story_id in story_ids
+        ])
+
+
+def record_credit_unlock(purchase_id, story_id, unlocked_at=None):
+    """Ajouter aux rollups une histoire débloquée contre un crédit du pack `purchase_id`"""
+    mark_sales_changed()
+    amount_paid, credits = db.session.execute(
+        db.select(Purchase.amount_paid, db.func.sum(CreditLedgerEntry.delta))
+        .join(CreditLedgerEntry, CreditLedgerEntry.purchase_id == Purchase.id)
+        .where(Purchase.id == purchase_id, CreditLedgerEntry.reason == 'grant')
+        .group_by(Purchase.id, Purchase.amount_paid)
+    ).one()
+    _increment(StorySalesDaily, ('day', 'story_id'), ('unlocks', 'revenue'), [
+        {'day': (unlocked_at or datetime.utcnow()).date(), 'story_id': story_id, 'unlocks': 1,
+         'revenue': amount_paid / credits if credits else 0}
+    ])
+
+
+def rebuild_rollups(since=None):
+    """Recalculer les rollups depuis les achats (tous, ou à partir du jour `since`)
+    
+    Sert au remplissage initial et à la réparation ; les jours antérieurs à `since`
+    ne sont pas touchés. Le commit revient à l'appelant. Renvoie le nombre de lignes
+    de ventes par jour et par pack recalculées.
+    """
+    mark_sales_changed()
+    start = datetime.combine(since, time.min) if since else None
+    for model in ROLLUP_MODELS:
+        query = db.delete(model)
+        if since:
+            query = query.where(model.day >= since)
+        db.session.execute(query)
+    
+    active = [Purchase.is_active.is_(True)]
+    if start:
+        active.append(Purchase.purchase_date >= start)
+    day = db.func.date(Purchase.purchase_date)
+    
+    db.session.execute(db.insert(SalesDaily).from_select(
+        ['day', 'pack_type', 'sales', 'revenue'],
+        db.select(day, Purchase.pack_type, db.func.count(Purchase.id), db.func.sum(Purchase.amount_paid))
+        .where(*active).group_by(day, Purchase.pack_type)
+    ))
+    db.session.execute(db.insert(BuyerDay).from_select(
+        ['day', 'user_email'],
+        db.select(day, Purchase.user_email).where(*active).distinct()
+    ))
+    
+    # Crédits accordés par achat : leurs histoires comptent au jour de chaque déblocage
+    grants = (
+        db.select(CreditLedgerEntry.purchase_id, db.func.sum(CreditLedgerEntry.delta).label('credits'))
+        .where(CreditLedgerEntry.reason == 'grant')
+        .group_by(CreditLedgerEntry.purchase_id)
+        .subquery()
+    )
+    story_counts = (
+        db.select(PurchaseStory.purchase_id, db.func.count(PurchaseStory.id).label('stories'))
+        .group_by(PurchaseStory.purchase_id)
+        .subquery()
+    )
+    allocated = (
+        db.select(day.label('day'), PurchaseStory.story_id,
+                  (Purchase.amount_paid / story_counts.c.stories).label('share'))
+        .select_from(PurchaseStory)
+        .join(Purchase, Purchase.id == PurchaseStory.purchase_id)
+        .join(story_counts, story_counts.c.purchase_id == Purchase.id)
+        .where(*active, ~db.exists().where(grants.c.purchase_id == Purchase.id))
+    )
+    spend_day = db.func.date(CreditLedgerEntry.created_at)
+    spent = (
+        db.select(spend_day.label('day'), CreditLedgerEntry.story_id,
+                  (Purchase.amount_paid / grants.c.credits).label('share'))
+        .select_from(CreditLedgerEntry)
+        .join(Purchase, Purchase.id == CreditLedgerEntry.purchase_id)
+        .join(grants, grants.c.purchase_id == Purchase.id)
+        .where(CreditLedgerEntry.reason == 'spend', Purchase.is_active.is_(True))
+    )
+    if start:
+        spent = spent.where(CreditLedgerEntry.created_at >= start)
+    unlocks = db.union_all(allocated, spent).subquery()
+    db.session.execute(db.insert(StorySalesDaily).from_select(
+        ['day', 'story_id', 'unlocks', 'revenue'],
+        db.select(unlocks.c.day, unlocks.c.story_id, db.func.count(), db.func.sum(unlocks.c.share))
+        .group_by(unlocks.c.day, unlocks.c.story_id)
+    ))
+    
+    rebuilt = db.select(db.func.count()).select_from(SalesDaily)
+    if since:
+        rebuilt = rebuilt.where(SalesDaily.day >= since)
+    return db.session.scalar(rebuilt)
+
+
+def daily_sales(since, until):
+    """Lignes de ventes par jour et par pack entre deux jours inclus (exports)"""
+    return db.session.scalars(
+        db.select(SalesDaily)
+        .where(SalesDaily.day >= since, SalesDaily.day <= until)
+        .order_by(SalesDaily.day, SalesDaily.pack_type)
+    ).all()
+
+
+def sales_report(since, until, top_stories=TOP_STORIES_LIMIT):
+    """Rapport de ventes entre deux jours inclus, lu dans les rollups
+    
+    Le coût dépend du nombre de jours (et d'histoires vendues), pas du nombre
+    d'achats ; seuls les acheteurs uniques parcourent une ligne par acheteur et par jour.
+    """
+    per_day, per_pack = {}, {}
+    for row in daily_sales(since, until):
+        for totals, key in ((per_day, row.day.isoformat()), (per_pack, row.pack_type)):
+            previous_sales, previous_revenue = totals.get(key, (0, 0))
+            totals[key] = (previous_sales + row.sales, previous_revenue + row.revenue)
+    
+    buyers = db.session.scalar(
+        db.select(db.func.count(db.distinct(BuyerDay.user_email)))
+        .where(BuyerDay.day >= since, BuyerDay.day <= until)
+    )
+    
+    story_revenue = db.func.sum(StorySalesDaily.revenue)
+    stories = db.session.execute(
+        db.select(StorySalesDaily.story_id, db.func.sum(StorySalesDaily.unlocks), story_revenue)
+        .where(StorySalesDaily.day >= since, StorySalesDaily.day <= until)
+        .group_by(StorySalesDaily.story_id)
+        .order_by(story_revenue.desc())
+        .limit(top_stories)
+    ).all()
+    titles = dict(db.session.execute(
+        db.select(Story.id, Story.title).where(Story.id.in_([row[0] for row in stories]))
+    ).all()) if stories else {}
+    
+    return {
+        'since': since.isoformat(),
+        'until': until.isoformat(),
+        'sales': sum(sales for sales, _ in per_pack.values()),
+        'revenue': round(sum(revenue for _, revenue in per_pack.values()), 2),
+        'unique_buyers': buyers,
+        'revenue_per_day': [
+            {'date': date, 'sales': sales, 'revenue': round(revenue, 2)}
+            for date, (sales, revenue) in sorted(per_day.items())
+        ],
+        'revenue_per_pack': [
+            {'pack_type': pack_type, 'sales': sales, 'revenue': round(revenue, 2)}
+            for pack_type, (sales, revenue) in sorted(per_pack.items(), key=lambda item: -item[1][1])
+        ],
+        'top_stories': [
+            {'story_id': story_id, 'title': titles.get(story_id), 'unlocks': unlocks, 'revenue': round(revenue, 2)}
+            for story_id, unlocks, revenue in stories
+        ]
+    }
@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.story import db, Purchase
+from src.services.background import submit_in_app_context
+from src.services.sales_rollups import SALES_CHANGED, sales_report
+
+# Durée de vie (par worker) des statistiques de ventes du tableau de bord
+SALES_STATS_TTL = float(os.getenv('SALES_STATS_TTL', '60'))
+# Périodes proposées sur le tableau de bord (en jours)
+SALES_STATS_PERIODS = (7, 30, 90, 365)
+DEFAULT_SALES_STATS_DAYS = 30
+
+# Taille des pages des tables d'histoires et d'achats de l'admin
+ADMIN_PAGE_SIZE = int(os.getenv('ADMIN_PAGE_SIZE', '50'))
+
+# Page d'achats (du plus récent au plus ancien) et curseur vers la suivante
+PurchasePage = namedtuple('PurchasePage', ['purchases', 'next_cursor'])
+
+
+def parse_period(raw_days):
+    """Période demandée (?days=) ramenée à l'une des périodes proposées"""
+    try:
+        days = int(raw_days)
+    except (TypeError, ValueError):
+        return DEFAULT_SALES_STATS_DAYS
+    return days if days in SALES_STATS_PERIODS else DEFAULT_SALES_STATS_DAYS
+
+
+class SalesReportError(ValueError):
+    """Période de rapport invalide"""
+
+
+def parse_report_range(args, now=None):
+    """Période ?from=AAAA-MM-JJ&to=AAAA-MM-JJ (par défaut : les 30 derniers jours)"""
+    today = (now or datetime.utcnow()).date()
+    try:
+        until = date.fromisoformat(args['to']) if args.get('to') else today
+        since = (date.fromisoformat(args['from']) if args.get('from')
+                 else until - timedelta(days=DEFAULT_SALES_STATS_DAYS - 1))
+    except ValueError:
+        raise SalesReportError('Date invalide (format attendu : AAAA-MM-JJ)')
+    if since > until:
+        raise SalesReportError('La date de début doit précéder la date de fin')
+    return since, until
+
+
+def compute_sales_stats(days, now=None):
+    """Statistiques de ventes des `days` derniers jours (aujourd'hui inclus), lues dans les rollups"""
+    now = now or datetime.utcnow()
+    today = now.date()
+    return {
+        'days': days,
+        'computed_at': now.isoformat(),
+        **sales_report(today - timedelta(days=days - 1), today)
+    }
+
+
+class SalesStatsCache:
+    """Cache (avec TTL) des statistiques de ventes, une entrée par période
+    
+    Une entrée expirée est encore servie pendant son recalcul en arrière-plan : seul le
+    tout premier affichage d'une période attend les agrégats. Une vente validée dans ce
+    worker vide le cache ; celles des autres workers apparaissent au plus après `ttl`.
+    """
+    
+    def __init__(self, ttl=SALES_STATS_TTL, loader=compute_sales_stats):
+        self.ttl = ttl
+        self.loader = loader
+        self._entries = {}
+        self._refreshing = set()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+    
+    def get(self, days):
+        """Statistiques de la période, recalculées si absentes ou expirées"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(days)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self.stale_hits += 1
+                if days not in self._refreshing:
+                    self._refreshing.add(days)
+                    submit_in_app_context(self.refresh, days, pool='reports')
+                return entry[1]
+            self.misses += 1
+        
+        return self.refresh(days)
+    
+    def refresh(self, days):
+        """Recalculer les statistiques d'une période et les mettre en cache"""
+        with self._lock:
+            generation = self._generation
+        try:
+            stats = self.loader(days)
+            with self._lock:
+                # Un calcul commencé avant un clear() ne remet pas d'anciens chiffres en cache
+                if generation == self._generation:
+                    self._entries[days] = (time.monotonic() + self.ttl, stats)
+            return stats
+        finally:
+            with self._lock:
+                self._refreshing.discard(days)
+    
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses
+            }
+
+
+sales_stats_cache = SalesStatsCache()
+
+
+@event.listens_for(Session, 'after_commit')
+def clear_sales_stats_after_sale(session):
+    """Vider le cache de ce worker dès qu'une transaction modifiant les rollups est validée"""
+    if session.info.pop(SALES_CHANGED, False):
+        sales_stats_cache.clear()
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_rolled_back_sale(session):
+    session.info.pop(SALES_CHANGED, None)
+
+
+def encode_purchase_cursor(purchase):
+    return f'{purchase.purchase_date.isoformat()}_{purchase.id}'
+
+
+def decode_purchase_cursor(cursor):
+    """Position (date, id) du dernier achat affiché ; None si le curseur est invalide"""
+    try:
+        raw_date, raw_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(raw_date), int(raw_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def list_purchases(cursor=None, limit=ADMIN_PAGE_SIZE):
+    """Page d'achats du plus récent au plus ancien, paginée par keyset (date, id)"""
+    query = db.select(Purchase).where(Purchase.purchase_date.isnot(None))
+    position = decode_purchase_cursor(cursor) if cursor else None
+    if position:
+        last_date, last_id = position
+        query = query.where(db.or_(
+            Purchase.purchase_date < last_date,
+            db.and_(Purchase.purchase_date == last_date, Purchase.id < last_id)
+        ))
+    query = query.order_by(Purchase.purchase_date.desc(), Purchase.id.desc())
+    
+    # Une ligne de plus pour savoir s'il reste une page
+    purchases = db.session.scalars(query.limit(limit + 1)).all()
+    has_more = len(purchases) > limit
+    purchases = purchases[:limit]
+    return PurchasePage(purchases, encode_purchase_cursor(purchases[-1]) if has_more else None)
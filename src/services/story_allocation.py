@@ -0,0 +1,96 @@
+import os
+from src.models.story import db, Story, PurchaseStory
+
+# Stratégie utilisée quand l'acheteur n'en précise pas
+DEFAULT_ALLOCATION_STRATEGY = os.getenv('STORY_ALLOCATION_STRATEGY', 'newest')
+MAX_CHOSEN_STORY_IDS = 500
+
+ALLOCATION_STRATEGIES = {}
+
+
+class AllocationError(ValueError):
+    """Paramètres d'attribution invalides (stratégie inconnue, histoires choisies mal formées)"""
+
+
+def allocation_strategy(name):
+    """Enregistrer une stratégie : elle renvoie les critères ORDER BY de la sélection
+    
+    Les histoires déjà possédées sont exclues avant le tri ; seuls les identifiants
+    sont lus, la requête reste légère quelle que soit la taille du pack.
+    """
+    def register(function):
+        ALLOCATION_STRATEGIES[name] = function
+        return function
+    return register
+
+
+@allocation_strategy('newest')
+def newest_first(options):
+    """Les histoires les plus récentes d'abord"""
+    return [Story.created_at.desc(), Story.id.desc()]
+
+
+@allocation_strategy('category')
+def category_first(options):
+    """Les histoires de la catégorie demandée d'abord, complétées par les plus récentes"""
+    category = options.get('category')
+    if not category:
+        raise AllocationError('Catégorie manquante pour la stratégie category')
+    return [(Story.category == category).desc()] + newest_first(options)
+
+
+@allocation_strategy('chosen')
+def chosen_first(options):
+    """Les histoires choisies par l'acheteur d'abord, complétées par les plus récentes"""
+    story_ids = options.get('story_ids') or []
+    return [Story.id.in_(story_ids).desc()] + newest_first(options)
+
+
+def parse_allocation(allocation):
+    """Valider les paramètres d'attribution reçus d'un client (dict ou None)"""
+    if not allocation:
+        return {}
+    if not isinstance(allocation, dict):
+        raise AllocationError('Paramètres d\'attribution invalides')
+    
+    strategy = allocation.get('strategy', DEFAULT_ALLOCATION_STRATEGY)
+    if strategy not in ALLOCATION_STRATEGIES:
+        raise AllocationError(f'Stratégie d\'attribution inconnue: {strategy}')
+    
+    options = {'strategy': strategy}
+    if allocation.get('category'):
+        options['category'] = str(allocation['category'])
+    if allocation.get('story_ids'):
+        story_ids = allocation['story_ids']
+        if not isinstance(story_ids, list) or len(story_ids) > MAX_CHOSEN_STORY_IDS:
+            raise AllocationError('story_ids doit être une liste d\'identifiants')
+        try:
+            options['story_ids'] = [int(story_id) for story_id in story_ids]
+        except (TypeError, ValueError):
+            raise AllocationError('story_ids doit être une liste d\'identifiants')
+    
+    # Vérifier les options propres à la stratégie
+    ALLOCATION_STRATEGIES[strategy](options)
+    return options
+
+
+def allocate_story_ids(user_email, count, allocation=None):
+    """Sélectionner `count` histoires que l'utilisateur ne possède pas encore
+    
+    Renvoie une liste d'identifiants (éventuellement plus courte si le catalogue
+    ne contient plus assez d'histoires non possédées).
+    """
+    options = allocation or {}
+    strategy = ALLOCATION_STRATEGIES[options.get('strategy', DEFAULT_ALLOCATION_STRATEGY)]
+    
+    already_owned = (
+        db.select(PurchaseStory.id)
+        .where(PurchaseStory.user_email == user_email, PurchaseStory.story_id == Story.id)
+        .exists()
+    )
+    return db.session.scalars(
+        db.select(Story.id)
+        .where(~already_owned)
+        .order_by(*strategy(options))
+        .limit(count)
+    ).all()
@@ -0,0 +1,200 @@
+import fcntl
+import glob
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from werkzeug.utils import secure_filename
+from src.models.user import db
+from src.models.upload import UploadSession
+from src.services.audio_store import AUDIO_TMP_FOLDER, COPY_BUFFER_SIZE, file_sha256, store_audio_file
+
+UPLOAD_MAX_SIZE = int(os.getenv('UPLOAD_MAX_SIZE', str(2 * 1024 * 1024 * 1024)))
+UPLOAD_MAX_CHUNK_SIZE = int(os.getenv('UPLOAD_MAX_CHUNK_SIZE', str(16 * 1024 * 1024)))
+ALLOWED_EXTENSIONS = {'mp3', 'wav', 'ogg', 'm4a'}
+# Une session sans nouveau morceau depuis ce délai est abandonnée (supprimée avec son fichier partiel)
+UPLOAD_SESSION_TTL = int(os.getenv('UPLOAD_SESSION_TTL', '86400'))
+
+
+class UploadError(Exception):
+    """Erreur d'upload renvoyée au client avec un code HTTP"""
+    
+    def __init__(self, message, status_code=400, upload=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.upload = upload
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def _partial_path(upload_id):
+    return os.path.join(AUDIO_TMP_FOLDER, f'{upload_id}.part')
+
+
+def _chunk_path(upload_id):
+    # Un fichier par requête : le corps est reçu hors verrou
+    return os.path.join(AUDIO_TMP_FOLDER, f'{upload_id}.{uuid.uuid4().hex}.chunk')
+
+
+@contextmanager
+def _locked_partial(upload_id):
+    """Fichier partiel ouvert sous verrou exclusif, partagé entre les workers"""
+    with open(_partial_path(upload_id), 'r+b') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield f
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _reset_upload(upload, f):
+    """Vider le fichier partiel (verrouillé) et repartir de zéro"""
+    f.truncate(0)
+    upload.received_bytes = 0
+    upload.status = 'uploading'
+    db.session.commit()
+
+
+def get_upload(upload_id):
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None:
+        raise UploadError('Upload non trouvé', 404)
+    return upload
+
+
+def init_upload(filename, total_size, expected_sha256=None):
+    """Ouvrir une session d'upload et réserver le fichier partiel"""
+    if not filename or not allowed_file(filename):
+        raise UploadError('Type de fichier non autorisé')
+    try:
+        total_size = int(total_size)
+    except (TypeError, ValueError):
+        raise UploadError('Taille de fichier invalide')
+    if total_size <= 0 or total_size > UPLOAD_MAX_SIZE:
+        raise UploadError('Taille de fichier invalide')
+    
+    os.makedirs(AUDIO_TMP_FOLDER, exist_ok=True)
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        filename=secure_filename(filename),
+        total_size=total_size,
+        expected_sha256=expected_sha256.lower() if expected_sha256 else None
+    )
+    open(_partial_path(upload.id), 'wb').close()
+    db.session.add(upload)
+    db.session.commit()
+    return upload
+
+
+def write_chunk(upload_id, offset, stream, length):
+    """Écrire un morceau à l'offset attendu : reçu en flux à part, puis recopié sous verrou"""
+    upload = get_upload(upload_id)
+    if upload.status != 'uploading':
+        raise UploadError('Upload déjà terminé', 409, upload)
+    if offset != upload.received_bytes:
+        # Le client reprend à partir de received_bytes
+        raise UploadError('Offset inattendu', 409, upload)
+    if length is None or length <= 0 or length > UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError('Taille de morceau invalide')
+    if offset + length > upload.total_size:
+        raise UploadError('Le morceau dépasse la taille annoncée')
+    
+    # Le morceau est d'abord reçu à part : une requête lente ou coupée ne touche pas au fichier partiel
+    chunk_path = _chunk_path(upload.id)
+    try:
+        written = 0
+        with open(chunk_path, 'wb') as chunk:
+            while written < length:
+                buffer = stream.read(min(COPY_BUFFER_SIZE, length - written))
+                if not buffer:
+                    break
+                chunk.write(buffer)
+                written += len(buffer)
+        if written != length:
+            # Un morceau tronqué (connexion coupée) n'est pas comptabilisé
+            raise UploadError('Morceau incomplet, reprendre à l\'offset courant', 409, upload)
+        
+        # Une seule requête à la fois écrit et compte un morceau : le perdant ne tronque jamais
+        # des octets déjà comptés par le gagnant
+        with _locked_partial(upload.id) as f:
+            db.session.refresh(upload)
+            if upload.status != 'uploading' or upload.received_bytes != offset:
+                raise UploadError('Offset inattendu', 409, upload)
+            
+            f.seek(offset)
+            with open(chunk_path, 'rb') as chunk:
+                shutil.copyfileobj(chunk, f, COPY_BUFFER_SIZE)
+            f.truncate(offset + length)
+            f.flush()
+            
+            received_bytes = offset + length
+            advanced = db.session.execute(
+                db.update(UploadSession)
+                .where(UploadSession.id == upload.id, UploadSession.status == 'uploading',
+                       UploadSession.received_bytes == offset)
+                .values(received_bytes=received_bytes, updated_at=datetime.utcnow(),
+                        status='complete' if received_bytes == upload.total_size else 'uploading')
+            )
+            db.session.commit()
+            db.session.refresh(upload)
+    finally:
+        if os.path.exists(chunk_path):
+            os.remove(chunk_path)
+    
+    if advanced.rowcount != 1:
+        raise UploadError('Offset inattendu', 409, upload)
+    return upload
+
+
+def finalize_upload(upload_id):
+    """Vérifier la somme de contrôle et ranger le fichier dans le stockage audio"""
+    upload = get_upload(upload_id)
+    if upload.status == 'finalized':
+        return upload
+    if upload.status != 'complete':
+        raise UploadError('Upload incomplet', 409, upload)
+    
+    partial_path = _partial_path(upload.id)
+    with _locked_partial(upload.id) as f:
+        if os.path.getsize(partial_path) != upload.total_size:
+            # Fichier partiel incohérent avec les octets comptés : on repart de zéro
+            _reset_upload(upload, f)
+            raise UploadError('Taille du fichier reçu invalide', 422, upload)
+        sha256 = file_sha256(partial_path)
+        if upload.expected_sha256 and sha256 != upload.expected_sha256:
+            # Fichier corrompu : on repart de zéro
+            _reset_upload(upload, f)
+            raise UploadError('Somme de contrôle SHA-256 invalide', 422, upload)
+    
+    blob = store_audio_file(partial_path, upload.filename, sha256)
+    upload.audio_file_path = blob.audio_file_path
+    upload.status = 'finalized'
+    db.session.commit()
+    return upload
+
+
+def collect_expired_uploads(max_age=UPLOAD_SESSION_TTL):
+    """Supprimer les sessions d'upload abandonnées et leurs fichiers partiels"""
+    expired = UploadSession.query.filter(
+        UploadSession.status != 'finalized',
+        UploadSession.updated_at < datetime.utcnow() - timedelta(seconds=max_age)
+    ).all()
+    
+    for upload in expired:
+        partial_path = _partial_path(upload.id)
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        db.session.delete(upload)
+    
+    db.session.commit()
+    
+    # Morceaux laissés par une requête interrompue (arrêt du worker)
+    cutoff = time.time() - max_age
+    for chunk_path in glob.glob(os.path.join(AUDIO_TMP_FOLDER, '*.chunk')):
+        if os.path.getmtime(chunk_path) < cutoff:
+            os.remove(chunk_path)
+    return len(expired)
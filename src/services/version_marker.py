@@ -0,0 +1,50 @@
+import os
+import threading
+import time
+
+
+class VersionMarker:
+    """Fichier de version partagé entre les workers gunicorn (mtime + contenu)
+    
+    Un worker qui modifie les données appelle bump() ; les autres le voient au prochain
+    current(), sans requête SQL (un stat() du fichier, relu seulement s'il a changé).
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._cached_stat = None
+        self._cached_version = None
+    
+    def bump(self):
+        """Écrire une nouvelle version (remplacement atomique du fichier)"""
+        version = f'{time.time_ns():x}-{os.getpid():x}'
+        tmp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, self.path)
+        with self._lock:
+            self._cached_stat = None
+            self._cached_version = None
+        return version
+    
+    def current(self):
+        """(version, mtime en nanosecondes) ; le fichier est créé s'il n'existe pas"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self.bump()
+            stat = os.stat(self.path)
+        
+        stat_key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        with self._lock:
+            if self._cached_stat == stat_key:
+                return self._cached_version
+        
+        with open(self.path) as f:
+            token = f.read().strip()
+        
+        with self._lock:
+            self._cached_stat = stat_key
+            self._cached_version = (token, stat.st_mtime_ns)
+        return self._cached_version
@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Fichiers écrits par l'application (marqueurs de version, uploads) : hors du dépôt
+TEST_DATA_DIR = tempfile.mkdtemp(prefix='stories-tests-')
+os.environ.setdefault('CATALOG_VERSION_FILE', os.path.join(TEST_DATA_DIR, 'catalog.version'))
+os.environ.setdefault('ENTITLEMENTS_VERSION_FILE', os.path.join(TEST_DATA_DIR, 'entitlements.version'))
+os.environ.setdefault('UPLOAD_TMP_FOLDER', os.path.join(TEST_DATA_DIR, 'uploads_tmp'))
+
+from src.main import create_app
+from src.models.user import db
+from src.services.migrations import run_migrations
+
+
+@pytest.fixture
+def app():
+    """Application du profil 'testing' sur une base SQLite en mémoire, migrée"""
+    app = create_app('testing')
+    with app.app_context():
+        run_migrations()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
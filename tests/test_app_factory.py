@@ -0,0 +1,95 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from src.main import configure_templates, create_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Limite volontairement large : détecte un retour du travail lourd au démarrage, pas une variation
+STARTUP_BUDGET_SECONDS = 2.0
+
+
+def run_child(script, **env):
+    """Exécuter un script dans un processus neuf (la configuration est lue à l'import)"""
+    result = subprocess.run(
+        [sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, timeout=60,
+        env={**os.environ, **env}
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def snapshot(directory):
+    """Fichiers d'un dossier avec leur taille et leur date de modification"""
+    files = {}
+    for folder, _, names in os.walk(directory):
+        if '__pycache__' in folder:
+            continue
+        for name in names:
+            path = os.path.join(folder, name)
+            status = os.stat(path)
+            files[path] = (status.st_size, status.st_mtime_ns)
+    return files
+
+
+def test_startup_and_first_request_are_fast():
+    started = time.perf_counter()
+    app = create_app('testing')
+    response = app.test_client().get('/')
+    elapsed = time.perf_counter() - started
+    assert response.status_code == 200
+    assert elapsed < STARTUP_BUDGET_SECONDS
+
+
+def test_import_and_create_app_do_not_write():
+    source = os.path.join(ROOT, 'src')
+    before = snapshot(source)
+    run_child(
+        "import json\n"
+        "from src.main import create_app\n"
+        "create_app('testing')\n"
+        "print(json.dumps(True))\n",
+        PYTHONDONTWRITEBYTECODE='1'
+    )
+    assert snapshot(source) == before
+
+
+def test_admin_disabled_skips_blueprint():
+    script = (
+        "import json, sys\n"
+        "from src.main import create_app\n"
+        "app = create_app('testing')\n"
+        "print(json.dumps({'blueprints': sorted(app.blueprints),\n"
+        "                  'admin_imported': 'src.routes.admin' in sys.modules}))\n"
+    )
+    disabled = run_child(script, ADMIN_ENABLED='false')
+    assert 'admin' not in disabled['blueprints']
+    assert not disabled['admin_imported']
+    enabled = run_child(script, ADMIN_ENABLED='true')
+    assert 'admin' in enabled['blueprints']
+
+
+def test_testing_profile(app):
+    assert app.config['TESTING'] is True
+    assert app.config['SQLALCHEMY_DATABASE_URI'] == 'sqlite://'
+    assert app.config['TEMPLATE_BYTECODE_CACHE_DIR'] is None
+    assert app.config['CHECK_PENDING_MIGRATIONS'] is False
+
+
+def test_template_cache_dir_is_optional(tmp_path):
+    app = create_app('testing')
+    app.config['TEMPLATE_BYTECODE_CACHE_DIR'] = str(tmp_path / 'cache')
+    configure_templates(app)
+    assert app.jinja_options['bytecode_cache'].directory == str(tmp_path / 'cache')
+
+    # Emplacement impossible à créer (déploiement en lecture seule) : démarrage sans cache de bytecode
+    (tmp_path / 'read-only').write_text('')
+    app = create_app('testing')
+    app.config['TEMPLATE_BYTECODE_CACHE_DIR'] = str(tmp_path / 'read-only' / 'cache')
+    configure_templates(app)
+    assert 'bytecode_cache' not in app.jinja_options
+    with app.test_request_context('/admin/login'):
+        assert app.jinja_env.get_template('admin/login.html')
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from src.models.story import Story
+from src.models.user import db
+from src.services.audio_delivery import AUDIO_FOLDER
+from src.services.audio_paths import story_audio_paths
+from src.services.catalog_version import bump_catalog_version
+
+
+def add_story(audio_file_path):
+    story = Story(title='Histoire', description='Test', duration='5:00', category='Coran', price=2.99,
+                  audio_file_path=audio_file_path)
+    db.session.add(story)
+    db.session.commit()
+    return story
+
+
+@pytest.fixture
+def probe_file():
+    """Fichier réellement présent dans le dossier audio public"""
+    created_folder = not os.path.isdir(AUDIO_FOLDER)
+    os.makedirs(AUDIO_FOLDER, exist_ok=True)
+    path = os.path.join(AUDIO_FOLDER, 'probe-test.mp3')
+    with open(path, 'wb') as f:
+        f.write(b'ID3 probe')
+    yield 'probe-test.mp3'
+    os.remove(path)
+    if created_folder:
+        os.rmdir(AUDIO_FOLDER)
+
+
+def test_direct_audio_links_require_a_signature(client, probe_file):
+    assert client.get(f'/static/audio/{probe_file}').status_code == 403
+    assert client.get(f'/static/./audio/{probe_file}').status_code == 403
+    assert b'probe' not in client.get(f'/static//audio/{probe_file}').data
+    assert client.get('/api/stories/1/audio').status_code == 403
+
+
+def test_catch_all_route_does_not_serve_audio(client, probe_file):
+    response = client.get(f'/audio/{probe_file}')
+    assert response.status_code == 403
+    assert b'probe' not in response.data
+    assert client.get('/favicon.ico').status_code == 200
+
+
+def test_catalog_does_not_expose_audio_paths(client):
+    story = add_story('/static/audio/secret.mp3')
+    stories = client.get('/api/stories').get_json()['stories']
+    assert stories == [{**stories[0], 'id': story.id, 'has_audio': True}]
+    assert 'audio_file_path' not in stories[0]
+    assert 'audio_file_path' not in client.get(f'/api/stories/{story.id}').get_json()['story']
+    assert client.get('/api/stories?fields=title,audio_file_path').status_code == 400
+
+
+def test_audio_path_is_cached_until_the_catalog_changes(app):
+    story = add_story('/static/audio/a.mp3')
+    bump_catalog_version()
+    misses = story_audio_paths.stats()['misses']
+
+    assert story_audio_paths.get(story.id) == '/static/audio/a.mp3'
+    assert story_audio_paths.get(story.id, 'mobile') == '/static/audio/a.mp3'
+    assert story_audio_paths.stats()['misses'] == misses + 1
+
+    story.audio_file_path = '/static/audio/b.mp3'
+    db.session.commit()
+    bump_catalog_version()
+    assert story_audio_paths.get(story.id) == '/static/audio/b.mp3'
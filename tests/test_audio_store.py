@@ -0,0 +1,48 @@
+import io
+import os
+
+import pytest
+
+from src.models.audio import AudioBlob
+from src.models.story import Story
+from src.models.user import db
+from src.services import audio_delivery, audio_store
+
+
+@pytest.fixture
+def audio_folder(monkeypatch, tmp_path):
+    monkeypatch.setattr(audio_store, 'AUDIO_FOLDER', str(tmp_path))
+    monkeypatch.setattr(audio_delivery, 'AUDIO_FOLDER', str(tmp_path))
+    return tmp_path
+
+
+def _story(**fields):
+    story = Story(title='Histoire', description='Test', duration='5:00', category='Coran', price=2.99, **fields)
+    db.session.add(story)
+    return story
+
+
+def test_gc_removes_only_unreferenced_blobs(app, audio_folder):
+    kept = audio_store.store_audio_stream(io.BytesIO(b'kept'), 'kept.mp3')
+    dropped = audio_store.store_audio_stream(io.BytesIO(b'dropped'), 'dropped.mp3')
+    audio_store.attach_audio(_story(), kept.audio_file_path)
+    db.session.commit()
+    kept_sha, dropped_sha = kept.sha256, dropped.sha256
+
+    assert audio_store.collect_audio_garbage(grace_seconds=-1) == 1
+    assert db.session.get(AudioBlob, dropped_sha) is None
+    assert not os.path.exists(audio_folder / f'{dropped_sha}.mp3')
+    assert db.session.get(AudioBlob, kept_sha).ref_count == 1
+    assert os.path.exists(audio_folder / f'{kept_sha}.mp3')
+
+
+def test_attach_fails_when_blob_was_collected(app, audio_folder):
+    blob = audio_store.store_audio_stream(io.BytesIO(b'late'), 'late.mp3')
+    audio_file_path = blob.audio_file_path
+    assert audio_store.collect_audio_garbage(grace_seconds=-1) == 1
+
+    story = _story()
+    with pytest.raises(audio_store.AudioStoreError):
+        audio_store.attach_audio(story, audio_file_path)
+    assert story.audio_file_path is None
+    db.session.rollback()
@@ -0,0 +1,71 @@
+import json
+from datetime import datetime, timedelta
+
+from src.models.payment import CaptureJob
+from src.models.user import db
+from src.services import checkout
+
+
+class FakeResponse:
+    def __init__(self, status_code, text=''):
+        self.status_code = status_code
+        self.text = text
+
+
+class FailingPayPalClient:
+    def __init__(self):
+        self.calls = 0
+
+    def capture_order(self, order_id):
+        self.calls += 1
+        return FakeResponse(503, 'Service Unavailable')
+
+
+def add_job(status='pending', **values):
+    job = CaptureJob(order_id='ORDER-1', purchase_data=json.dumps({'user_email': 'user@example.com'}),
+                     status=status, **values)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def test_failed_capture_is_retried_later(app, monkeypatch):
+    client = FailingPayPalClient()
+    scheduled = []
+    monkeypatch.setattr(checkout, 'get_paypal_client', lambda: client)
+    monkeypatch.setattr(checkout, 'submit_later', lambda delay, *args, **kwargs: scheduled.append(delay))
+    job_id = add_job()
+
+    assert checkout.process_capture_job(job_id) is False
+    job = db.session.get(CaptureJob, job_id)
+    assert job.status == 'pending'
+    assert scheduled == [checkout.CAPTURE_RETRY_DELAY]
+    assert job.next_attempt_at > datetime.utcnow()
+
+    # Pas de nouvelle tentative avant la date prévue, même depuis la commande de reprise
+    assert checkout.process_capture_job(job_id) is False
+    assert checkout.process_pending_capture_jobs() == 0
+    assert client.calls == 1
+
+    job.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    checkout.process_pending_capture_jobs()
+    assert client.calls == 2
+    assert scheduled == [checkout.CAPTURE_RETRY_DELAY, checkout.CAPTURE_RETRY_DELAY * 2]
+
+
+def test_stale_running_capture_is_requeued(app, monkeypatch):
+    client = FailingPayPalClient()
+    monkeypatch.setattr(checkout, 'get_paypal_client', lambda: client)
+    monkeypatch.setattr(checkout, 'submit_later', lambda *args, **kwargs: None)
+    running = add_job('running', attempts=1, next_attempt_at=datetime.utcnow() + timedelta(minutes=1))
+
+    checkout.process_pending_capture_jobs()
+    assert client.calls == 0
+    assert db.session.get(CaptureJob, running).status == 'running'
+
+    db.session.get(CaptureJob, running).next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    checkout.process_pending_capture_jobs()
+    assert client.calls == 1
+    assert db.session.get(CaptureJob, running).attempts == 2
@@ -0,0 +1,41 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from werkzeug.http import http_date
+
+from src.services import catalog_version
+
+
+def test_etag_is_checked_first(client):
+    etag = client.get('/api/packs').headers['ETag']
+    response = client.get('/api/packs', headers={
+        'If-None-Match': etag,
+        'If-Modified-Since': http_date(datetime(2000, 1, 1, tzinfo=timezone.utc))
+    })
+    assert response.status_code == 304
+
+
+def test_same_second_write_is_not_hidden_by_if_modified_since(client):
+    # Début de seconde : la requête suit l'écriture dans la même seconde
+    time.sleep(1 - time.time() % 1)
+    catalog_version.bump_catalog_version()
+    _, last_modified = catalog_version.get_catalog_version()
+
+    response = client.get('/api/packs', headers={'If-Modified-Since': http_date(last_modified)})
+    assert response.status_code == 200
+    assert response.last_modified is None
+
+
+def test_if_modified_since_once_the_second_is_over(client):
+    catalog_version.bump_catalog_version()
+    _, last_modified = catalog_version.get_catalog_version()
+    time.sleep(max(0, (last_modified - datetime.now(timezone.utc)).total_seconds()) + 0.01)
+
+    response = client.get('/api/packs')
+    assert response.last_modified == last_modified
+    response = client.get('/api/packs', headers={'If-Modified-Since': http_date(last_modified)})
+    assert response.status_code == 304
+    response = client.get('/api/packs', headers={
+        'If-Modified-Since': http_date(last_modified - timedelta(seconds=1))
+    })
+    assert response.status_code == 200
@@ -0,0 +1,54 @@
+import pytest
+
+from src.models.payment import Order
+from src.routes import paypal
+
+
+class FakeResponse:
+    status_code = 201
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class RecordingPayPalClient:
+    def __init__(self):
+        self.orders = []
+
+    def create_order(self, payment_data):
+        self.orders.append(payment_data)
+        return FakeResponse({'id': f'ORDER-{len(self.orders)}', 'status': 'CREATED',
+                             'links': [{'rel': 'approve', 'href': 'https://paypal.test/approve'}]})
+
+
+@pytest.fixture
+def paypal_client(monkeypatch):
+    client = RecordingPayPalClient()
+    monkeypatch.setattr(paypal, 'get_paypal_client', lambda: client)
+    return client
+
+
+@pytest.mark.parametrize('payload', [
+    {'pack_id': 'single', 'user_email': 'user@example.com', 'amount': 2.99, 'story_id': 'abc'},
+    {'pack_id': 'single', 'user_email': 'user@example.com', 'amount': 2.99},
+    {'pack_id': 'single', 'user_email': None, 'amount': 2.99, 'story_id': 1},
+])
+def test_invalid_order_is_rejected_before_paypal(client, paypal_client, payload):
+    response = client.post('/api/create-payment', json=payload)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert paypal_client.orders == []
+    assert Order.query.count() == 0
+
+
+def test_order_is_saved_with_normalized_data(client, paypal_client):
+    response = client.post('/api/create-payment', json={
+        'pack_id': 'single', 'user_email': 'user@example.com', 'amount': '2.99', 'story_id': '7'
+    })
+    assert response.status_code == 200
+    order = Order.query.filter_by(order_id=response.get_json()['order_id']).one()
+    assert order.story_id == 7
+    assert order.amount == 2.99
@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy import event
+
+from src.models.credits import CreditAccount, CreditLedgerEntry
+from src.models.story import Purchase, PurchaseStory, Story
+from src.models.user import db
+from src.services import credits
+from src.services.entitlements import Entitlements
+
+
+def _stories(count):
+    stories = [Story(title=f'Histoire {index}', description='Test', duration='5:00', category='Coran',
+                     price=2.99) for index in range(count)]
+    db.session.add_all(stories)
+    db.session.commit()
+    return [story.id for story in stories]
+
+
+def _buy_pack(user_email, amount):
+    purchase = Purchase(user_email=user_email, pack_type='pack10', amount_paid=24.99)
+    db.session.add(purchase)
+    db.session.flush()
+    credits.grant_credits(purchase, amount)
+    db.session.commit()
+    return purchase
+
+
+def _spends(user_email):
+    return CreditLedgerEntry.query.filter_by(user_email=user_email, reason='spend').count()
+
+
+def test_balance_never_goes_negative(app):
+    first, second = _stories(2)
+    _buy_pack('buyer@example.com', 1)
+
+    assert credits.spend_credit('buyer@example.com', first) == (0, True)
+    with pytest.raises(credits.CreditError) as error:
+        credits.spend_credit('buyer@example.com', second)
+    assert error.value.status_code == 402
+    assert credits.get_balance('buyer@example.com') == 0
+    assert _spends('buyer@example.com') == 1
+
+
+def test_unlocked_story_is_not_debited(app):
+    story_id, = _stories(1)
+    _buy_pack('buyer@example.com', 2)
+
+    assert credits.spend_credit('buyer@example.com', story_id) == (1, True)
+    assert credits.spend_credit('buyer@example.com', story_id) == (1, False)
+    assert _spends('buyer@example.com') == 1
+
+
+def test_concurrent_unlock_of_same_story_is_debited_once(app, monkeypatch):
+    story_id, = _stories(1)
+    purchase = _buy_pack('buyer@example.com', 2)
+    # Une requête concurrente a débloqué l'histoire après la lecture des droits de celle-ci
+    db.session.add(PurchaseStory(purchase_id=purchase.id, user_email='buyer@example.com', story_id=story_id))
+    db.session.commit()
+    monkeypatch.setattr(credits, 'load_entitlements', lambda user_email: Entitlements(frozenset(), False))
+
+    assert credits.spend_credit('buyer@example.com', story_id) == (2, False)
+    assert _spends('buyer@example.com') == 0
+
+
+def test_grant_when_account_is_created_concurrently(app):
+    inserted = []
+
+    def create_account_concurrently(conn, cursor, statement, parameters, context, executemany):
+        # Compte créé par un autre achat entre le UPDATE sans effet et l'INSERT
+        if statement.startswith('UPDATE credit_accounts') and cursor.rowcount == 0 and not inserted:
+            inserted.append(True)
+            cursor.connection.execute("INSERT INTO credit_accounts (user_email, balance) VALUES ('buyer@example.com', 3)")
+
+    event.listen(db.engine, 'after_cursor_execute', create_account_concurrently)
+    try:
+        _buy_pack('buyer@example.com', 10)
+    finally:
+        event.remove(db.engine, 'after_cursor_execute', create_account_concurrently)
+
+    assert inserted
+    assert credits.get_balance('buyer@example.com') == 13
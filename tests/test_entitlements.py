@@ -0,0 +1,53 @@
+import json
+
+from src.main import create_app
+from src.models.sales import StorySalesDaily
+from src.models.story import Purchase, PurchaseStory, Story
+from src.models.user import db
+from src.services.entitlements import EntitlementCache
+from src.services.migrations import run_migrations
+from src.services.version_marker import VersionMarker
+
+
+def test_migration_backfills_legacy_purchases():
+    app = create_app('testing')
+    with app.app_context():
+        # Base antérieure à la migration : l'achat n'a que son blob JSON
+        run_migrations(target=7)
+        stories = [Story(title=f'Histoire {index}', description='Test', duration='5:00', category='Coran',
+                         price=2.99) for index in range(3)]
+        db.session.add_all(stories)
+        db.session.flush()
+        db.session.add(Purchase(user_email='legacy@example.com', pack_type='pack10', amount_paid=24.99,
+                                story_ids=json.dumps([stories[0].id, stories[1].id])))
+        db.session.commit()
+
+        assert [item.version for item in run_migrations(target=8)] == [8]
+        assert PurchaseStory.query.count() == 2
+        assert StorySalesDaily.query.count() == 2
+
+        client = app.test_client()
+        unlocked = client.get(f'/api/check-access?email=legacy@example.com&story_id={stories[0].id}').get_json()
+        locked = client.get(f'/api/check-access?email=legacy@example.com&story_id={stories[2].id}').get_json()
+        assert unlocked['has_access'] is True
+        assert locked['has_access'] is False
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_invalidation_reaches_other_workers(tmp_path):
+    marker_path = str(tmp_path / 'entitlements.version')
+    owned = {'buyer@example.com': frozenset()}
+
+    def loader(user_email):
+        return owned[user_email]
+
+    # Deux caches sur le même marqueur : deux workers gunicorn
+    worker_a = EntitlementCache(loader=loader, marker=VersionMarker(marker_path))
+    worker_b = EntitlementCache(loader=loader, marker=VersionMarker(marker_path))
+    assert worker_a.get('buyer@example.com') == frozenset()
+
+    # Achat traité par l'autre worker
+    owned['buyer@example.com'] = frozenset({1})
+    worker_b.invalidate('buyer@example.com')
+    assert worker_a.get('buyer@example.com') == frozenset({1})
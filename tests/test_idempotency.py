@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import jsonify, request
+
+from src.models.payment import IdempotencyRecord
+from src.models.user import db
+from src.services import idempotency
+from src.services.idempotency import idempotent
+
+
+@pytest.fixture
+def calls(app):
+    """Endpoint idempotent de test : compte les exécutions réelles de la vue"""
+    calls = []
+
+    @idempotent
+    def charge():
+        calls.append(request.get_json())
+        return jsonify({'success': True, 'call': len(calls)}), request.get_json().get('status', 200)
+
+    app.add_url_rule('/test/charge', 'test_charge', charge, methods=['POST'])
+    return calls
+
+
+def _post(client, body, key='key-1'):
+    return client.post('/test/charge', json=body, headers={'Idempotency-Key': key})
+
+
+def _age(key, seconds):
+    db.session.execute(
+        db.update(IdempotencyRecord).where(IdempotencyRecord.key == key)
+        .values(created_at=datetime.utcnow() - timedelta(seconds=seconds))
+    )
+    db.session.commit()
+
+
+def test_stale_in_progress_key_is_taken_over(client, calls):
+    # Worker arrêté pendant la requête : la clé reste 'en cours'
+    _post(client, {'amount': 1})
+    db.session.execute(
+        db.update(IdempotencyRecord).where(IdempotencyRecord.key == 'key-1')
+        .values(status='in_progress', status_code=None, response_body=None)
+    )
+    db.session.commit()
+
+    # Bail encore valide : le retry attend
+    assert _post(client, {'amount': 1}).status_code == 409
+    assert len(calls) == 1
+
+    # Après le bail, un retry de la même requête reprend la clé ; une autre requête reste refusée
+    _age('key-1', idempotency.IDEMPOTENCY_LEASE_SECONDS + 60)
+    assert _post(client, {'amount': 2}).status_code == 422
+    response = _post(client, {'amount': 1})
+    assert response.status_code == 200
+    assert response.get_json()['call'] == 2
+    record = db.session.get(IdempotencyRecord, ('key-1', 'test_charge'))
+    assert record.status == 'completed'
+
+
+def test_expired_keys_are_purged(client, calls):
+    _post(client, {'amount': 1}, key='old')
+    _post(client, {'amount': 1}, key='recent')
+    _age('old', idempotency.IDEMPOTENCY_TTL_SECONDS + 60)
+
+    assert idempotency.collect_expired_idempotency_records() == 1
+    assert db.session.get(IdempotencyRecord, ('old', 'test_charge')) is None
+    assert db.session.get(IdempotencyRecord, ('recent', 'test_charge')) is not None
+
+
+def test_replay_returns_stored_response(client, calls):
+    first = _post(client, {'amount': 1})
+    replay = _post(client, {'amount': 1})
+
+    assert len(calls) == 1
+    assert replay.status_code == first.status_code == 200
+    assert replay.get_json() == first.get_json()
+    assert replay.headers['Idempotent-Replayed'] == 'true'
+
+
+def test_conflicting_body_is_rejected(client, calls):
+    _post(client, {'amount': 1})
+    response = _post(client, {'amount': 2})
+
+    assert response.status_code == 422
+    assert response.get_json()['success'] is False
+    assert len(calls) == 1
+
+
+def test_server_error_releases_key(client, calls):
+    assert _post(client, {'amount': 1, 'status': 503}).status_code == 503
+    assert db.session.get(IdempotencyRecord, ('key-1', 'test_charge')) is None
+
+    retry = _post(client, {'amount': 1, 'status': 503})
+    assert retry.status_code == 503
+    assert 'Idempotent-Replayed' not in retry.headers
+    assert len(calls) == 2
@@ -0,0 +1,20 @@
+from src.services.migrations import (
+    MIGRATIONS, check_query_plans, current_version, pending_migrations, run_migrations
+)
+
+
+def test_all_migrations_applied_once(app):
+    assert current_version() == MIGRATIONS[-1].version
+    assert pending_migrations() == []
+    assert run_migrations() == []
+
+
+def test_query_plans_use_indexes(app):
+    results = check_query_plans()
+    assert len(results) == sum(len(item.query_plan_checks) for item in MIGRATIONS)
+    problems = {
+        f'{item.version} {check.description}': (plan, check_problems)
+        for item, check, plan, check_problems in results
+        if check_problems
+    }
+    assert problems == {}
@@ -0,0 +1,26 @@
+from src.models.pack import Pack
+from src.models.user import db
+from src.services.catalog_version import bump_catalog_version
+from src.services.migrations import default_packs
+from src.services.pack_registry import PackRegistry
+
+
+def test_packs_are_served_from_the_registry(client):
+    packs = client.get('/api/packs').get_json()['packs']
+    assert [pack['pack_id'] for pack in packs] == [pack.pack_id for pack in Pack.query.filter_by(is_active=True)]
+    assert {'id', 'savings', 'created_at'} <= set(packs[0])
+
+    single = client.get('/api/packs/single').get_json()['pack']
+    assert single['price'] == 2.99
+    assert client.get('/api/packs/inconnu').status_code == 404
+
+
+def test_default_packs_migration_reloads_the_registry(app):
+    Pack.query.delete()
+    db.session.commit()
+    bump_catalog_version()
+    registry = PackRegistry()
+    assert registry.all() == []
+
+    default_packs()
+    assert registry.get('single') is not None
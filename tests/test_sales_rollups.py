@@ -0,0 +1,114 @@
+import json
+from datetime import datetime, timedelta
+
+from src.models.sales import BuyerDay, SalesDaily, StorySalesDaily
+from src.models.story import Purchase, PurchaseStory, Story
+from src.models.user import db
+from src.services.credits import grant_credits, spend_credit
+from src.services.sales_rollups import rebuild_rollups, record_sale
+
+NOW = datetime.utcnow()
+
+
+def rollup_rows():
+    """Contenu des trois tables de rollups, comparable entre calcul incrémental et reconstruction"""
+    return {
+        'sales_daily': sorted((row.day, row.pack_type, row.sales, round(row.revenue, 6))
+                              for row in SalesDaily.query),
+        'story_sales_daily': sorted((row.day, row.story_id, row.unlocks, round(row.revenue, 6))
+                                    for row in StorySalesDaily.query),
+        'buyer_days': sorted((row.day, row.user_email) for row in BuyerDay.query),
+    }
+
+
+def add_stories(count):
+    stories = [Story(title=f'Histoire {index}', description='Test', duration='5:00', category='Coran',
+                     price=2.99) for index in range(count)]
+    db.session.add_all(stories)
+    db.session.commit()
+    return [story.id for story in stories]
+
+
+def buy(user_email, pack_type, amount, story_ids=None, days_ago=0, is_active=True):
+    """Enregistrer un achat comme les routes d'achat (droits d'accès puis rollups)"""
+    purchase = Purchase(user_email=user_email, pack_type=pack_type, amount_paid=amount, is_active=is_active,
+                        story_ids=json.dumps(story_ids) if story_ids is not None else None,
+                        paypal_transaction_id=f'TEST-{Purchase.query.count()}',
+                        purchase_date=NOW - timedelta(days=days_ago))
+    db.session.add(purchase)
+    db.session.flush()
+    PurchaseStory.add_for_purchase(purchase)
+    record_sale(purchase)
+    db.session.commit()
+    return purchase
+
+
+def assert_matches_rebuild(since=None):
+    incremental = rollup_rows()
+    rebuild_rollups(since)
+    db.session.commit()
+    assert rollup_rows() == incremental
+    return incremental
+
+
+def test_single_purchases(app):
+    first, second = add_stories(2)
+    buy('a@example.com', 'single', 2.99, [first], days_ago=3)
+    buy('b@example.com', 'single', 2.99, [second])
+    buy('b@example.com', 'single', 2.99, [first])
+    rows = assert_matches_rebuild()
+    assert len(rows['buyer_days']) == 2
+
+
+def test_allocated_pack(app):
+    story_ids = add_stories(10)
+    buy('a@example.com', 'pack10', 24.99, story_ids, days_ago=1)
+    rows = assert_matches_rebuild()
+    assert sum(unlocks for _, _, unlocks, _ in rows['story_sales_daily']) == 10
+
+
+def test_credit_pack(app):
+    story_ids = add_stories(3)
+    purchase = buy('a@example.com', 'pack10', 24.99, days_ago=2)
+    grant_credits(purchase, 10)
+    db.session.commit()
+    for story_id in story_ids:
+        spend_credit('a@example.com', story_id)
+    rows = assert_matches_rebuild()
+    assert [(unlocks, revenue) for _, _, unlocks, revenue in rows['story_sales_daily']] == [(1, 2.499)] * 3
+
+
+def test_repeat_purchase_of_an_owned_story(app):
+    story_id, = add_stories(1)
+    buy('a@example.com', 'single', 2.99, [story_id], days_ago=1)
+    buy('a@example.com', 'single', 2.99, [story_id])
+    rows = assert_matches_rebuild()
+    assert sum(unlocks for _, _, unlocks, _ in rows['story_sales_daily']) == 2
+
+
+def test_inactive_purchase_is_not_counted(app):
+    story_id, = add_stories(1)
+    buy('a@example.com', 'single', 2.99, [story_id], is_active=False)
+    assert assert_matches_rebuild() == {'sales_daily': [], 'story_sales_daily': [], 'buyer_days': []}
+
+
+def test_partial_rebuild_since(app):
+    story_ids = add_stories(4)
+    for days_ago, story_id in enumerate(story_ids):
+        buy(f'user{days_ago}@example.com', 'single', 2.99, [story_id], days_ago=days_ago * 2)
+    since = (NOW - timedelta(days=3)).date()
+
+    # Une ligne altérée avant `since` n'est pas touchée ; celles à partir de `since` sont recalculées
+    old_row = SalesDaily.query.filter(SalesDaily.day < since).first()
+    old_row.sales = 99
+    SalesDaily.query.filter(SalesDaily.day >= since).update({'sales': 0})
+    db.session.commit()
+    rebuild_rollups(since)
+    db.session.commit()
+
+    assert db.session.get(SalesDaily, (old_row.day, old_row.pack_type)).sales == 99
+    assert all(row.sales == 1 for row in SalesDaily.query.filter(SalesDaily.day >= since))
+    old_row = db.session.get(SalesDaily, (old_row.day, old_row.pack_type))
+    old_row.sales = 1
+    db.session.commit()
+    assert_matches_rebuild(since)
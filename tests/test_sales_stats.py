@@ -0,0 +1,40 @@
+from src.models.story import Purchase
+from src.models.user import db
+from src.services.sales_rollups import record_sale
+from src.services.sales_stats import SalesStatsCache, sales_stats_cache
+
+
+def add_purchase():
+    purchase = Purchase(user_email='user@example.com', pack_type='pack10', amount_paid=24.99,
+                        paypal_transaction_id=f'TEST-{Purchase.query.count()}')
+    db.session.add(purchase)
+    db.session.flush()
+    record_sale(purchase, [])
+    return purchase
+
+
+def test_committed_sale_clears_the_cache(app):
+    sales_stats_cache.clear()
+    assert sales_stats_cache.get(30)['sales'] == 0
+
+    add_purchase()
+    db.session.rollback()
+    assert sales_stats_cache.stats()['size'] == 1
+
+    add_purchase()
+    db.session.commit()
+    assert sales_stats_cache.stats()['size'] == 0
+    assert sales_stats_cache.get(30)['sales'] == 1
+
+
+def test_refresh_started_before_clear_is_not_cached(app):
+    cache = SalesStatsCache()
+
+    def loader(days):
+        # Une vente est validée pendant le calcul
+        cache.clear()
+        return {'days': days}
+
+    cache.loader = loader
+    assert cache.refresh(30) == {'days': 30}
+    assert cache.stats()['size'] == 0
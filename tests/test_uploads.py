@@ -0,0 +1,105 @@
+import io
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models.upload import UploadSession
+from src.models.user import db
+from src.services import audio_store, uploads
+
+
+class ConcurrentStream(io.BytesIO):
+    """Flux dont la lecture laisse une autre requête compter le même morceau"""
+
+    def __init__(self, data, upload_id):
+        super().__init__(data)
+        self.upload_id = upload_id
+
+    def read(self, size=-1):
+        db.session.execute(
+            db.update(UploadSession).where(UploadSession.id == self.upload_id).values(received_bytes=4)
+        )
+        db.session.commit()
+        return super().read(size)
+
+
+def test_chunk_counted_once_under_concurrent_writes(app):
+    upload = uploads.init_upload('histoire.mp3', 8)
+
+    with pytest.raises(uploads.UploadError) as error:
+        uploads.write_chunk(upload.id, 0, ConcurrentStream(b'abcd', upload.id), 4)
+    assert error.value.status_code == 409
+    assert error.value.upload.received_bytes == 4
+
+    upload = uploads.write_chunk(upload.id, 4, io.BytesIO(b'efgh'), 4)
+    assert upload.received_bytes == 8
+    assert upload.status == 'complete'
+
+
+class RacingStream(io.BytesIO):
+    """Flux dont la lecture laisse une autre requête écrire et compter le même morceau"""
+
+    def __init__(self, data, upload_id, winner_data):
+        super().__init__(data)
+        self.upload_id = upload_id
+        self.winner_data = winner_data
+
+    def read(self, size=-1):
+        if self.winner_data is not None:
+            winner_data, self.winner_data = self.winner_data, None
+            uploads.write_chunk(self.upload_id, 0, io.BytesIO(winner_data), len(winner_data))
+        return super().read(size)
+
+
+def test_losing_chunk_does_not_touch_counted_bytes(app):
+    upload = uploads.init_upload('histoire.mp3', 8)
+
+    with pytest.raises(uploads.UploadError) as error:
+        uploads.write_chunk(upload.id, 0, RacingStream(b'abcd', upload.id, b'WXYZ'), 4)
+    assert error.value.status_code == 409
+    assert error.value.upload.received_bytes == 4
+
+    with open(uploads._partial_path(upload.id), 'rb') as f:
+        assert f.read() == b'WXYZ'
+    leftovers = [name for name in os.listdir(audio_store.AUDIO_TMP_FOLDER) if name.endswith('.chunk')]
+    assert not [name for name in leftovers if name.startswith(upload.id)]
+
+
+def test_finalize_rejects_partial_file_of_wrong_size(app):
+    upload = uploads.init_upload('histoire.mp3', 8)
+    uploads.write_chunk(upload.id, 0, io.BytesIO(b'abcdefgh'), 8)
+    with open(uploads._partial_path(upload.id), 'r+b') as f:
+        f.truncate(6)
+
+    with pytest.raises(uploads.UploadError) as error:
+        uploads.finalize_upload(upload.id)
+    assert error.value.status_code == 422
+    assert error.value.upload.received_bytes == 0
+    assert error.value.upload.status == 'uploading'
+    assert os.path.getsize(uploads._partial_path(upload.id)) == 0
+
+
+def test_expired_uploads_are_collected(app):
+    abandoned = uploads.init_upload('abandon.mp3', 8)
+    recent = uploads.init_upload('recent.mp3', 8)
+    abandoned.updated_at = datetime.utcnow() - timedelta(seconds=uploads.UPLOAD_SESSION_TTL + 60)
+    db.session.commit()
+    abandoned_id, partial_path = abandoned.id, uploads._partial_path(abandoned.id)
+
+    assert uploads.collect_expired_uploads() == 1
+    assert db.session.get(UploadSession, abandoned_id) is None
+    assert not os.path.exists(partial_path)
+    assert db.session.get(UploadSession, recent.id) is not None
+
+
+def test_finalize_with_unknown_story_returns_404(app, client, monkeypatch, tmp_path):
+    monkeypatch.setattr(audio_store, 'AUDIO_FOLDER', str(tmp_path))
+    upload = uploads.init_upload('histoire.wav', 4)
+    uploads.write_chunk(upload.id, 0, io.BytesIO(b'RIFF'), 4)
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+
+    response = client.post(f'/admin/uploads/{upload.id}/finalize', json={'story_id': 999})
+    assert response.status_code == 404
+    assert response.get_json()['success'] is False